@@ -14,7 +14,7 @@ from flask_mail import Mail
 from flask_sqlalchemy import SQLAlchemy
 from raven.contrib.flask import Sentry
 
-from notifico.util import pretty
+from notifico.util import pretty, irc
 
 db = SQLAlchemy()
 sentry = Sentry()
@@ -43,7 +43,7 @@ def group_required(name):
     def _wrap(f):
         @wraps(f)
         def _wrapped(*args, **kwargs):
-            if g.user is None or not g.user.in_group(name):
+            if g.user is None or not g.identity.in_group(name):
                 return redirect(url_for('account.login'))
             return f(*args, **kwargs)
         return _wrapped
@@ -59,6 +59,10 @@ def create_instance():
     app = Flask(__name__)
     app.config.from_object('notifico.config')
 
+    # g.user is loaded from the session on first use.
+    from notifico.views.account.identity import RequestGlobals
+    app.app_ctx_globals_class = RequestGlobals
+
     if app.config.get('NOTIFICO_ROUTE_STATIC'):
         # We should handle routing for static assets ourself (handy for
         # small and quick deployments).
@@ -96,6 +100,12 @@ def create_instance():
     mail.init_app(app)
     # Attach Flask-SQLAlchemy to our application instance.
     db.init_app(app)
+    # Keep the site statistics, page versions and history up to date.
+    from notifico.services import history, network_stats, page_cache, stats
+    network_stats.listen(db.session)
+    stats.listen(db.session)
+    page_cache.listen(db.session)
+    history.listen(db.session)
 
     # Update celery's configuration with our application config.
     celery.config_from_object(app.config)
@@ -106,12 +116,14 @@ def create_instance():
     from notifico.views.projects import projects
     from notifico.views.pimport import pimport
     from notifico.views.admin import admin
+    from notifico.views.api import api
 
     app.register_blueprint(account, url_prefix='/u')
     app.register_blueprint(projects)
     app.register_blueprint(public)
     app.register_blueprint(pimport, url_prefix='/i')
     app.register_blueprint(admin, url_prefix='/_')
+    app.register_blueprint(api, url_prefix='/api/1')
 
     # Register our custom error handlers.
     from notifico.views import errors
@@ -123,8 +135,12 @@ def create_instance():
     handler.connect(app, '/RPC2')
 
     # Setup some custom Jinja2 filters.
-    app.jinja_env.filters['pretty_date'] = pretty.pretty_date
+    # Dates are shown relative to now by a script on the page, so the
+    # page itself can be cached.
+    app.jinja_env.filters['pretty_date'] = pretty.time_tag
     app.jinja_env.filters['plural'] = pretty.plural
     app.jinja_env.filters['fix_link'] = pretty.fix_link
+    app.jinja_env.filters['irc_to_html'] = irc.to_html
+    app.jinja_env.globals['cached_fragment'] = page_cache.fragment
 
     return app
@@ -3,15 +3,21 @@
 
 Usage:
     notifico www [options]
-    notifico bots
+    notifico bots [--warm]
     notifico init
     notifico worker
+    notifico rebuild-stats
+    notifico import-user <path> [--password=<password>]
 
 Options:
     --debug                 Enable debugging.
                             (DO NOT USE ON PRODUCTION)
     --port=<port>           Port to listen on. [default: 5000]
     --host=<host>           Host to bind to. [default: localhost]
+    --warm                  Join recently active channels before
+                            delivering any messages.
+    --password=<password>   Password for the imported user, who must
+                            otherwise reset it.
 """
 import sys
 
@@ -20,6 +26,7 @@ from docopt import docopt
 from notifico import create_instance, db, celery
 from notifico.bots import start_manager
 from notifico.models import *
+from notifico.util.schema import create_missing_indexes
 
 
 def main(argv):
@@ -33,16 +40,51 @@ def main(argv):
             host=args['--host']
         )
     elif args ['bots']:
-        start_manager()
+        start_manager(warm_start=args['--warm'])
     elif args['init']:
         app = create_instance()
         with app.app_context():
             # Let SQLAlchemy create any missing tables.
             db.create_all()
+            # ... and any indexes added to tables that already existed.
+            create_missing_indexes()
     elif args['worker']:
         app = create_instance()
         with app.app_context():
             celery.start()
+    elif args['rebuild-stats']:
+        from notifico.services import network_stats, stats
+
+        app = create_instance()
+        with app.app_context():
+            # Recount every network and total, fixing any drift in the
+            # counters.
+            count = network_stats.rebuild()
+            totals = stats.reconcile()
+        print 'Recounted {0} networks.'.format(count)
+        for name in sorted(totals):
+            print '{0:>10}: {1}'.format(name, totals[name])
+    elif args['import-user']:
+        import json
+        from notifico.services import export, network_stats, stats
+
+        with open(args['<path>'], 'rb') as fin:
+            data = json.load(fin)
+
+        app = create_instance()
+        with app.app_context():
+            try:
+                user = export.import_user(data, password=args['--password'])
+            except ValueError as e:
+                print e
+                return 1
+            # Everything was inserted in bulk, without being counted.
+            network_stats.rebuild()
+            stats.reconcile()
+            print 'Imported {0} with {1} projects.'.format(
+                user.username,
+                len(data.get('projects') or [])
+            )
 
 
 if __name__ == '__main__':
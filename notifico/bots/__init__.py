@@ -1,18 +1,31 @@
 # -*- coding: utf8 -*-
 import json
+import signal
 
 import redis
 import gevent
+import gevent.event
 from raven.handlers.logging import SentryHandler
 from raven.conf import setup_logging
 
 from notifico.bots.util import Network, Channel
 from notifico.bots.manager import BotManager
 from notifico.bots.bot import BotificoBot
+from notifico.bots import warm
 import notifico.config as config
 
 
-def start_manager():
+def start_manager(warm_start=False, stopping=None):
+    """
+    Run the bot manager, delivering queued messages until SIGTERM or SIGINT
+    is received.
+
+    :param warm_start: Join recently active channels before consuming
+                       any messages.
+    :param stopping: An optional `gevent.event.Event` which stops the
+                     manager when set. When given, no signal handlers are
+                     installed.
+    """
     if config.SENTRY_DSN:
         handler = SentryHandler(config.SENTRY_DSN)
         setup_logging(handler)
@@ -24,7 +37,36 @@ def start_manager():
     )
     manager = BotManager(BotificoBot)
 
-    while True:
+    if stopping is None:
+        # Stop consuming messages once we've been asked to shut down.
+        stopping = gevent.event.Event()
+        # gevent.signal() was renamed to gevent.signal_handler() in 1.5.
+        signal_handler = (
+            getattr(gevent, 'signal_handler', None) or gevent.signal
+        )
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal_handler(signum, stopping.set)
+
+    # If the last process shut down cleanly, put its bots back in the
+    # same channels.
+    warm.restore_topology(
+        r,
+        manager,
+        concurrency=config.IRC_WARM_CONCURRENCY,
+        connect_delay=config.IRC_WARM_CONNECT_DELAY
+    )
+
+    if warm_start:
+        # Connect to and join recently active channels before we start
+        # consuming messages.
+        warm.warm_up(
+            manager,
+            warm.recent_channels(r, config.IRC_WARM_WINDOW),
+            concurrency=config.IRC_WARM_CONCURRENCY,
+            connect_delay=config.IRC_WARM_CONNECT_DELAY
+        )
+
+    while not stopping.is_set():
         result = r.lpop('queue_message')
         if result:
             m = json.loads(result)
@@ -45,8 +87,17 @@ def start_manager():
                     ),
                     payload['msg']
                 )
+                warm.record_channel(r, channel)
 
         gevent.sleep(0.1)
 
+    # Hand anything we haven't sent yet back to the queue and save our
+    # bot topology for the next process, then say goodbye.
+    topology = manager.topology()
+    warm.requeue_messages(r, manager.shutdown(config.IRC_QUIT_MESSAGE))
+    warm.save_topology(r, topology)
+    # Give the QUITs a moment to make it out.
+    gevent.sleep(1)
+
 if __name__ == '__main__':
     start_manager()
@@ -11,6 +11,8 @@ from utopia.client import ProtocolClient
 from utopia.plugins.protocol import ISupportPlugin
 from utopia.plugins.util import LogPlugin
 
+from notifico.bots import util
+
 
 class BotificoBot(ProtocolClient):
     def __init__(self, identity, host, port=6667, ssl=False, plugins=None):
@@ -34,10 +36,34 @@ class BotificoBot(ProtocolClient):
         """
         return self._ready
 
+    @property
+    def channels(self):
+        """
+        A list of every channel this bot is responsible for.
+        """
+        return [
+            util.Channel(channel=c.name, password=c._password)
+            for c in self._channels.values()
+        ]
+
     def send_message(self, channel, message):
         """
         Sends a privmsg message to a channel.
         """
+        self._get_channel(channel).message(message)
+
+    def prepare_channel(self, channel):
+        """
+        Joins `channel` ahead of any messages being sent to it. If the
+        client isn't registered yet, the channel will be joined as soon
+        as it is.
+        """
+        self._get_channel(channel).join()
+
+    def _get_channel(self, channel):
+        """
+        Returns the `Channel` for `channel`, creating it if needed.
+        """
         name = channel.channel.lower()
 
         if name not in self._channels:
@@ -47,7 +73,34 @@ class BotificoBot(ProtocolClient):
         # there might be that rare event when the channel password gets
         # changed *and* notifico got kicked from the channel
         self._channels[name]._password = channel.password
-        self._channels[name].message(message)
+        return self._channels[name]
+
+    def drain(self):
+        """
+        Stops sending messages and returns a list of (channel, message)
+        tuples for every message that hasn't been sent yet, in the order
+        they would have been sent.
+        """
+        unsent = []
+        for channel in self._channels.values():
+            c = util.Channel(channel=channel.name, password=channel._password)
+            unsent.extend((c, message) for message in channel.drain())
+        return unsent
+
+    def quit(self, reason=None):
+        """
+        Disconnect from the network with an optional `reason`.
+        """
+        if reason:
+            self.send('QUIT', reason)
+        else:
+            self.send('QUIT')
+
+    def has_channel(self, channel):
+        """
+        Returns True if this bot is already responsible for `channel`.
+        """
+        return channel.channel.lower() in self._channels
 
     def will_join(self, channel):
         """
@@ -92,12 +145,14 @@ class Channel(object):
 
         self._joined = gevent.event.Event()
         self._message_queue = gevent.queue.Queue()
+        # The message taken off the queue that is waiting on a JOIN.
+        self._pending = None
 
         signals.m.on_JOIN.connect(self.on_join, sender=client)
         signals.m.on_KICK.connect(self.on_kick, sender=client)
 
         # start off the sender greenlet
-        gevent.spawn(self._check_message_queue)
+        self._sender = gevent.spawn(self._check_message_queue)
 
     @property
     def name(self):
@@ -129,6 +184,23 @@ class Channel(object):
             return True
         return False
 
+    def drain(self):
+        """
+        Stops the sender and returns the text of every message that
+        hasn't been sent yet, oldest first.
+        """
+        self._sender.kill()
+
+        unsent = []
+        if self._pending is not None:
+            unsent.append(self._pending[2])
+            self._pending = None
+
+        while not self._message_queue.empty():
+            unsent.append(self._message_queue.get_nowait()[2])
+
+        return unsent
+
     def _send_message(self, func, message):
         # this should not block anyways, since the queue size
         # is unlimited
@@ -164,12 +236,16 @@ class Channel(object):
         sends all messages.
         """
         # wait for a message
-        message = self._message_queue.get()
+        message = self._pending = self._message_queue.get()
         self.join()
         # there is a message, but the channel might not
         # be joined yet (this will not block if we are already in the channel)
         self._joined.wait()
         # send the message
+        self._pending = None
         message[0](*message[1:])
 
-        gevent.spawn_later(self.message_min_delay, self._check_message_queue)
+        self._sender = gevent.spawn_later(
+            self.message_min_delay,
+            self._check_message_queue
+        )
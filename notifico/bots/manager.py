@@ -58,6 +58,64 @@ class BotManager(object):
 
         return bot.send_message(channel, message)
 
+    def join_channel(self, network, channel):
+        """
+        Join `channel` on `network` without sending anything to it, so
+        that later messages can be delivered right away.
+        """
+        bot = self.find_bot_for_channel(network, channel)
+
+        if bot is None:
+            return False
+
+        bot.prepare_channel(channel)
+        return True
+
+    def topology(self):
+        """
+        Returns a list of (network, channels) tuples, one for each
+        active bot, describing which bot is responsible for which
+        channels.
+        """
+        return [
+            (Network.from_client(bot), bot.channels)
+            for bots in self._active_bots.values()
+            for bot in bots
+        ]
+
+    def restore_bot(self, network, channels):
+        """
+        Create a new bot for `network` and have it join all of `channels`,
+        such as when restoring a previously saved topology.
+        """
+        bot = self._create_bot(network)
+
+        if bot is None:
+            return None
+
+        for channel in channels:
+            bot.prepare_channel(channel)
+
+        return bot
+
+    def shutdown(self, reason=None):
+        """
+        Stop every bot and disconnect it from its network with `reason`.
+        Returns a list of (network, channel, message) tuples for every
+        message that had been accepted but not yet sent.
+        """
+        unsent = []
+        for bots in self._active_bots.values():
+            for bot in list(bots):
+                network = Network.from_client(bot)
+                unsent.extend(
+                    (network, channel, message)
+                    for channel, message in bot.drain()
+                )
+                bot.quit(reason)
+
+        return unsent
+
     def find_bot_for_channel(self, network, channel):
         """
         Find (or create) a bot able to send to `channel` on `network`.
@@ -68,6 +126,11 @@ class BotManager(object):
             # so create one.
             return self._create_bot(network)
 
+        # Prefer a bot that's already responsible for this channel.
+        for bot in network_bots:
+            if bot.has_channel(channel):
+                return bot
+
         # There are some bots already on this network, try to find
         # a free one, and if none are willing (ex: maximum channels)
         # create a new one.
@@ -0,0 +1,210 @@
+# -*- coding: utf8 -*-
+"""
+Warm starting for the bot manager.
+
+The manager records every channel it delivers to in a Redis sorted set,
+scored by the time of the last delivery. On start up the channels seen
+recently can be joined before the message queue is consumed, so the first
+message after a restart doesn't pay for connecting, registering and
+joining.
+
+When shutting down, the manager hands its unsent messages back to the
+message queue and saves which bot was in which channels, so the next
+process can pick up where it left off.
+"""
+__all__ = (
+    'record_channel',
+    'recent_channels',
+    'warm_up',
+    'requeue_messages',
+    'save_topology',
+    'restore_topology'
+)
+import json
+import time
+import logging
+from collections import defaultdict
+
+import gevent
+import gevent.pool
+
+from notifico.bots.util import Network, Channel
+
+logger = logging.getLogger(__name__)
+
+#: Key name for the sorted set of recently active channels.
+key_active_channels = 'bots_active_channels'
+#: Key name for the bot topology saved on shutdown.
+key_topology = 'bots_topology'
+#: Key name for the outgoing message queue.
+key_queue_messages = 'queue_message'
+
+
+def _network_and_channel(channel):
+    """
+    Returns a (`Network`, `Channel`) pair from the channel dict used
+    by queued messages.
+    """
+    return (
+        Network(
+            host=channel['host'],
+            port=channel['port'],
+            ssl=channel['ssl'],
+            password=channel.get('password', None)
+        ),
+        Channel(
+            channel=channel['channel'],
+            password=channel.get('channel_password', None)
+        )
+    )
+
+
+def _channel_dict(network, channel):
+    """
+    The reverse of `_network_and_channel()`.
+    """
+    return {
+        'host': network.host,
+        'port': network.port,
+        'ssl': network.ssl,
+        'password': network.password,
+        'channel': channel.channel,
+        'channel_password': channel.password
+    }
+
+
+def record_channel(r, channel, now=None):
+    """
+    Marks the channel dict `channel` (as found in a queued message) as
+    having just been delivered to.
+    """
+    r.zadd(key_active_channels, {
+        json.dumps(channel, sort_keys=True): now or time.time()
+    })
+
+
+def recent_channels(r, window):
+    """
+    Returns the channel dicts of every channel delivered to within the
+    last `window` seconds, most recently active first. Older entries
+    are pruned.
+    """
+    cutoff = time.time() - window
+    r.zremrangebyscore(key_active_channels, '-inf', cutoff)
+    return [
+        json.loads(c) for c in r.zrevrangebyscore(
+            key_active_channels, '+inf', cutoff
+        )
+    ]
+
+
+def _paced(by_network, func, concurrency, connect_delay):
+    """
+    Calls `func` for every item in each list of the mapping `by_network`,
+    one list per network. Networks are handled in parallel, up to
+    `concurrency` at a time, with `func` returning ``True`` if it had to
+    open a new connection, after which we wait `connect_delay` seconds
+    before the next one on that network.
+    """
+    def _run(items):
+        for item in items:
+            if func(item):
+                gevent.sleep(connect_delay)
+
+    pool = gevent.pool.Pool(concurrency)
+    for items in by_network.values():
+        pool.spawn(_run, items)
+    pool.join()
+
+
+def warm_up(manager, channels, concurrency=10, connect_delay=5):
+    """
+    Connect and join every channel dict in `channels`, blocking until
+    done.
+
+    Networks are warmed in parallel, up to `concurrency` at a time. Within
+    a network channels are joined in order, waiting `connect_delay` seconds
+    each time a new connection had to be opened so we don't trip the
+    network's connection throttling.
+    """
+    by_network = defaultdict(list)
+    for channel in channels:
+        network, channel = _network_and_channel(channel)
+        by_network[network._replace(ssl=False)].append((network, channel))
+
+    def _join(pair):
+        network, channel = pair
+        before = len(manager.find_bots_for_network(network))
+        manager.join_channel(network, channel)
+        return len(manager.find_bots_for_network(network)) > before
+
+    _paced(by_network, _join, concurrency, connect_delay)
+
+    logger.info(
+        'Warmed {0} channels on {1} networks.'.format(
+            sum(len(p) for p in by_network.values()),
+            len(by_network)
+        )
+    )
+
+
+def requeue_messages(r, unsent):
+    """
+    Returns the list of (network, channel, message) tuples in `unsent`
+    to the front of the message queue, keeping their original order.
+    """
+    if not unsent:
+        return
+
+    with r.pipeline() as pipe:
+        # LPUSH prepends, so push newest first to keep the oldest message
+        # at the head of the queue.
+        for network, channel, message in reversed(unsent):
+            pipe.lpush(key_queue_messages, json.dumps({
+                'type': 'message',
+                'payload': {
+                    'msg': message
+                },
+                'channel': _channel_dict(network, channel)
+            }))
+        pipe.execute()
+
+
+def save_topology(r, topology):
+    """
+    Saves the (network, channels) tuples from
+    `BotManager.topology()` for the next process to restore.
+    """
+    r.set(key_topology, json.dumps([
+        [_channel_dict(network, c) for c in channels]
+        for network, channels in topology
+        if channels
+    ]))
+
+
+def restore_topology(r, manager, concurrency=10, connect_delay=5):
+    """
+    Recreates the bots saved by `save_topology()`, each joining the same
+    channels it was in before. The saved topology is only used once.
+    """
+    with r.pipeline() as pipe:
+        pipe.get(key_topology)
+        pipe.delete(key_topology)
+        topology, _ = pipe.execute()
+
+    if not topology:
+        return
+
+    by_network = defaultdict(list)
+    for bot in json.loads(topology):
+        pairs = [_network_and_channel(c) for c in bot]
+        network = pairs[0][0]
+        by_network[network._replace(ssl=False)].append(
+            (network, [channel for _, channel in pairs])
+        )
+
+    def _restore(bot):
+        manager.restore_bot(*bot)
+        return True
+
+    _paced(by_network, _restore, concurrency, connect_delay)
@@ -50,6 +50,16 @@ REDIS_DB = 0
 IRC_NICKNAME = 'Not'
 IRC_USERNAME = u'notifico'
 IRC_REALNAME = u"Notifico! - https://github.com/notifico"
+# The reason given when the bots disconnect on shutdown.
+IRC_QUIT_MESSAGE = u'Restarting, back in a moment.'
+# When the bots are started with --warm, channels which received a message
+# within this many seconds are joined before any messages are delivered.
+IRC_WARM_WINDOW = 60 * 60 * 24
+# The number of networks to warm up in parallel.
+IRC_WARM_CONCURRENCY = 10
+# Seconds to wait after opening a new connection to a network while warming
+# up, to stay clear of connection throttling.
+IRC_WARM_CONNECT_DELAY = 5
 
 # ---
 # Service integration configuration.
@@ -76,6 +86,14 @@ BROKER_URL = 'redis://'
 CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
 CELERY_IMPORTS = ('notifico.services.background',)
 CELERY_TASK_SERIALIZER = 'json'
+# Tasks run periodically by "celery beat" (or a worker started with -B).
+CELERYBEAT_SCHEDULE = {
+    # Recount the site statistics, fixing any drift in the counters.
+    'reconcile-stats': {
+        'task': 'notifico.services.background.reconcile_stats',
+        'schedule': 60 * 60 * 6
+    }
+}
 
 
 # ---
@@ -88,6 +106,61 @@ CELERY_TASK_SERIALIZER = 'json'
 # handle the /static directory.
 NOTIFICO_ROUTE_STATIC = True
 
+# Identical messages sent to the same channel within this many seconds,
+# such as the same line from two different hooks, are only delivered once.
+# Set to 0 to disable.
+NOTIFICO_DEDUPE_WINDOW = 60
+
+# URL shortening backends to try, in order, for links in messages. "gitio"
+# shortens github.com links with git.io and "local" serves short links
+# from Notifico itself, which works for any link.
+NOTIFICO_SHORTENERS = ('gitio',)
+# The most time (in seconds) spent shortening a link while handling a
+# hook. If it takes any longer the full link is sent and the link is
+# shortened in the background for the next message.
+NOTIFICO_SHORTEN_BUDGET = 1.0
+# How long (in seconds) to wait on a shortener in the background.
+NOTIFICO_SHORTEN_BACKGROUND_TIMEOUT = 10
+# How long (in seconds) shortened links are remembered.
+NOTIFICO_SHORTEN_TTL = 60 * 60 * 24 * 7
+# The address local short links are served from, such as
+# "https://n.example.com/l". Required for local links created in the
+# background, otherwise taken from the current request.
+NOTIFICO_SHORT_LINK_ROOT = None
+
+# The most hook renders (lines rendered for a payload and hook configuration)
+# to cache, so repeated payloads aren't parsed and formatted again. The least
+# recently used are evicted first. Set to 0 to disable.
+NOTIFICO_RENDER_CACHE_SIZE = 10000
+# How long (in seconds) cached renders are kept for at most.
+NOTIFICO_RENDER_CACHE_TTL = 60 * 60 * 24
+
+# How long (in seconds) rendered public pages and page fragments are cached
+# for at most. Pages are rendered again as soon as anything on them changes,
+# so this only bounds the space used. Set to 0 to disable.
+NOTIFICO_PAGE_CACHE_TTL = 60 * 60
+# Message counts on cached pages are only updated every this many seconds.
+NOTIFICO_PAGE_CACHE_COUNT_DELAY = 60
+
+# How many messages to public projects to keep in the global history, and
+# how many messages to keep for each project. Older ones are dropped (in
+# batches, so there may be a few more).
+NOTIFICO_HISTORY_SIZE = 10000
+NOTIFICO_PROJECT_HISTORY_SIZE = 100
+
+# Live message feeds send a heartbeat after this many seconds without a
+# message, so idle connections aren't closed by proxies.
+NOTIFICO_LIVE_HEARTBEAT = 15
+# Clients of a live feed more than this many messages behind are
+# disconnected. They reconnect and catch up from the history.
+NOTIFICO_LIVE_QUEUE_SIZE = 100
+# The most missed messages sent to a reconnecting client.
+NOTIFICO_LIVE_BACKLOG = 100
+
+# How many GitHub web hooks a project import creates at once. Imports also
+# slow down on their own as GitHub's rate limit runs out.
+NOTIFICO_GITHUB_IMPORT_CONCURRENCY = 8
+
 # Should new users be allowed to register?
 NOTIFICO_NEW_USERS = True
 
@@ -13,3 +13,4 @@ from notifico.models.channel import *
 from notifico.models.hook import *
 from notifico.models.project import *
 from notifico.models.token import *
+from notifico.models.link import *
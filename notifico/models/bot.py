@@ -18,6 +18,14 @@ class BotEvent(db.Model):
     status = db.Column(db.String(30))
     event = db.Column(db.String(255))
 
+    __table_args__ = (
+        # The latest events for a channel.
+        db.Index(
+            'ix_bot_event_channel_created',
+            'host', 'port', 'ssl', 'channel', 'created'
+        ),
+    )
+
     @classmethod
     def new(cls, host, port, ssl, message, status, event, channel=None):
         c = cls()
@@ -2,7 +2,7 @@
 __all__ = ('Channel',)
 import datetime
 
-from sqlalchemy import func, text
+from flask import current_app
 
 from notifico import db
 from notifico.models.bot import BotEvent
@@ -23,6 +23,18 @@ class Channel(db.Model):
         'channels', order_by=id, lazy='dynamic', cascade='all, delete-orphan'
     ))
 
+    __table_args__ = (
+        # A project's channels, and checking for a duplicate channel.
+        db.Index(
+            'ix_channel_project_id_host_channel',
+            'project_id', 'host', 'channel'
+        ),
+        # Counting the channels on each network.
+        db.Index('ix_channel_host_channel', 'host', 'channel'),
+        # Listing the channels on a network, newest first.
+        db.Index('ix_channel_host_created', 'host', 'created', 'id'),
+    )
+
     @classmethod
     def new(cls, channel, host, port=6667, ssl=False, public=False):
         c = cls()
@@ -35,16 +47,18 @@ class Channel(db.Model):
 
     @classmethod
     def channel_count_by_network(cls):
-        q = (
-            db.session.query(
-                Channel.host, func.count(Channel.channel).label('count')
-            )
-            .filter_by(public=True)
-            .group_by(Channel.host)
-            .order_by(text('-count'))
-        )
-        for network, channel_count in q:
-            yield network, channel_count
+        """
+        Yields (network, public channels) for every network, by the
+        number of public channels on it.
+        """
+        # Must be imported here due to the circular nature of the
+        # models and services.
+        from notifico.services import network_stats
+
+        r = current_app.redis
+        for network, count in r.zrevrange(
+                network_stats.key_total, 0, -1, withscores=True):
+            yield network, int(count)
 
     def last_event(self):
         """
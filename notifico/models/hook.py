@@ -22,6 +22,13 @@ class Hook(db.Model):
 
     message_count = db.Column(db.Integer, default=0)
 
+    __table_args__ = (
+        # Receiving a message, by the key and project in the URL.
+        db.Index('ix_hook_key_project_id', 'key', 'project_id'),
+        # A project's hooks, and its hooks for a service.
+        db.Index('ix_hook_project_id_service_id', 'project_id', 'service_id'),
+    )
+
     @classmethod
     def new(cls, service_id, config=None):
         p = cls()
@@ -0,0 +1,82 @@
+# -*- coding: utf8 -*-
+__all__ = ('ShortLink',)
+import string
+import hashlib
+import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+from notifico import db
+
+#: Characters used for short link codes.
+_ALPHABET = string.digits + string.ascii_letters
+#: The largest ID a database can hold, beyond which no code can exist.
+_MAX_ID = 2 ** 63 - 1
+
+
+class ShortLink(db.Model):
+    """
+    A long URL served by Notifico itself from a short link, for the
+    "local" URL shortener.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    created = db.Column(db.TIMESTAMP(), default=datetime.datetime.utcnow)
+    url = db.Column(db.Text, nullable=False)
+    # SHA1 of `url`, so each URL only ever gets one link.
+    digest = db.Column(db.String(40), nullable=False, unique=True)
+
+    @staticmethod
+    def _digest(url):
+        if isinstance(url, unicode):
+            url = url.encode('utf-8')
+        return hashlib.sha1(url).hexdigest()
+
+    @classmethod
+    def for_url(cls, url):
+        """
+        Returns the `ShortLink` for `url`, creating (and flushing) it
+        if needed.
+        """
+        digest = cls._digest(url)
+        link = cls.query.filter_by(digest=digest).first()
+        if link is None:
+            link = cls()
+            link.url = url
+            link.digest = digest
+            # In a savepoint, so losing a race to create the same link
+            # doesn't spoil the transaction we're a part of.
+            try:
+                with db.session.begin_nested():
+                    db.session.add(link)
+            except IntegrityError:
+                link = cls.query.filter_by(digest=digest).first()
+        return link
+
+    @property
+    def code(self):
+        """
+        The short code for this link, which is just its ID in base 62.
+        """
+        n = self.id
+        code = []
+        while True:
+            n, i = divmod(n, len(_ALPHABET))
+            code.append(_ALPHABET[i])
+            if not n:
+                break
+        return ''.join(reversed(code))
+
+    @classmethod
+    def by_code(cls, code):
+        """
+        Returns the `ShortLink` for `code`, or ``None``.
+        """
+        n = 0
+        for c in code:
+            i = _ALPHABET.find(c)
+            if i == -1:
+                return None
+            n = n * len(_ALPHABET) + i
+            if n > _MAX_ID:
+                return None
+        return cls.query.get(n)
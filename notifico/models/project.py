@@ -24,6 +24,19 @@ class Project(db.Model):
     full_name = db.Column(db.String(101), nullable=False, unique=True)
     message_count = db.Column(db.Integer, default=0)
 
+    __table_args__ = (
+        # Listing projects, newest or busiest first.
+        db.Index('ix_project_created', 'created', 'id'),
+        db.Index('ix_project_message_count', 'message_count', 'id'),
+        # A user's projects, and case-insensitive lookups by name (see
+        # `name_i`) with and without the owner.
+        db.Index(
+            'ix_project_owner_id_name_lower',
+            'owner_id', db.func.lower(name)
+        ),
+        db.Index('ix_project_name_lower', db.func.lower(name)),
+    )
+
     @classmethod
     def new(cls, name, public=True, website=None):
         c = cls()
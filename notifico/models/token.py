@@ -1,5 +1,8 @@
 # -*- coding: utf8 -*-
 __all__ = ('AuthToken',)
+import os
+import base64
+import hashlib
 import datetime
 
 from notifico import db
@@ -7,8 +10,12 @@ from notifico import db
 
 class AuthToken(db.Model):
     """
-    Service authentication tokens, such as those used for Github's OAuth.
+    Service authentication tokens, such as those used for Github's OAuth,
+    and tokens for Notifico's own API.
     """
+    #: The name of tokens for Notifico's API.
+    API = 'api'
+
     id = db.Column(db.Integer, primary_key=True)
     created = db.Column(db.TIMESTAMP(), default=datetime.datetime.utcnow)
     name = db.Column(db.String(50), nullable=False)
@@ -19,9 +26,41 @@ class AuthToken(db.Model):
         'tokens', order_by=id, lazy='dynamic', cascade='all, delete-orphan'
     ))
 
+    __table_args__ = (
+        # A user's token for a service.
+        db.Index('ix_auth_token_owner_id_name', 'owner_id', 'name'),
+        # Finding the API token for a secret.
+        db.Index('ix_auth_token_token', 'token'),
+    )
+
     @classmethod
     def new(cls, token, name):
         c = cls()
         c.token = token
         c.name = name
         return c
+
+    @staticmethod
+    def _digest(secret):
+        return hashlib.sha256(secret).hexdigest()
+
+    @classmethod
+    def new_api_token(cls):
+        """
+        Returns a new API token and the secret used to authenticate with
+        it. Only a digest of the secret is stored.
+        """
+        secret = base64.urlsafe_b64encode(os.urandom(30))
+        return cls.new(cls._digest(secret), cls.API), secret
+
+    @classmethod
+    def by_api_secret(cls, secret):
+        """
+        Returns the API token for `secret`, or ``None``.
+        """
+        if isinstance(secret, unicode):
+            secret = secret.encode('utf-8')
+        return cls.query.filter_by(
+            name=cls.API,
+            token=cls._digest(secret)
+        ).first()
@@ -30,6 +30,16 @@ class User(db.Model):
     website = db.Column(db.String(255))
     location = db.Column(db.String(255))
 
+    __table_args__ = (
+        # Listing users, newest first.
+        db.Index('ix_user_joined', 'joined', 'id'),
+        # Case-insensitive lookups by username (see `username_i`), such as
+        # resolving profile and project URLs.
+        db.Index('ix_user_username_lower', db.func.lower(username)),
+        # Lookups by (already lowercased) email.
+        db.Index('ix_user_email', 'email'),
+    )
+
     @classmethod
     def new(cls, username, email, password):
         u = cls()
@@ -100,12 +110,22 @@ class User(db.Model):
         q = q.limit(limit)
         return q
 
+    @property
+    def group_names(self):
+        """
+        A frozenset of the names of the groups this user is in.
+        """
+        names = getattr(self, '_group_names', None)
+        if names is None:
+            names = self._group_names = frozenset(g.name for g in self.groups)
+        return names
+
     def in_group(self, name):
         """
         Returns ``True`` if this user is in the group `name`, otherwise
         ``False``.
         """
-        return any(g.name == name.lower() for g in self.groups)
+        return name.lower() in self.group_names
 
     def add_group(self, name):
         """
@@ -117,13 +137,18 @@ class User(db.Model):
             return
 
         self.groups.append(Group.get_or_create(name=name))
+        self._group_names = None
 
     def export(self):
         """
         Exports the user, his projects, and his hooks for use in a
         private-ly hosted Notifico instance.
         """
-        j = {
+        # Must be imported here due to the circular nature of the
+        # models and services.
+        from notifico.services import export
+
+        return {
             'user': {
                 'username': self.username,
                 'email': self.email,
@@ -132,32 +157,10 @@ class User(db.Model):
                 'website': self.website,
                 'location': self.location
             },
-            'projects': [{
-                'name': p.name,
-                'created': p.created.isoformat(),
-                'public': p.public,
-                'website': p.website,
-                'message_count': p.message_count,
-                'channels': [{
-                    'created': c.created.isoformat(),
-                    'channel': c.channel,
-                    'host': c.host,
-                    'port': c.port,
-                    'ssl': c.ssl,
-                    'public': c.public
-                } for c in p.channels],
-                'hooks': [{
-                    'created': h.created.isoformat(),
-                    'key': h.key,
-                    'service_id': h.service_id,
-                    'message_count': h.message_count,
-                    'config': h.config
-                } for h in p.hooks]
-            } for p in self.projects]
+            # Channels and hooks are loaded a batch of projects at a time.
+            'projects': list(export.export_projects(self))
         }
 
-        return j
-
 
 class Group(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -169,6 +172,10 @@ class Group(db.Model):
         'groups', order_by=id, lazy='joined'
     ))
 
+    __table_args__ = (
+        db.Index('ix_group_owner_id', 'owner_id'),
+    )
+
     def __init__(self, name):
         self.name = name
 
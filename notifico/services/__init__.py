@@ -1,15 +1,77 @@
 # -*- coding: utf8 -*-
+from importlib import import_module
+from collections import Mapping
+
+
+def handles(*events):
+    """
+    A decorator declaring the decorated method as the handler for each of
+    `events`, to be collected by the `Service` metaclass.
+    """
+    def _wrap(f):
+        f.handles_events = getattr(f, 'handles_events', ()) + events
+        return f
+    return _wrap
+
+
+class ServiceRegistry(Mapping):
+    """
+    A mapping of SERVICE_ID to service class. Services may be declared
+    with the module defining them, which is only imported the first time
+    the service is looked up.
+    """
+    def __init__(self):
+        self._loaded = {}
+        self._modules = {}
+
+    def declare(self, service_id, module):
+        """
+        Declares that the service `service_id` is defined in `module`.
+        """
+        self._modules[service_id] = module
+
+    def register(self, cls):
+        self._loaded[cls.SERVICE_ID] = cls
+
+    def __getitem__(self, service_id):
+        try:
+            return self._loaded[service_id]
+        except KeyError:
+            if service_id not in self._modules:
+                raise
+
+        # Defining the service registers it.
+        import_module(self._modules[service_id])
+        return self._loaded[service_id]
+
+    def __iter__(self):
+        return iter(sorted(set(self._loaded) | set(self._modules)))
+
+    def __len__(self):
+        return len(set(self._loaded) | set(self._modules))
 
 
 class Service(type):
     """
     A simple metclass for services (such as hooks or importers) that
-    registers all subclasses.
+    registers all subclasses in a `ServiceRegistry`.
+
+    Every method declared with `handles()`, on the class or its bases,
+    is collected into the ``event_handlers`` mapping of event names to
+    bound methods, built once when the class is defined.
     """
     def __init__(cls, name, bases, attrs):
         super(Service, cls).__init__(name, bases, attrs)
 
         if not hasattr(cls, 'services'):
-            cls.services = {}
+            cls.services = ServiceRegistry()
         else:
-            cls.services[cls.SERVICE_ID] = cls
+            cls.services.register(cls)
+
+        cls.event_handlers = {}
+        for klass in reversed(cls.__mro__):
+            for attr_name, attr in vars(klass).items():
+                # Unwrap classmethods and staticmethods.
+                f = getattr(attr, '__func__', attr)
+                for event in getattr(f, 'handles_events', ()):
+                    cls.event_handlers[event] = getattr(cls, attr_name)
@@ -15,3 +15,44 @@ def send_mail(*args, **kwargs):
     with celery_app.app_context():
         m = Message(*args, **kwargs)
         mail.send(m)
+
+
+@celery.task
+def reconcile_stats():
+    """
+    Recounts the site statistics and networks, fixing any drift in the
+    counters.
+    """
+    from notifico.services import network_stats, stats
+
+    celery_app = create_instance()
+    with celery_app.app_context():
+        network_stats.rebuild()
+        stats.reconcile()
+
+
+@celery.task
+def shorten_url(url):
+    """
+    Shortens `url` for future messages after it couldn't be shortened
+    in time for the current one.
+    """
+    from notifico.services import shortener
+
+    celery_app = create_instance()
+    with celery_app.app_context():
+        shortener.refresh(url)
+
+
+@celery.task
+def import_github(job_id, user_id, repo_ids, base_url, options):
+    """
+    Imports the GitHub repositories `repo_ids` for the user `user_id`, as
+    queued by `github_import.start`.
+    """
+    from notifico.services import github_import
+
+    celery_app = create_instance()
+    # A request for the site itself, so hook URLs can be built.
+    with celery_app.test_request_context(base_url=base_url):
+        github_import.run(job_id, user_id, repo_ids, **options)
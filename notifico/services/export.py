@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+Exporting a user, their projects, channels and hooks, and importing them
+into another instance.
+
+Exports are written incrementally, a batch of projects at a time, with
+the channels and hooks of each batch loaded in a single query each, so a
+user with thousands of projects is never held in memory at once.
+Imports are the reverse, creating everything with bulk inserts in a
+single transaction.
+"""
+__all__ = ('export_projects', 'export_user', 'import_user')
+import os
+import json
+import base64
+import datetime
+from collections import defaultdict
+
+from notifico import db
+from notifico.models import Channel, Hook, Project, User
+from notifico.services import page_cache
+
+#: The number of projects loaded at a time.
+BATCH_SIZE = 100
+
+
+def _encode(o):
+    # Multiple choice options are stored as frozensets.
+    if isinstance(o, (set, frozenset)):
+        return sorted(o)
+    raise TypeError(repr(o))
+
+
+def _decode(config):
+    if config is None:
+        return None
+    return dict(
+        (k, frozenset(v) if isinstance(v, list) else v)
+        for k, v in config.items()
+    )
+
+
+def _date(value):
+    if not value:
+        return None
+    for format_ in ('%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S'):
+        try:
+            return datetime.datetime.strptime(value, format_)
+        except ValueError:
+            pass
+    raise ValueError('{0!r} is not a valid date.'.format(value))
+
+
+def _user(user):
+    return {
+        'username': user.username,
+        'email': user.email,
+        'joined': user.joined.isoformat(),
+        'company': user.company,
+        'website': user.website,
+        'location': user.location
+    }
+
+
+def export_projects(user, batch_size=BATCH_SIZE):
+    """
+    Yields the export of each of `user`'s projects, loading them (and
+    their channels and hooks) `batch_size` projects at a time.
+    """
+    last_id = 0
+    while True:
+        projects = Project.query.filter(
+            Project.owner_id == user.id,
+            Project.id > last_id
+        ).order_by(Project.id).limit(batch_size).all()
+        if not projects:
+            return
+
+        ids = [p.id for p in projects]
+        channels = defaultdict(list)
+        for c in Channel.query.filter(
+                Channel.project_id.in_(ids)).order_by(Channel.id):
+            channels[c.project_id].append({
+                'created': c.created.isoformat(),
+                'channel': c.channel,
+                'host': c.host,
+                'port': c.port,
+                'ssl': c.ssl,
+                'public': c.public
+            })
+
+        hooks = defaultdict(list)
+        for h in Hook.query.filter(
+                Hook.project_id.in_(ids)).order_by(Hook.id):
+            hooks[h.project_id].append({
+                'created': h.created.isoformat(),
+                'key': h.key,
+                'service_id': h.service_id,
+                'message_count': h.message_count,
+                'config': h.config
+            })
+
+        for p in projects:
+            yield {
+                'name': p.name,
+                'created': p.created.isoformat(),
+                'public': p.public,
+                'website': p.website,
+                'message_count': p.message_count,
+                'channels': channels[p.id],
+                'hooks': hooks[p.id]
+            }
+
+        if len(projects) < batch_size:
+            return
+        last_id = ids[-1]
+
+
+def export_user(user, batch_size=BATCH_SIZE):
+    """
+    Yields the export of `user` as chunks of JSON, one per project.
+    """
+    profile = _user(user)
+
+    # The keys are written in sorted order, so the document is laid out
+    # as it was when exports were built in one go.
+    yield '{"projects": ['
+    for i, project in enumerate(export_projects(user, batch_size)):
+        yield (',\n' if i else '\n') + json.dumps(
+            project,
+            sort_keys=True,
+            default=_encode
+        )
+    yield '\n], "user": {0}}}\n'.format(json.dumps(profile, sort_keys=True))
+
+
+def import_user(data, password=None):
+    """
+    Creates the user in the export `data` (as parsed from JSON), along
+    with their projects, channels and hooks, in a single transaction.
+    If no `password` is given the user will have to reset theirs.
+
+    Projects, channels and hooks are inserted in bulk, bypassing the
+    ORM, so the site-wide counters should be rebuilt afterwards.
+    """
+    profile = data['user']
+    if User.username_exists(profile['username']):
+        raise ValueError('The user {0!r} already exists.'.format(
+            profile['username']
+        ))
+
+    user = User.new(
+        profile['username'],
+        profile['email'],
+        password or base64.b64encode(os.urandom(24))
+    )
+    user.joined = _date(profile.get('joined')) or user.joined
+    user.company = profile.get('company')
+    user.website = profile.get('website')
+    user.location = profile.get('location')
+    db.session.add(user)
+
+    try:
+        db.session.flush()
+
+        now = datetime.datetime.utcnow()
+        projects = data.get('projects') or []
+        if projects:
+            db.session.execute(Project.__table__.insert(), [{
+                'owner_id': user.id,
+                'name': p['name'],
+                'full_name': '{0}/{1}'.format(user.username, p['name']),
+                'created': _date(p.get('created')) or now,
+                'public': p.get('public', True),
+                'website': p.get('website'),
+                'message_count': p.get('message_count') or 0
+            } for p in projects])
+
+            ids = dict(
+                (name.lower(), id) for name, id in db.session.query(
+                    Project.name,
+                    Project.id
+                ).filter(Project.owner_id == user.id)
+            )
+
+            channels = [{
+                'project_id': ids[p['name'].lower()],
+                'created': _date(c.get('created')) or now,
+                'channel': c['channel'],
+                'host': c['host'],
+                'port': c.get('port', 6667),
+                'ssl': c.get('ssl', False),
+                'public': c.get('public', False)
+            } for p in projects for c in p.get('channels') or []]
+            if channels:
+                db.session.execute(Channel.__table__.insert(), channels)
+
+            hooks = [{
+                'project_id': ids[p['name'].lower()],
+                'created': _date(h.get('created')) or now,
+                'key': h['key'],
+                'service_id': h['service_id'],
+                'message_count': h.get('message_count') or 0,
+                'config': _decode(h.get('config'))
+            } for p in projects for h in p.get('hooks') or []]
+            if hooks:
+                db.session.execute(Hook.__table__.insert(), hooks)
+
+            page_cache.changed(db.session, 'project', 'channel', 'hook')
+
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return user
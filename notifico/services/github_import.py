@@ -0,0 +1,474 @@
+# -*- coding: utf-8 -*-
+"""
+Importing a user's GitHub repositories as projects, in the background.
+
+The view only queues an import (see `start`). The worker finds the
+chosen repositories, a page of 100 at a time, and creates their projects,
+hooks and channels with bulk inserts in a single transaction. It then
+creates the web hooks on GitHub a few at a time, holding back whenever
+GitHub's rate limit is close to running out or GitHub asks it to slow
+down, and removes the hooks of any it couldn't create. Progress is kept
+in Redis, for the browser to poll.
+"""
+__all__ = ('repos', 'start', 'progress', 'run', 'RateLimit')
+import os
+import json
+import time
+import base64
+import logging
+import threading
+from functools import partial
+from itertools import chain
+from multiprocessing.pool import ThreadPool
+
+import requests
+from flask import current_app, request, url_for
+from github import Github
+from sqlalchemy import func
+
+from notifico import db
+from notifico.models import AuthToken, Channel, Hook, Project, User
+from notifico.services import network_stats, page_cache, stats
+
+#: Key name prefix for the progress of an import.
+key_prefix = 'github_import_'
+
+#: How long (in seconds) the progress of an import is kept.
+EXPIRES = 60 * 60 * 24
+
+API_URL = 'https://api.github.com'
+USER_AGENT = 'Notifico Github Import/0.1'
+
+#: The GitHub service's id.
+SERVICE_ID = 10
+#: The channel public projects can be added to.
+COMMITS_CHANNEL = ('#commits', 'chat.freenode.net')
+
+logger = logging.getLogger(__name__)
+
+
+def _key(job_id):
+    return '{0}{1}'.format(key_prefix, job_id)
+
+
+def _log_key(job_id):
+    return '{0}{1}_log'.format(key_prefix, job_id)
+
+
+def client(token):
+    """
+    Returns a GitHub client for the `AuthToken` `token`, fetching lists a
+    page of 100 at a time.
+    """
+    return Github(token.token, user_agent=USER_AGENT, per_page=100)
+
+
+def repos(git, repo_ids=None):
+    """
+    Yields the repositories the user of `git` administers, both their own
+    and their organizations', or only those in `repo_ids`.
+    """
+    wanted = set(repo_ids) if repo_ids is not None else None
+    if wanted is not None and not wanted:
+        return
+    seen = set()
+
+    user = git.get_user()
+    # Organizations are only listed once the user's own repos run out.
+    for page in chain([user.get_repos(type='all')],
+                      (o.get_repos() for o in user.get_orgs())):
+        for repo in page:
+            if repo.id in seen or not repo.permissions.admin:
+                continue
+            seen.add(repo.id)
+
+            if wanted is None:
+                yield repo
+            elif repo.id in wanted:
+                yield repo
+                wanted.discard(repo.id)
+                if not wanted:
+                    return
+
+
+def start(user, repo_ids, update_projects=True, set_hooks=False,
+          set_commits=True):
+    """
+    Queues an import of the repositories `repo_ids` for `user`, and
+    returns its id.
+    """
+    from notifico.services.background import import_github
+
+    job_id = base64.urlsafe_b64encode(os.urandom(12))
+
+    r = current_app.redis
+    with r.pipeline() as pipe:
+        pipe.hmset(_key(job_id), {
+            'owner_id': user.id,
+            'state': 'queued'
+        })
+        pipe.expire(_key(job_id), EXPIRES)
+        pipe.execute()
+
+    import_github.delay(
+        job_id,
+        user.id,
+        list(repo_ids),
+        # Hook URLs are built by the worker, which has no request of its
+        # own.
+        request.url_root,
+        {
+            'update_projects': update_projects,
+            'set_hooks': set_hooks,
+            'set_commits': set_commits
+        }
+    )
+    return job_id
+
+
+def progress(job_id, since=0):
+    """
+    Returns the progress of the import `job_id` as a dict, with the lines
+    of its summary from `since` on, or ``None`` if there's no such import.
+    """
+    r = current_app.redis
+    with r.pipeline() as pipe:
+        pipe.hgetall(_key(job_id))
+        pipe.lrange(_log_key(job_id), since, -1)
+        fields, log = pipe.execute()
+
+    if not fields:
+        return None
+
+    p = dict(
+        (k, int(v) if v.isdigit() else v.decode('utf-8'))
+        for k, v in fields.items()
+    )
+    p['summary'] = [json.loads(line) for line in log]
+    return p
+
+
+class _Progress(object):
+    """
+    Records the progress of an import, from any thread.
+    """
+    def __init__(self, redis, job_id):
+        self.redis = redis
+        self.job_id = job_id
+
+    def set(self, **fields):
+        with self.redis.pipeline() as pipe:
+            pipe.hmset(_key(self.job_id), fields)
+            pipe.expire(_key(self.job_id), EXPIRES)
+            pipe.execute()
+
+    def incr(self, field, amount=1):
+        self.redis.hincrby(_key(self.job_id), field, amount)
+
+    def log(self, message, ok=True):
+        with self.redis.pipeline() as pipe:
+            pipe.rpush(_log_key(self.job_id), json.dumps([message, ok]))
+            pipe.expire(_log_key(self.job_id), EXPIRES)
+            pipe.execute()
+
+
+class RateLimit(object):
+    """
+    GitHub's rate limit as last reported, shared by the threads of an
+    import. Requests wait for the limit to reset once fewer than
+    `reserve` requests are left, or for as long as GitHub asks when it
+    turns requests away, but never longer than `max_wait` seconds.
+    """
+    def __init__(self, reserve=10, max_wait=60 * 15):
+        self.reserve = reserve
+        self.max_wait = max_wait
+        self._until = 0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """
+        Waits until requests can be made again. Returns ``False`` if that
+        would take too long.
+        """
+        with self._lock:
+            delay = self._until - time.time()
+        if delay > self.max_wait:
+            return False
+        if delay > 0:
+            time.sleep(delay)
+        return True
+
+    def update(self, response):
+        """
+        Updates the limit from `response`. Returns ``True`` if the request
+        was turned away because of it, and should be tried again.
+        """
+        headers = response.headers
+        remaining = headers.get('X-RateLimit-Remaining')
+        retry_after = headers.get('Retry-After')
+        limited = response.status_code in (403, 429) and (
+            remaining == '0' or retry_after is not None or
+            'rate limit' in response.text.lower()
+        )
+
+        until = 0
+        if retry_after is not None and retry_after.isdigit():
+            until = time.time() + int(retry_after)
+        elif remaining is not None and int(remaining) < self.reserve:
+            until = int(headers.get('X-RateLimit-Reset', 0))
+        elif limited:
+            # A secondary limit, without any hint of how long it lasts.
+            until = time.time() + 60
+
+        with self._lock:
+            self._until = max(self._until, until)
+        return limited
+
+
+def _create_hook(token, limit, hook, attempts=3):
+    """
+    Creates the GitHub web hook `hook`, a (repository full name, URL)
+    tuple. Returns the full name and an error, or ``None``.
+    """
+    full_name, url = hook
+    error = None
+    for _ in range(attempts):
+        if not limit.wait():
+            return full_name, 'The GitHub rate limit was reached.'
+
+        try:
+            r = requests.post(
+                '{0}/repos/{1}/hooks'.format(API_URL, full_name),
+                data=json.dumps({
+                    'name': 'web',
+                    'active': True,
+                    'config': {'url': url}
+                }),
+                headers={
+                    'Authorization': 'token {0}'.format(token),
+                    'Accept': 'application/vnd.github.v3+json',
+                    'User-Agent': USER_AGENT
+                },
+                timeout=30
+            )
+        except requests.RequestException as e:
+            error = str(e)
+            continue
+
+        if limit.update(r):
+            error = 'The GitHub rate limit was reached.'
+            continue
+        if r.status_code in (200, 201):
+            return full_name, None
+
+        try:
+            error = r.json().get('message') or r.reason
+        except ValueError:
+            error = r.reason
+        return full_name, error
+    return full_name, error
+
+
+def run(job_id, user_id, repo_ids, update_projects=True, set_hooks=False,
+        set_commits=True):
+    """
+    Runs the import `job_id`, started by `start`. Must be run within a
+    request context for the site, to build hook URLs.
+    """
+    job = _Progress(current_app.redis, job_id)
+    job.set(state='running')
+    try:
+        error = _run(
+            job, user_id, repo_ids,
+            update_projects=update_projects,
+            set_hooks=set_hooks,
+            set_commits=set_commits
+        )
+    except Exception:
+        logger.exception('GitHub import {0} failed.'.format(job_id))
+        db.session.rollback()
+        error = 'Something went wrong, please try again.'
+
+    if error:
+        job.set(state='failed', error=error)
+    else:
+        job.set(state='done')
+
+
+def _run(job, user_id, repo_ids, update_projects, set_hooks, set_commits):
+    user = User.query.get(user_id)
+    token = AuthToken.query.filter_by(
+        name='github',
+        owner_id=user_id
+    ).first()
+    if user is None or token is None:
+        return 'Your GitHub account is no longer connected.'
+
+    selected = list(repos(client(token), repo_ids))
+    job.set(total=len(selected))
+
+    names = set(repo.name.lower() for repo in selected)
+    existing = set()
+    if names:
+        existing = set(name.lower() for name, in db.session.query(
+            Project.name
+        ).filter(
+            Project.owner_id == user.id,
+            func.lower(Project.name).in_(names)
+        ))
+
+    # Decide what happens to each repository, creating its project if
+    # need be. Repositories of the same name share a project.
+    imported = []
+    new_projects = {}
+    for repo in selected:
+        name = repo.name.lower()
+        if name in existing or name in new_projects:
+            if not update_projects:
+                job.incr('skipped')
+                job.log('Skipping existing project {0}.'.format(repo.name),
+                        False)
+                continue
+            job.incr('updated')
+            job.log('Project {0} updated.'.format(repo.name))
+        else:
+            new_projects[name] = {
+                'owner_id': user.id,
+                'name': repo.name,
+                'full_name': '{0}/{1}'.format(user.username, repo.name),
+                'public': not repo.private,
+                'website': (repo.homepage or '').strip() or None
+            }
+            job.incr('created')
+            job.log('Project {0} created.'.format(repo.name))
+        imported.append(repo)
+
+    if new_projects:
+        db.session.execute(Project.__table__.insert(), new_projects.values())
+        stats.count_rows(db.session, Project, len(new_projects))
+
+    projects = {}
+    if imported:
+        projects = dict(
+            (name.lower(), (id, public)) for name, id, public in (
+                db.session.query(Project.name, Project.id, Project.public)
+                .filter(
+                    Project.owner_id == user.id,
+                    func.lower(Project.name).in_(
+                        set(r.name.lower() for r in imported)
+                    )
+                )
+            )
+        )
+    ids = [id for id, public in projects.values()]
+
+    hooked = set()
+    if set_hooks and ids:
+        hooked = set(pid for pid, in db.session.query(Hook.project_id).filter(
+            Hook.project_id.in_(ids),
+            Hook.service_id == SERVICE_ID
+        ))
+
+    joined = set()
+    if set_commits and ids:
+        channel, host = COMMITS_CHANNEL
+        joined = set(pid for pid, in db.session.query(Channel.project_id)
+                     .filter(
+                         Channel.project_id.in_(ids),
+                         Channel.host == host,
+                         Channel.channel == channel
+                     ))
+
+    hooks, channels, github_hooks = [], [], []
+    # The key of the hook created for each repository.
+    keys = {}
+    for repo in imported:
+        pid, public = projects[repo.name.lower()]
+        if set_hooks and pid not in hooked:
+            hooked.add(pid)
+            key = keys[repo.full_name] = Hook._new_key()
+            hooks.append({
+                'project_id': pid,
+                'key': key,
+                'service_id': SERVICE_ID
+            })
+            github_hooks.append((repo.full_name, url_for(
+                'projects.hook_receive',
+                pid=pid,
+                key=key,
+                _external=True
+            )))
+        if set_commits and public and pid not in joined:
+            joined.add(pid)
+            channel, host = COMMITS_CHANNEL
+            channels.append({
+                'project_id': pid,
+                'channel': channel,
+                'host': host,
+                'port': 6667,
+                'ssl': False,
+                'public': True
+            })
+
+    if hooks:
+        db.session.execute(Hook.__table__.insert(), hooks)
+        stats.count_rows(db.session, Hook, len(hooks))
+    if channels:
+        db.session.execute(Channel.__table__.insert(), channels)
+        stats.count_rows(db.session, Channel, len(channels))
+        network_stats.changed(db.session, COMMITS_CHANNEL[1])
+
+    page_cache.changed(db.session, 'project', 'hook', 'channel')
+    db.session.commit()
+
+    if not github_hooks:
+        return
+
+    job.set(hooks_total=len(github_hooks))
+    created = set()
+    try:
+        for full_name in _create_hooks(job, token.token, github_hooks):
+            created.add(full_name)
+    finally:
+        # Hooks GitHub will never call are removed again, so importing
+        # the repositories again tries them again.
+        failed = [
+            keys[full_name] for full_name, url in github_hooks
+            if full_name not in created
+        ]
+        if failed:
+            Hook.query.filter(
+                Hook.key.in_(failed),
+                Hook.project_id.in_(ids)
+            ).delete(synchronize_session=False)
+            stats.count_rows(db.session, Hook, -len(failed))
+            page_cache.changed(db.session, 'hook')
+            db.session.commit()
+
+
+def _create_hooks(job, token, github_hooks):
+    """
+    Creates the web hooks `github_hooks` on GitHub, several at once,
+    yielding the full name of each repository it was created for.
+    """
+    limit = RateLimit()
+    pool = ThreadPool(min(
+        current_app.config['NOTIFICO_GITHUB_IMPORT_CONCURRENCY'],
+        len(github_hooks)
+    ))
+    try:
+        for full_name, error in pool.imap_unordered(
+                partial(_create_hook, token, limit), github_hooks):
+            if error:
+                job.incr('hooks_failed')
+                job.log(u'Could not add a web hook to {0}: {1}'.format(
+                    full_name,
+                    error
+                ), False)
+            else:
+                job.incr('hooks_created')
+                job.log('Web hook added to {0}.'.format(full_name))
+                yield full_name
+    finally:
+        pool.close()
+        pool.join()
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Message history, kept in capped Redis streams.
+
+Every message sent for a project is added to the project's own stream,
+and messages for public projects to a global stream as well. Entries are
+stored as plain stream fields rather than JSON, are only decoded when
+they're used, and are paged through by their stream ids, so a page costs
+the same wherever it is in the history. Streams require Redis 5.0.
+
+A project's stream is dropped once a commit deletes the project or
+changes its visibility, so messages sent while it was private are never
+shown publicly.
+"""
+__all__ = ('Entry', 'record', 'page', 'since', 'listen')
+import datetime
+
+from flask import current_app, has_app_context
+from sqlalchemy import String, event, inspect
+from sqlalchemy.sql import column
+
+from notifico.util.keyset import KeysetPage, encode_cursor, decode_cursor
+
+#: Key name for the stream of messages to public projects.
+key_global = 'history'
+#: Key name prefix for the stream of messages to a project.
+key_project_prefix = 'history_project_'
+
+_MAX_SEQUENCE = 2 ** 64 - 1
+
+# Pages are sorted by stream id alone.
+_CURSOR_KEYS = (column('id', String),)
+
+# Session.info key for the projects whose history goes with the commit.
+_PENDING = 'history_pending'
+
+
+def project_key(project_id):
+    return '{0}{1}'.format(key_project_prefix, project_id)
+
+
+def _collect(session, flush_context, instances):
+    """
+    Remembers the projects about to be deleted or to change visibility.
+    """
+    # Must be imported here due to the circular nature of the models and
+    # services.
+    from notifico.models import Project
+
+    pending = session.info.setdefault(_PENDING, set())
+    for obj in session.deleted:
+        if isinstance(obj, Project) and obj.id is not None:
+            pending.add(obj.id)
+    for obj in session.dirty:
+        if (isinstance(obj, Project) and
+                inspect(obj).attrs.public.history.has_changes()):
+            pending.add(obj.id)
+
+
+def _drop(session):
+    """
+    Drops the history of the projects deleted or made public or private
+    by a commit.
+    """
+    project_ids = session.info.pop(_PENDING, None)
+    if project_ids and has_app_context():
+        current_app.redis.delete(*[project_key(id) for id in project_ids])
+
+
+def _discard(session, *args):
+    session.info.pop(_PENDING, None)
+
+
+def listen(session):
+    """
+    Drops the history of projects deleted or made public or private by
+    commits made by `session`.
+    """
+    for name, f in (
+            ('before_flush', _collect),
+            ('after_commit', _drop),
+            ('after_rollback', _discard)):
+        if not event.contains(session, name, f):
+            event.listen(session, name, f)
+
+
+class Entry(object):
+    """
+    A message in the history.
+    """
+    __slots__ = ('id', '_fields')
+
+    def __init__(self, id, fields):
+        self.id = id
+        self._fields = fields
+
+    @property
+    def message(self):
+        return self._fields['m'].decode('utf-8', 'replace')
+
+    @property
+    def project_id(self):
+        return int(self._fields['p'])
+
+    @property
+    def project_name(self):
+        """
+        The full name (owner/name) of the project when the message was
+        sent.
+        """
+        return self._fields.get('n', '').decode('utf-8', 'replace')
+
+    @property
+    def owner_id(self):
+        return int(self._fields['o'])
+
+    @property
+    def created(self):
+        """
+        When the message was sent, from its stream id.
+        """
+        ms = int(self.id.split('-', 1)[0])
+        return datetime.datetime.utcfromtimestamp(ms / 1000.0)
+
+
+def record(redis, message, project, project_size=100, global_size=10000):
+    """
+    Adds `message` to the history of `project`, keeping (roughly) the last
+    `project_size` messages for the project and `global_size` for the
+    global history. Returns the ids of the new entries in the project and
+    global histories, the latter ``None`` for private projects.
+    """
+    if isinstance(message, unicode):
+        message = message.encode('utf-8')
+
+    fields = {
+        'm': message,
+        'n': project.full_name.encode('utf-8'),
+        'p': project.id,
+        'o': project.owner_id
+    }
+
+    with redis.pipeline() as pipe:
+        pipe.xadd(
+            project_key(project.id),
+            fields,
+            maxlen=project_size,
+            approximate=True
+        )
+        if project.public:
+            pipe.xadd(key_global, fields, maxlen=global_size, approximate=True)
+        ids = pipe.execute()
+
+    return ids[0], ids[1] if len(ids) > 1 else None
+
+
+def _adjacent(id, step):
+    """
+    Returns the stream id just after (`step` of 1) or just before (`step`
+    of -1) `id`.
+    """
+    ms, sequence = [int(part) for part in id.split('-')]
+    sequence += step
+    if sequence < 0:
+        ms, sequence = ms - 1, _MAX_SEQUENCE
+    elif sequence > _MAX_SEQUENCE:
+        ms, sequence = ms + 1, 0
+    return '{0}-{1}'.format(ms, sequence)
+
+
+def page(redis, project_id=None, cursor=None, per_page=25):
+    """
+    Returns the `KeysetPage` of `Entry` from the history of `project_id`,
+    or the global history, following `cursor`, newest first.
+    """
+    key = key_global if project_id is None else project_key(project_id)
+
+    position = decode_cursor(cursor, _CURSOR_KEYS) if cursor else None
+    direction, values = position or ('next', None)
+    try:
+        edge = _adjacent(
+            str(values[0]),
+            1 if direction == 'prev' else -1
+        ) if values else None
+    except ValueError:
+        direction, values, edge = 'next', None, None
+
+    if direction == 'prev':
+        items = redis.xrange(key, min=edge, count=per_page + 1)
+        more = len(items) > per_page
+        items = items[:per_page]
+        items.reverse()
+        # We came back from the next page, so there must be one.
+        has_next, has_prev = True, more
+    else:
+        items = redis.xrevrange(key, max=edge or '+', count=per_page + 1)
+        more = len(items) > per_page
+        items = items[:per_page]
+        has_next, has_prev = more, values is not None
+
+    entries = [Entry(id, fields) for id, fields in items]
+
+    next_cursor = prev_cursor = None
+    if entries:
+        if has_next:
+            next_cursor = encode_cursor('next', [entries[-1].id])
+        if has_prev:
+            prev_cursor = encode_cursor('prev', [entries[0].id])
+
+    return KeysetPage(
+        entries,
+        per_page,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor
+    )
+
+
+def since(redis, last_id, project_id=None, count=100):
+    """
+    Returns (at most) the latest `count` entries from the history of
+    `project_id`, or the global history, after the entry `last_id`, oldest
+    first.
+    """
+    key = key_global if project_id is None else project_key(project_id)
+
+    try:
+        start = _adjacent(str(last_id), 1)
+    except ValueError:
+        return []
+
+    items = redis.xrevrange(key, min=start, count=count)
+    items.reverse()
+    return [Entry(id, fields) for id, fields in items]
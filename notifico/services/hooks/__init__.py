@@ -1,12 +1,20 @@
 # -*- coding: utf8 -*-
 from notifico.services.hooks.hook import *
-from notifico.services.hooks.bitbucket import *
-from notifico.services.hooks.github import *
-from notifico.services.hooks.hook import *
-from notifico.services.hooks.plain import *
-from notifico.services.hooks.jenkins import *
-from notifico.services.hooks.jira import *
-from notifico.services.hooks.cia import *
-from notifico.services.hooks.travisci import *
-from notifico.services.hooks.appveyor import *
-from notifico.services.hooks.gitlab import *
+
+# Each service is only imported the first time it's looked up in
+# `HookService.services`, so processes that never handle a hook don't
+# pay for their dependencies and forms.
+for service_id, module in (
+        (10, 'github'),
+        (20, 'plain'),
+        (30, 'bitbucket'),
+        (40, 'jira'),
+        (50, 'cia'),
+        (60, 'travisci'),
+        (70, 'jenkins'),
+        (80, 'appveyor'),
+        (90, 'gitlab')):
+    HookService.services.declare(
+        service_id,
+        'notifico.services.hooks.' + module
+    )
@@ -6,7 +6,8 @@ from hashlib import sha256
 
 import flask_wtf as wtf
 
-from notifico.services.hooks import HookService
+from notifico.services.hooks import HookService, MessageTemplate
+from notifico.services.hooks.forms import TemplateOverridesField
 
 class AppVeyorConfigForm(wtf.Form):
     use_colors = wtf.BooleanField('Use Colors', validators=[
@@ -14,6 +15,12 @@ class AppVeyorConfigForm(wtf.Form):
     ], default=True, description=(
         'If checked, commit messages will include minor mIRC coloring.'
     ))
+    templates = TemplateOverridesField('Message Templates', validators=[
+        wtf.Optional()
+    ], description=(
+        'Optionally override message templates, one per line in the form'
+        ' <code>name = template</code>, from the templates listed above.'
+    ))
 
 class AppVeyorHook(HookService):
     """
@@ -22,6 +29,20 @@ class AppVeyorHook(HookService):
     SERVICE_NAME = 'AppVeyor'
     SERVICE_ID = 80
 
+    templates = {
+        'prefix': MessageTemplate(u'{RESET}[{BLUE}{name}{RESET}] '),
+        'summary': MessageTemplate(
+            u'AppVeyor - build {number}: '
+            u'{status_color}{message}{RESET}. '
+            u'({GREEN}{branch}{RESET} @ {GREEN}{commit}{RESET})',
+            color_fields=('status_color',)
+        ),
+        'pull_request': MessageTemplate(
+            u'(pull request {GREEN}#{num}{RESET})'
+        ),
+        'details': MessageTemplate(u'Details: {url}')
+    }
+
     @classmethod
     def service_description(cls):
         return cls.env().get_template('appveyor_desc.html').render()
@@ -34,69 +55,65 @@ class AppVeyorHook(HookService):
         
         # event_name = payload['eventName']
         event_data = payload['eventData']
-        
-        strip = not hook.config.get('use_colors', True)
 
-        summary = cls._create_summary(event_data)
-        details = 'Details: {0}'.format(event_data['buildUrl'])
-        details = cls._prefix_line(details, event_data)
+        summary = cls._create_summary(event_data, hook.config)
+        details = cls.render(
+            hook.config,
+            'details',
+            url=event_data['buildUrl']
+        )
+        details = cls._prefix_line(details, event_data, hook.config)
 
-        yield cls.message(summary, strip)
-        yield cls.message(details, strip)
+        # Colors have already been dealt with by the templates.
+        yield cls.message(summary, False)
+        yield cls.message(details, False)
 
     @classmethod
-    def _prefix_line(cls, line, event_data):
+    def _prefix_line(cls, line, event_data, config):
         """
         Prefixes lines with [RepoName] and adds colours
         """
-
-        prefix = u'{RESET}[{BLUE}{name}{RESET}] '.format(
-            name=event_data['projectName'],
-            **HookService.colors
+        prefix = cls.render(
+            config,
+            'prefix',
+            name=event_data['projectName']
         )
         return prefix + line
 
     @classmethod
-    def _create_summary(cls, payload):
+    def _create_summary(cls, payload, config):
         """
         Create and return a one-line summary of the build
         """
+        # Neither failed nor passed (ex: cancelled).
+        status_color = 'ORANGE'
         if payload['failed'] == True:
-            status_colour = HookService.colors['RED']
+            status_color = 'RED'
         elif payload['passed'] == True:
-            status_colour = HookService.colors['GREEN']
+            status_color = 'GREEN'
 
         lines = []
 
-        # Build number
-        lines.append(u'AppVeyor - build {number}:'.format(
+        # Build number, status and branch & commit hash
+        lines.append(cls.render(
+            config,
+            'summary',
             number=payload['buildVersion'],
-        ))
-
-        # Status and correct colours
-        lines.append(u'{status}{message}{RESET}.'.format(
-            status=status_colour,
+            status_color=status_color,
             message=payload['status'],
-            **HookService.colors
-        ))
-
-        # branch & commit hash
-        lines.append(u'({G}{branch}{R} @ {G}{commit}{R})'.format(
             branch=payload['branch'],
-            commit=payload['commitId'][:7],
-            G=HookService.colors['GREEN'],
-            R=HookService.colors['RESET']
+            commit=payload['commitId'][:7]
         ))
         
         if payload['isPullRequest'] == True:
-            lines.append(u'(pull request {G}#{n}{R})'.format(
-                n=payload['pullRequestId'],
-                G=HookService.colors['GREEN'],
-                R=HookService.colors['RESET']
+            lines.append(cls.render(
+                config,
+                'pull_request',
+                num=payload['pullRequestId']
             ))
         
         line = u' '.join(lines)
-        return cls._prefix_line(line, payload)
+        return cls._prefix_line(line, payload, config)
 
     @classmethod
     def form(cls):
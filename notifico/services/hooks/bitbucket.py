@@ -5,7 +5,9 @@ import json
 
 import flask_wtf as wtf
 
-from notifico.services.hooks import HookService
+from notifico.services.hooks import HookService, MessageTemplate
+from notifico.services.hooks.forms import TemplateOverridesField
+from notifico.services.hooks.push import Commit, PushEvent, render_push
 
 
 class BitbucketConfigForm(wtf.Form):
@@ -33,136 +35,82 @@ class BitbucketConfigForm(wtf.Form):
         ' <code>Tyler Kennedy &lt;tk@tkte.ch&gt;</code> instead of'
         ' <code>TkTech</code>.'
     ))
+    templates = TemplateOverridesField('Message Templates', validators=[
+        wtf.Optional()
+    ], description=(
+        'Optionally override message templates, one per line in the form'
+        ' <code>name = template</code>, from the templates listed above.'
+    ))
 
 
-def simplify_payload(payload):
-    result = {
-        'branch': None,
-        'tag': None,
-        'pusher': None,
-        'files': {
-            'all': set(),
-            'added': set(),
-            'removed': set(),
-            'modified': set()
-        },
-        'original': payload
-    }
-
-    for commit in payload.get('commits', tuple()):
-        # Summarize file changes among all the commits
-        # in this push.
-        for file_ in commit.get('files', tuple()):
-            type_, name = file_['type'], file_['file']
-            result['files'][type_].add(name)
-            result['files']['all'].add(name)
-
-        # Usually only the last commit in the chain will
-        # include the "branch" or "branches" tag.
-        branch = commit.get('branch')
-        if branch:
-            result['branch'] = branch
-
-    # The username of whoever made this push.
-    result['pusher'] = payload.get('user')
-
-    return result
-
-
-def _make_summary_line(hook, j, config):
+def push_event(payload, config):
     """
-    Create a formatted line summarizing the commits in `j`.
+    Returns a `PushEvent` filled in from the bitbucket POST `payload`.
     """
-    original = j['original']
-    show_branch = config.get('show_branch', True)
-
-    # Buffer for the line summary.
-    line = []
-
-    # Project name
-    line.append(u'{RESET}[{BLUE}{name}{RESET}]'.format(
-        name=original['repository']['name'],
-        **HookService.colors
-    ))
-
-    if j['pusher']:
-        line.append(u'{ORANGE}{pusher}{RESET} pushed'.format(
-            pusher=j['pusher'],
-            **HookService.colors
-        ))
+    show_raw_author = config.get('show_raw_author', False)
 
-    # Commit count
-    line.append(u'{GREEN}{count}{RESET} {commits}'.format(
-        count=len(original['commits']),
-        commits='commit' if len(original['commits']) == 1 else 'commits',
-        **HookService.colors
-    ))
+    branch = None
+    commits = []
+    for commit in payload.get('commits', tuple()):
+        files = {'added': [], 'removed': [], 'modified': []}
+        for file_ in commit.get('files', tuple()):
+            files[file_['type']].append(file_['file'])
 
-    if show_branch and j['branch']:
-        line.append(u'to {GREEN}{branch}{RESET}'.format(
-            branch=j['branch'],
-            **HookService.colors
+        commits.append(Commit(
+            commit['node'],
+            commit['message'],
+            author=commit['raw_author'] if show_raw_author else commit['author'],
+            **files
         ))
 
-    # File movement summary.
-    line.append(u'[+{added}/-{removed}/\u00B1{modified}]'.format(
-        added=len(j['files']['added']),
-        removed=len(j['files']['removed']),
-        modified=len(j['files']['modified'])
-    ))
+        # Usually only the last commit in the chain will
+        # include the "branch" or "branches" tag.
+        if commit.get('branch'):
+            branch = commit['branch']
 
     # TODO: We can apparently build URLs to show comparisons
     #       using /compare/<lc>..<lr>, which is completely
     #       undocumented. For now build a link to the last
     #       commit in the set.
-    link = u'{0}{1}commits/'.format(
-        original['canon_url'],
-        original['repository']['absolute_url'],
-        original['commits'][-1]['node']
+    link = None
+    if commits:
+        link = u'{0}{1}commits/{2}'.format(
+            payload['canon_url'],
+            payload['repository']['absolute_url'],
+            commits[-1].sha
+        )
+
+    return PushEvent(
+        payload['repository']['name'],
+        commits,
+        # The username of whoever made this push.
+        pusher=payload.get('user'),
+        branch=branch,
+        link=link,
+        payload=payload
     )
-    line.append(u'{PINK}{0}{RESET}'.format(
-        BitbucketHook.shorten(link),
-        **HookService.colors
-    ))
-
-    return u' '.join(line)
-
-
-def _make_commit_line(hook, j, commit):
-    """
-    Create a formatted line summarizing the single commit `commit`.
-    """
-    line = []
-
-    original = j['original']
-    config = hook.config or {}
-    show_raw_author = config.get('show_raw_author', False)
-
-    line.append(u'{RESET}[{BLUE}{name}{RESET}]'.format(
-        name=original['repository']['name'],
-        **HookService.colors
-    ))
-
-    line.append(u'{ORANGE}{0}{RESET}'.format(
-        commit['raw_author'] if show_raw_author else commit['author'],
-        **HookService.colors
-    ))
-
-    line.append(u'{GREEN}{0}{RESET}'.format(
-        commit['node'][:7],
-        **HookService.colors
-    ))
-
-    line.append(u'-')
-    line.append(commit['message'])
-
-    return u' '.join(line)
 
 
 class BitbucketHook(HookService):
     SERVICE_NAME = 'Bitbucket'
     SERVICE_ID = 30
 
+    templates = {
+        'prefix': MessageTemplate(u'{RESET}[{BLUE}{name}{RESET}]'),
+        'pusher': MessageTemplate(u'{ORANGE}{pusher}{RESET} pushed'),
+        'who': MessageTemplate(u'{ORANGE}{who}{RESET}'),
+        'sha': MessageTemplate(u'{GREEN}{sha}{RESET}'),
+        'text': MessageTemplate(u'{text}'),
+        'commit_count': MessageTemplate(
+            u'{GREEN}{count}{RESET} {commits}'
+        ),
+        'to_branch': MessageTemplate(u'to {GREEN}{branch}{RESET}'),
+        'files': MessageTemplate(
+            u'[+{added}/-{removed}/\u00B1{modified}]'
+        ),
+        'link': MessageTemplate(u'{PINK}{url}{RESET}')
+    }
+
     @classmethod
     def service_description(cls):
         return cls.env().get_template('bitbucket_desc.html').render()
@@ -173,27 +121,25 @@ class BitbucketHook(HookService):
         if not p:
             return
 
-        j = simplify_payload(json.loads(p))
-        original = j['original']
-
         config = hook.config or {}
-        strip = not config.get('use_colors', True)
         branches = config.get('branches', None)
 
-        if not original['commits']:
+        event = push_event(json.loads(p), config)
+
+        if not event.commits:
             # TODO: No commits, nothing to do. We should add an option for
             # showing tag activity.
             return
 
         if branches:
             branches = [b.strip().lower() for b in branches.split(',')]
-            if j['branch'] and j['branch'].lower() not in branches:
+            if event.branch and event.branch.lower() not in branches:
                 # This isn't a branch the user wants.
                 return
 
-        yield cls.message(_make_summary_line(hook, j, config), strip=strip)
-        for commit in original['commits']:
-            yield cls.message(_make_commit_line(hook, j, commit), strip=strip)
+        # Colors have already been dealt with by the templates.
+        for line in render_push(cls, event, config):
+            yield cls.message(line, strip=False)
 
     @classmethod
     def form(cls):
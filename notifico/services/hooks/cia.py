@@ -9,7 +9,8 @@ import flask_wtf as wtf
 from flaskext.xmlrpc import XMLRPCHandler
 
 from notifico import db
-from notifico.services.hooks import HookService
+from notifico.services.hooks import HookService, MessageTemplate
+from notifico.services.hooks.forms import TemplateOverridesField
 
 
 handler = XMLRPCHandler('hub')
@@ -22,6 +23,12 @@ class CIAConfigForm(wtf.Form):
     ], default=True, description=(
         'If checked, messages will include minor mIRC coloring.'
     ))
+    templates = TemplateOverridesField('Message Templates', validators=[
+        wtf.Optional()
+    ], description=(
+        'Optionally override message templates, one per line in the form'
+        ' <code>name = template</code>, from the templates listed above.'
+    ))
 
 
 class CIAHook(HookService):
@@ -31,6 +38,16 @@ class CIAHook(HookService):
     SERVICE_NAME = 'cia.vc'
     SERVICE_ID = 50
 
+    templates = {
+        'prefix': MessageTemplate(u'{RESET}[{BLUE}{name}{RESET}]'),
+        'author': MessageTemplate(u'{GREEN}{author}{RESET}'),
+        'branch': MessageTemplate(u'{YELLOW}{branch}{RESET}'),
+        'revision': MessageTemplate(u'r{revision}'),
+        'module': MessageTemplate(u'{module} /'),
+        'files': MessageTemplate(u'{files} files'),
+        'log': MessageTemplate(u': {log}')
+    }
+
     @classmethod
     def service_description(cls):
         return cls.env().get_template('cia_desc.html').render()
@@ -39,8 +56,6 @@ class CIAHook(HookService):
     def handle_request(cls, user, request, hook, message):
         # Config may not exist for pre-migrate hooks.
         config = hook.config or {}
-        # Should we get rid of mIRC colors before sending?
-        strip = not config.get('use_colors', True)
 
         doc = xmltodict.parse(message.encode("utf-8"))
         message = doc['message']
@@ -58,45 +73,29 @@ class CIAHook(HookService):
 
         line = []
 
-        line.append('{RESET}[{BLUE}{name}{RESET}]'.format(
-            name=project,
-            **HookService.colors
-        ))
+        line.append(cls.render(config, 'prefix', name=project))
 
         if author:
-            line.append('{GREEN}{author}{RESET}'.format(
-                author=author,
-                **HookService.colors
-            ))
+            line.append(cls.render(config, 'author', author=author))
 
         if branch:
-            line.append('{YELLOW}{branch}{RESET}'.format(
-                branch=branch,
-                **HookService.colors
-            ))
+            line.append(cls.render(config, 'branch', branch=branch))
 
         line.append('*')
         if revision:
-            line.append('r{revision}'.format(
-                revision=revision
-            ))
+            line.append(cls.render(config, 'revision', revision=revision))
 
         if module:
-            line.append('{module} /'.format(
-                module=module
-            ))
+            line.append(cls.render(config, 'module', module=module))
 
         if files:
-            line.append('{files} files'.format(
-                files=len(files)
-            ))
+            line.append(cls.render(config, 'files', files=len(files)))
 
         if log:
-            line.append(': {log}'.format(
-                log=log
-            ))
+            line.append(cls.render(config, 'log', log=log))
 
-        yield cls.message(' '.join(line), strip=strip)
+        # Colors have already been dealt with by the templates.
+        yield cls.message(' '.join(line), strip=False)
 
     @classmethod
     def form(cls):
@@ -115,6 +114,7 @@ def deliver(message):
     # Must be imported here due to the circular nature of
     # Hook <-> HookService.
     from notifico.models import Hook, Project
+    from notifico.services import page_cache, stats
 
     key = request.args.get('key')
     pid = request.args.get('pid')
@@ -136,6 +136,8 @@ def deliver(message):
     Project.query.filter_by(id=h.project.id).update({
         Project.message_count: Project.message_count + 1
     })
+    page_cache.changed(db.session, page_cache.MESSAGE_COUNT)
+    stats.count_message(db.session, h.project)
 
     hook = HookService.services.get(h.service_id)
     if hook is None:
@@ -0,0 +1,29 @@
+# -*- coding: utf8 -*-
+"""
+Form fields shared by the services' configuration forms. Kept apart from
+`HookService`, so importing the services alone doesn't pull in WTForms.
+"""
+__all__ = ('TemplateOverridesField',)
+import flask_wtf as wtf
+
+
+class TemplateOverridesField(wtf.TextAreaField):
+    """
+    A text area of ``name = template`` lines, one for each of a service's
+    templates being overridden, stored as a dict.
+    """
+    def process_formdata(self, valuelist):
+        self.data = {}
+        if not valuelist:
+            return
+
+        for line in valuelist[0].splitlines():
+            name, _, source = line.partition('=')
+            if name.strip() and source.strip():
+                self.data[name.strip()] = source.strip()
+
+    def _value(self):
+        return u'\n'.join(
+            u'{0} = {1}'.format(k, v)
+            for k, v in sorted((self.data or {}).items())
+        )
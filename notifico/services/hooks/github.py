@@ -3,61 +3,100 @@ __all__ = ('GithubHook',)
 
 import re
 import json
-import requests
 
 import flask_wtf as wtf
 from functools import wraps
 from wtforms.fields import SelectMultipleField
 
-from notifico.services.hooks import HookService
+from notifico.services import handles
+from notifico.services.hooks import HookService, MessageTemplate
+from notifico.services.hooks.forms import TemplateOverridesField
+from notifico.services.hooks.push import Commit, PushEvent, render_push
 
 
-COMMIT_MESSAGE_LENGTH_LIMIT = 1000
+_REF_R = re.compile(r'refs/(heads|tags)/(.*)$')
 
 
-def simplify_payload(payload):
+def _project_name(payload, config):
     """
-    Massage the github webhook payload into something a little more
-    usable. Idea comes from gith by danheberden.
+    Returns the name of the repository in `payload`, in the
+    <username>/<project name> form if the user wants it rather than the
+    Notifico name.
     """
-    result = {
-        'branch': None,
-        'tag': None,
-        'pusher': None,
-        'files': {
-            'all': [],
-            'added': [],
-            'removed': [],
-            'modified': []
-        },
-        'original': payload
-    }
+    project_name = payload['repository']['name']
+    if config.get('full_project_name', False):
+        project_name = '{username}/{project_Name}'.format(
+            username=payload['repository']['owner']['name'],
+            project_Name=project_name
+        )
+    return project_name
+
+
+def push_event(payload, config, project_name=None):
+    """
+    Returns a `PushEvent` filled in from the github webhook push
+    `payload`. Idea comes from gith by danheberden.
+    """
+    branch = tag = None
 
     # Try to find the branch/tag name from `ref`, falling back to `base_ref`.
-    ref_r = re.compile(r'refs/(heads|tags)/(.*)$')
     for ref in (payload.get('ref', ''), payload.get('base_ref', '')):
-        match = ref_r.match(ref)
+        match = _REF_R.match(ref)
         if match:
             type_, name = match.group(1, 2)
-            result[{'heads': 'branch', 'tags': 'tag'}[type_]] = name
+            if type_ == 'heads':
+                branch = name
+            else:
+                tag = name
             break
 
     # Github (for whatever reason) doesn't always know the pusher. This field
     # is always missing/nil for commits generated by github itself, and for
     # web hooks coming from the "Test Hook" button.
+    pusher = None
     if 'pusher' in payload:
-        result['pusher'] = payload['pusher'].get('name')
+        pusher = payload['pusher'].get('name')
         # Github returns the string 'none' when a deploy key pushes
-        if result['pusher'] == 'none':
-            result['pusher'] = u'A deploy key'
+        if pusher == 'none':
+            pusher = u'A deploy key'
+
+    prefer_username = config.get('prefer_username', True)
+
+    commits = []
+    for commit in payload.get('commits', ()):
+        committer = commit.get('committer', {})
+        author = commit.get('author', {})
+
+        # Show the committer.
+        attribute_to = None
+        if prefer_username:
+            attribute_to = author.get('username')
+
+        if attribute_to is None:
+            attribute_to = author.get('name')
+            if attribute_to is None:
+                attribute_to = committer.get('name')
+
+        commits.append(Commit(
+            commit['id'],
+            commit['message'],
+            author=attribute_to,
+            distinct=commit.get('distinct', True),
+            added=commit.get('added', ()),
+            removed=commit.get('removed', ()),
+            modified=commit.get('modified', ())
+        ))
 
-    # Summarize file movement over all the commits.
-    for commit in payload.get('commits', tuple()):
-        for type_ in ('added', 'removed', 'modified'):
-            result['files'][type_].extend(commit[type_])
-            result['files']['all'].extend(commit[type_])
+    return PushEvent(
+        project_name or _project_name(payload, config),
+        commits,
+        pusher=pusher,
+        branch=branch,
+        tag=tag,
+        link=payload.get('compare'),
+        payload=payload
+    )
 
-    return result
 
 def is_event_allowed(config, category, event):
     if not config or not config.get('events'):
@@ -198,141 +237,13 @@ class GithubConfigForm(wtf.Form):
     ], default=True, description=(
         'Commits will only be announced the first time they are seen.'
     ))
-
-
-def _create_push_summary(project_name, j, config):
-    """
-    Create and return a one-line summary of the push in `j`.
-    """
-    original = j['original']
-    show_branch = config.get('show_branch', True)
-
-    # Build the push summary.
-    line = []
-
-    line.append(u'{RESET}[{BLUE}{name}{RESET}]'.format(
-        name=project_name,
-        **HookService.colors
-    ))
-
-    # The user doing the push, if available.
-    if j['pusher']:
-        line.append(u'{ORANGE}{pusher}{RESET} pushed'.format(
-            pusher=j['pusher'],
-            **HookService.colors
-        ))
-
-    # The number of commits included in this push.
-    line.append(u'{GREEN}{count}{RESET} {commits}'.format(
-        count=len(original['commits']),
-        commits='commit' if len(original['commits']) == 1 else 'commits',
-        **HookService.colors
-    ))
-
-    if show_branch and j['branch']:
-        line.append(u'to {GREEN}{branch}{RESET}'.format(
-            branch=j['branch'],
-            **HookService.colors
-        ))
-
-    # File movement summary.
-    line.append(u'[+{added}/-{removed}/\u00B1{modified}]'.format(
-        added=len(j['files']['added']),
-        removed=len(j['files']['removed']),
-        modified=len(j['files']['modified'])
-    ))
-
-    # The shortened URL linking to the compare page.
-    line.append(u'{PINK}{compare_link}{RESET}'.format(
-        compare_link=GithubHook.shorten(original['compare']),
-        **HookService.colors
-    ))
-
-    return u' '.join(line)
-
-
-def _create_commit_summary(project_name, j, config):
-    """
-    Create and yield a one-line summary of each commit in `j`.
-    """
-    prefer_username = config.get('prefer_username', True)
-    title_only = config.get('title_only', False)
-
-    original = j['original']
-
-    for commit in original['commits']:
-        if config.get('distinct_only', True):
-            if not commit['distinct']:
-                # This commit has been seen in the repo
-                # before, skip over it and to the next one
-                continue
-
-        committer = commit.get('committer', {})
-        author = commit.get('author', {})
-
-        line = []
-
-        line.append(u'{RESET}[{BLUE}{name}{RESET}]'.format(
-            name=project_name,
-            **HookService.colors
-        ))
-
-        # Show the committer.
-        attribute_to = None
-        if prefer_username:
-            attribute_to = author.get('username')
-            if attribute_to is None:
-                attribute_to = author.get('username')
-
-        if attribute_to is None:
-            attribute_to = author.get('name')
-            if attribute_to is None:
-                attribute_to = committer.get('name')
-
-        if attribute_to:
-            line.append(u'{ORANGE}{attribute_to}{RESET}'.format(
-                attribute_to=attribute_to,
-                **HookService.colors
-            ))
-
-        line.append(u'{GREEN}{sha}{RESET}'.format(
-            sha=commit['id'][:7],
-            **HookService.colors
-        ))
-
-        line.append(u'-')
-
-        message = commit['message']
-        message_lines = message.split('\n')
-        if title_only and len(message_lines) > 0:
-            message = message_lines[0]
-        # Cap the commit message to 1000 characters, this should be around two
-        # lines on IRC and stops really long messages from spamming channels.
-        if len(message) > COMMIT_MESSAGE_LENGTH_LIMIT:
-            message = message[:COMMIT_MESSAGE_LENGTH_LIMIT] + '...'
-        line.append(message)
-
-        yield u' '.join(line)
-
-
-def _create_push_final_summary(project_name, j, config):
-    # The name of the repository.
-    original = j['original']
-    line_limit = config.get('line_limit', 3)
-
-    line = []
-
-    line.append(u'{RESET}[{BLUE}{name}{RESET}]'.format(
-        name=project_name,
-        **HookService.colors
-    ))
-
-    line.append(u'... and {count} more commits.'.format(
-        count=len(original.get('commits', [])) - line_limit
+    templates = TemplateOverridesField('Message Templates', validators=[
+        wtf.Optional()
+    ], description=(
+        'Optionally override message templates, one per line in the form'
+        ' <code>name = template</code>, from the templates listed above.'
     ))
 
-    return u' '.join(line)
-
 
 class GithubHook(HookService):
     """
@@ -340,13 +251,130 @@ class GithubHook(HookService):
     """
     SERVICE_NAME = 'Github'
     SERVICE_ID = 10
+    cache_headers = ('X-GitHub-Event', 'Content-Type')
+
+    templates = {
+        # Fragments used to build push summaries.
+        'prefix': MessageTemplate(u'{RESET}[{BLUE}{name}{RESET}]'),
+        'pusher': MessageTemplate(u'{ORANGE}{pusher}{RESET} pushed'),
+        'who': MessageTemplate(u'{ORANGE}{who}{RESET}'),
+        'sha': MessageTemplate(u'{GREEN}{sha}{RESET}'),
+        'text': MessageTemplate(u'{text}'),
+        'commit_count': MessageTemplate(
+            u'{GREEN}{count}{RESET} {commits}'
+        ),
+        'to_branch': MessageTemplate(u'to {GREEN}{branch}{RESET}'),
+        'files': MessageTemplate(
+            u'[+{added}/-{removed}/\u00B1{modified}]'
+        ),
+        'link': MessageTemplate(u'{PINK}{url}{RESET}'),
+        'more_commits': MessageTemplate(u'... and {count} more commits.'),
+        'tagged': MessageTemplate(u'{GREEN}{sha}{RESET} as'),
+        'ref': MessageTemplate(u'{GREEN}{ref}{RESET}'),
+        # Complete lines for everything else.
+        'ping': MessageTemplate(u'{RESET}[{BLUE}GitHub{RESET}] {zen}'),
+        'issues': MessageTemplate(
+            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} {action} '
+            u'issue {GREEN}#{num}{RESET}: {title} - {PINK}{url}{RESET}'
+        ),
+        'issue_comment': MessageTemplate(
+            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} {action} on '
+            u'{issue_type} {GREEN}#{num}{RESET}: {title} - {PINK}{url}{RESET}'
+        ),
+        'commit_comment': MessageTemplate(
+            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} {action} on '
+            u'commit {GREEN}{commit}{RESET} - {PINK}{url}{RESET}'
+        ),
+        'create': MessageTemplate(
+            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} '
+            u'created {ref_type} {GREEN}{ref}{RESET} - {PINK}{url}{RESET}'
+        ),
+        'create_repository': MessageTemplate(
+            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} '
+            u'created {ref_type}  - {PINK}{url}{RESET}'
+        ),
+        'delete': MessageTemplate(
+            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} deleted '
+            u'{ref_type} {GREEN}{ref}{RESET} - {PINK}{url}{RESET}'
+        ),
+        'pull_request': MessageTemplate(
+            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} {action} pull '
+            u'request {GREEN}#{num}{RESET}: {title} - {PINK}{url}{RESET}'
+        ),
+        'pull_request_review_comment': MessageTemplate(
+            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} reviewed pull '
+            u'request {GREEN}#{num}{RESET} commit - {PINK}{url}{RESET}'
+        ),
+        'gollum': MessageTemplate(
+            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} {action} '
+            u'wiki page {GREEN}{pname}{RESET} - {PINK}{url}{RESET}'
+        ),
+        'gollum_many': MessageTemplate(
+            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} '
+            u'updated the wiki'
+        ),
+        'gollum_page': MessageTemplate(
+            u'{RESET}[{BLUE}{name}{RESET}] wiki page {GREEN}{pname}{RESET}'
+            u' {action} - {PINK}{url}{RESET}'
+        ),
+        'watch': MessageTemplate(
+            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} starred '
+            u'{GREEN}{name}{RESET} - {PINK}{url}{RESET}'
+        ),
+        'release': MessageTemplate(
+            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} {action} '
+            u'{GREEN}{tag_name} | {title}{RESET} - {PINK}{url}{RESET}'
+        ),
+        'fork': MessageTemplate(
+            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} forked '
+            u'the repository - {PINK}{url}{RESET}'
+        ),
+        'member': MessageTemplate(
+            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} {action} '
+            u'user {GREEN}{whom}{RESET} - {PINK}{url}{RESET}'
+        ),
+        'public': MessageTemplate(
+            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} made the '
+            u'repository public!'
+        ),
+        'team_add': MessageTemplate(
+            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} added the'
+            u' team {GREEN}{tname}{RESET} to the repository!'
+        ),
+        'status': MessageTemplate(
+            u'{RESET}[{BLUE}{name}{RESET}] {status_color}{status}{RESET}. '
+            u'{description} - {PINK}{url}{RESET}',
+            color_fields=('status_color',)
+        ),
+        'check_run': MessageTemplate(
+            u'{RESET}[{BLUE}{name}{RESET}] Check Run for '
+            u'{ORANGE}{description}{RESET} {status}. '
+            u'{PINK}{url}{RESET}'
+        ),
+        'check_run_conclusion': MessageTemplate(
+            u'{RESET}[{BLUE}{name}{RESET}] Check Run for '
+            u'{ORANGE}{description}{RESET} {status}: '
+            u'{conclusion_color}{conclusion}{RESET}. '
+            u'{PINK}{url}{RESET}',
+            color_fields=('conclusion_color',)
+        )
+    }
 
     @classmethod
     def service_description(cls):
         return cls.env().get_template('github_desc.html').render()
 
+    @classmethod
+    def accepts(cls, request):
+        return request.headers.get('X-GitHub-Event', '') in cls.event_handlers
+
     @classmethod
     def handle_request(cls, user, request, hook):
+        event = request.headers.get('X-GitHub-Event', '')
+        if event not in cls.event_handlers:
+            # Don't bother decoding payloads we're going to ignore.
+            return
+
         # Support both json payloads as well as form encoded payloads
         if request.headers.get('Content-Type') == 'application/json':
             payload = request.get_json()
@@ -356,63 +384,30 @@ class GithubHook(HookService):
             except KeyError:
                 return
 
-        event = request.headers.get('X-GitHub-Event', '')
-        event_handler = {
-            'ping': cls._handle_ping,
-            'push': cls._handle_push,
-            'issues': cls._handle_issues,
-            'issue_comment': cls._handle_issue_comment,
-            'commit_comment': cls._handle_commit_comment,
-            'create': cls._handle_create,
-            'delete': cls._handle_delete,
-            'pull_request': cls._handle_pull_request,
-            'pull_request_review_comment': (
-                cls._handle_pull_request_review_comment
-            ),
-            'gollum': cls._handle_gollum,
-            'watch': cls._handle_watch,
-            'release': cls._handle_release,
-            'fork': cls._handle_fork,
-            'member': cls._handle_member,
-            'public': cls._handle_public,
-            'team_add': cls._handle_team_add,
-            'status': cls._handle_status,
-            'check_run': cls._handle_check_run,
-            'deployment': cls._handle_deployment,
-            'deployment_status': cls._handle_deployment_status
-        }
-
-        if event not in event_handler:
-            return
-
-        return event_handler[event](user, request, hook, payload)
+        return cls.dispatch(event, user, request, hook, payload)
 
     @classmethod
+    @handles('ping')
     def _handle_ping(cls, user, request, hook, json):
-        yield u'{RESET}[{BLUE}GitHub{RESET}] {zen}'.format(
-            zen=json['zen'],
-            **HookService.colors
-        )
+        yield cls.render(hook.config, 'ping', zen=json['zen'])
 
     @classmethod
+    @handles('issues')
     @action_filter('issue')
     def _handle_issues(cls, user, request, hook, json):
-        fmt_string = (
-            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} {action} '
-            'issue {GREEN}#{num}{RESET}: {title} - {PINK}{url}{RESET}'
-        )
-
-        yield fmt_string.format(
+        yield cls.render(
+            hook.config,
+            'issues',
             name=json['repository']['name'],
             who=json['sender']['login'],
             action=json['action'],
             num=json['issue']['number'],
             title=json['issue']['title'],
-            url=GithubHook.shorten(json['issue']['html_url']),
-            **HookService.colors
+            url=GithubHook.shorten(json['issue']['html_url'])
         )
 
     @classmethod
+    @handles('issue_comment')
     @action_filter('issue_comment')
     def _handle_issue_comment(cls, user, request, hook, json):
         action_dict = {
@@ -420,23 +415,21 @@ class GithubHook(HookService):
             'deleted': 'deleted a comment'
         }
         action = action_dict.get(json['action'], 'commented')
-        fmt_string = (
-            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} {action} on '
-            '{issue_type} {GREEN}#{num}{RESET}: {title} - {PINK}{url}{RESET}'
-        )
 
-        yield fmt_string.format(
+        yield cls.render(
+            hook.config,
+            'issue_comment',
             name=json['repository']['name'],
             who=json['sender']['login'],
             action=action,
             issue_type='pull request' if 'pull_request' in json['issue'] else 'issue',
             num=json['issue']['number'],
             title=json['issue']['title'],
-            url=GithubHook.shorten(json['comment']['html_url']),
-            **HookService.colors
+            url=GithubHook.shorten(json['comment']['html_url'])
         )
 
     @classmethod
+    @handles('commit_comment')
     @action_filter('commit_comment')
     def _handle_commit_comment(cls, user, request, hook, json):
         action_dict = {
@@ -444,308 +437,248 @@ class GithubHook(HookService):
             'deleted': 'deleted a comment'
         }
         action = action_dict.get(json['action'], 'commented')
-        fmt_string = (
-            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} {action} on '
-            'commit {GREEN}{commit}{RESET} - {PINK}{url}{RESET}'
-        )
 
-        yield fmt_string.format(
+        yield cls.render(
+            hook.config,
+            'commit_comment',
             name=json['repository']['name'],
             who=json['comment']['user']['login'],
             action=action,
             commit=json['comment']['commit_id'],
-            url=GithubHook.shorten(json['comment']['html_url']),
-            **HookService.colors
+            url=GithubHook.shorten(json['comment']['html_url'])
         )
 
     @classmethod
+    @handles('create')
     @action_filter('create', 'ref_type')
     def _handle_create(cls, user, request, hook, json):
-        fmt_string = u' '.join([
-            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} '
-            'created {ref_type}',
-            # null/None if repository was created
-            u'{GREEN}{ref}{RESET}' if json['ref'] else u'',
-            u'- {PINK}{url}{RESET}'
-        ])
-
         # URL points to repo, no other url available
-        yield fmt_string.format(
+        yield cls.render(
+            hook.config,
+            # null/None if repository was created
+            'create' if json['ref'] else 'create_repository',
             name=json['repository']['name'],
             who=json['sender']['login'],
             ref_type=json['ref_type'],
             ref=json['ref'],
-            url=GithubHook.shorten(json['repository']['html_url']),
-            **HookService.colors
+            url=GithubHook.shorten(json['repository']['html_url'])
         )
 
     @classmethod
+    @handles('delete')
     @action_filter('delete', 'ref_type')
     def _handle_delete(cls, user, request, hook, json):
-        fmt_string = (
-            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} deleted '
-            '{ref_type} {GREEN}{ref}{RESET} - {PINK}{url}{RESET}'
-        )
-
         # URL points to repo, no other url available
-        yield fmt_string.format(
+        yield cls.render(
+            hook.config,
+            'delete',
             name=json['repository']['name'],
             who=json['sender']['login'],
             ref_type=json['ref_type'],
             ref=json['ref'],
-            url=GithubHook.shorten(json['repository']['html_url']),
-            **HookService.colors
+            url=GithubHook.shorten(json['repository']['html_url'])
         )
 
     @classmethod
+    @handles('pull_request')
     @action_filter('pr')
     def _handle_pull_request(cls, user, request, hook, json):
-        fmt_string = (
-            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} {action} pull '
-            'request {GREEN}#{num}{RESET}: {title} - {PINK}{url}{RESET}'
-        )
-
-        yield fmt_string.format(
+        yield cls.render(
+            hook.config,
+            'pull_request',
             name=json['repository']['name'],
             who=json['sender']['login'],
             action=json['action'],
             num=json['number'],
             title=json['pull_request']['title'],
-            url=GithubHook.shorten(json['pull_request']['html_url']),
-            **HookService.colors
+            url=GithubHook.shorten(json['pull_request']['html_url'])
         )
 
     @classmethod
+    @handles('pull_request_review_comment')
     @action_filter('pr_review')
     def _handle_pull_request_review_comment(cls, user, request, hook, json):
-        fmt_string = (
-            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} reviewed pull '
-            'request {GREEN}#{num}{RESET} commit - {PINK}{url}{RESET}'
-        )
-
         num = json['comment']['pull_request_url'].split('/')[-1]
 
-        yield fmt_string.format(
+        yield cls.render(
+            hook.config,
+            'pull_request_review_comment',
             name=json['repository']['name'],
             who=json['comment']['user']['login'],
             num=num,
-            url=GithubHook.shorten(json['comment']['html_url']),
-            **HookService.colors
+            url=GithubHook.shorten(json['comment']['html_url'])
         )
 
     @classmethod
+    @handles('gollum')
     @action_filter('gollum')
     def _handle_gollum(cls, user, request, hook, json):
         name = json['repository']['name']
 
         if len(json['pages']) > 1:
             # Multiple pages changed
-            fmt_string = (
-                u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} '
-                'updated the wiki'
-            )
-
-            yield fmt_string.format(
+            yield cls.render(
+                hook.config,
+                'gollum_many',
                 name=name,
-                who=json['sender']['login'],
-                **HookService.colors
-            )
-
-            fmt_string_page = (
-                u'{RESET}[{BLUE}{name}{RESET}] wiki page {GREEN}{pname}{RESET}'
-                ' {action} - {PINK}{url}{RESET}'
+                who=json['sender']['login']
             )
 
             for page in json['pages']:
-                yield fmt_string_page.format(
+                yield cls.render(
+                    hook.config,
+                    'gollum_page',
                     name=name,
                     pname=page['page_name'],
                     action=page['action'],
-                    url=GithubHook.shorten(page['html_url']),
-                    **HookService.colors
+                    url=GithubHook.shorten(page['html_url'])
                 )
         else:
             # Only one page
-            fmt_string = (
-                u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} {action} '
-                'wiki page {GREEN}{pname}{RESET} - {PINK}{url}{RESET}'
-            )
-
-            yield fmt_string.format(
+            yield cls.render(
+                hook.config,
+                'gollum',
                 name=name,
                 who=json['sender']['login'],
                 pname=json['pages'][0]['page_name'],
                 action=json['pages'][0]['action'],
-                url=GithubHook.shorten(json['pages'][0]['html_url']),
-                **HookService.colors
+                url=GithubHook.shorten(json['pages'][0]['html_url'])
             )
 
     @classmethod
+    @handles('watch')
     @action_filter('watch')
     def _handle_watch(cls, user, request, hook, json):
-        fmt_string = (
-            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} starred '
-            '{GREEN}{name}{RESET} - {PINK}{url}{RESET}'
-        )
-
-        yield fmt_string.format(
+        yield cls.render(
+            hook.config,
+            'watch',
             name=json['repository']['name'],
             who=json['sender']['login'],
-            url=GithubHook.shorten(json['sender']['html_url']),
-            **HookService.colors
+            url=GithubHook.shorten(json['sender']['html_url'])
         )
 
     @classmethod
+    @handles('release')
     @action_filter('release')
     def _handle_release(cls, user, request, hook, json):
-        fmt_string = (
-            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} {action} '
-            '{GREEN}{tag_name} | {title}{RESET} - {PINK}{url}{RESET}'
-        )
-
-        yield fmt_string.format(
+        yield cls.render(
+            hook.config,
+            'release',
             name=json['repository']['name'],
             who=json['sender']['login'],
             action=json['action'],
             tag_name=json['release']['tag_name'],
             title=json['release']['name'],
-            url=GithubHook.shorten(json['release']['html_url']),
-            **HookService.colors
+            url=GithubHook.shorten(json['release']['html_url'])
         )
 
     @classmethod
+    @handles('fork')
     @action_filter('fork', None)
     def _handle_fork(cls, user, request, hook, json):
-        fmt_string = (
-            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} forked '
-            'the repository - {PINK}{url}{RESET}'
-        )
-
         # URL points to repo, no other url available
-        yield fmt_string.format(
+        yield cls.render(
+            hook.config,
+            'fork',
             name=json['repository']['name'],
             who=json['forkee']['owner']['login'],
-            url=GithubHook.shorten(json['forkee']['owner']['html_url']),
-            **HookService.colors
+            url=GithubHook.shorten(json['forkee']['owner']['html_url'])
         )
 
     @classmethod
+    @handles('member')
     @action_filter('member')
     def _handle_member(cls, user, request, hook, json):
-        fmt_string = (
-            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} {action} '
-            'user {GREEN}{whom}{RESET} - {PINK}{url}{RESET}'
-        )
-
-        yield fmt_string.format(
+        yield cls.render(
+            hook.config,
+            'member',
             name=json['repository']['name'],
             who=json['sender']['login'],
             action=json['action'],
             whom=json['member']['login'],
-            url=GithubHook.shorten(json['member']['html_url']),
-            **HookService.colors
+            url=GithubHook.shorten(json['member']['html_url'])
         )
 
     @classmethod
+    @handles('public')
     @action_filter('public', None)
     def _handle_public(cls, user, request, hook, json):
-        fmt_string = (
-            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} made the '
-            'repository public!'
-        )
-
-        yield fmt_string.format(
+        yield cls.render(
+            hook.config,
+            'public',
             name=json['repository']['name'],
-            who=json['sender']['login'],
-            **HookService.colors
+            who=json['sender']['login']
         )
 
     @classmethod
+    @handles('team_add')
     @action_filter('team_add', None)
     def _handle_team_add(cls, user, request, hook, json):
-        fmt_string = (
-            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} added the'
-            ' team {GREEN}{tname}{RESET} to the repository!'
-        )
-
-        yield fmt_string.format(
+        yield cls.render(
+            hook.config,
+            'team_add',
             name=json['repository']['name'],
             who=json['sender']['login'],
-            tname=json['team']['name'],
-            **HookService.colors
+            tname=json['team']['name']
         )
 
     @classmethod
+    @handles('status')
     @action_filter('status', 'state')
     def _handle_status(cls, user, request, hook, json):
-        fmt_string = (
-            u'{RESET}[{BLUE}{name}{RESET}] {status_color}{status}{RESET}. '
-            '{description} - {PINK}{url}{RESET}'
-        )
-
-        status_color = HookService.colors['GREEN']
+        status_color = 'GREEN'
         if not json['state'].lower() == 'success':
-            status_color = HookService.colors['RED']
+            status_color = 'RED'
 
-        yield fmt_string.format(
+        yield cls.render(
+            hook.config,
+            'status',
             name=json['repository']['name'],
             status_color=status_color,
             status=json['state'].capitalize(),
             description=json['description'],
-            url=json['target_url'],
-            **HookService.colors
+            url=json['target_url']
         )
 
     @classmethod
+    @handles('check_run')
     @action_filter('check_run')
     def _handle_check_run(cls, user, request, hook, json):
-        conclusion_color = HookService.colors['GREEN']
+        conclusion_color = 'GREEN'
         conclusion = json['check_run']['conclusion']
+        template = 'check_run'
         if conclusion is not None:
             if not conclusion == 'success':
-                conclusion_color = HookService.colors['RED']
+                conclusion_color = 'RED'
             conclusion = conclusion.capitalize()
-            fmt_string = (
-                u'{RESET}[{BLUE}{name}{RESET}] Check Run for '
-                '{ORANGE}{description}{RESET} {status}: '
-                '{conclusion_color}{conclusion}{RESET}. '
-                '{PINK}{url}{RESET}'
-            )
-        else:
-            fmt_string = (
-                u'{RESET}[{BLUE}{name}{RESET}] Check Run for '
-                '{ORANGE}{description}{RESET} {status}. '
-                '{PINK}{url}{RESET}'
-            )
-
+            template = 'check_run_conclusion'
 
-        yield fmt_string.format(
+        yield cls.render(
+            hook.config,
+            template,
             name=json['repository']['name'],
             status=json['check_run']['status'],
             conclusion=conclusion,
             conclusion_color=conclusion_color,
             description=json['check_run']['name'],
-            url=json['check_run']['details_url'],
-            **HookService.colors
+            url=json['check_run']['details_url']
         )
 
     @classmethod
+    @handles('deployment')
     def _handle_deployment(cls, user, request, hook, json):
         yield ''
 
     @classmethod
+    @handles('deployment_status')
     def _handle_deployment_status(cls, user, request, hook, json):
         yield ''
 
     @classmethod
+    @handles('push')
     def _handle_push(cls, user, request, hook, json):
-        j = simplify_payload(json)
-        original = j['original']
-
         # Config may not exist for pre-migrate hooks.
         config = hook.config or {}
-        # Should we get rid of mIRC colors before sending?
-        strip = not config.get('use_colors', True)
         # Branch names to filter on.
         branches = config.get('branches', None)
         # Display tag activity?
@@ -753,181 +686,103 @@ class GithubHook(HookService):
         # Limit the number of lines to display before the summary.
         # 3 is the default on github.com's IRC service
         line_limit = config.get('line_limit', 3)
-        # The use wants the <username>/<project name> form from
-        # github, not the Notifico name.
-        full_project_name = config.get('full_project_name', False)
+
+        event = push_event(json, config)
 
         if branches:
             # The user wants to filter by branch name.
             branches = [b.strip().lower() for b in branches.split(',')]
-            if j['branch'] and j['branch'].lower() not in branches:
+            if event.branch and event.branch.lower() not in branches:
                 # This isn't a branch the user wants.
                 return
 
-        if not original['commits']:
-            if show_tags and j['tag']:
+        if not event.commits:
+            # Colors have already been dealt with by the templates.
+            if show_tags and event.tag:
                 yield cls.message(
-                    cls._create_non_commit_summary(j, config),
-                    strip=strip
+                    cls._create_non_commit_summary(event, config),
+                    strip=False
                 )
-            if j['branch']:
+            if event.branch:
                 yield cls.message(
-                    cls._create_non_commit_summary(j, config),
-                    strip=strip
+                    cls._create_non_commit_summary(event, config),
+                    strip=False
                 )
 
             # No commits, no tags, no new branch. Nothing to do
             return
 
-        project_name = original['repository']['name']
-        if full_project_name:
-            project_name = '{username}/{project_Name}'.format(
-                username=original['repository']['owner']['name'],
-                project_Name=project_name
-            )
-
         if not is_event_allowed(config, 'push', None):
             return
 
-        # A short summarization of the commits in the push.
-        yield cls.message(
-            _create_push_summary(project_name, j, config),
-            strip=strip
-        )
-
-        # A one-line summary for each commit in the push.
-        line_iterator = _create_commit_summary(project_name, j, config)
-
-        num_commits = len(j['original'].get('commits', []))
-        for i, formatted_commit in enumerate(line_iterator):
-            if i > line_limit or (i == line_limit and not num_commits == i+1):
-                yield cls.message(_create_push_final_summary(
-                    project_name,
-                    j,
-                    config
-                ), strip=strip)
-                break
-
-            yield cls.message(formatted_commit, strip=strip)
+        for line in render_push(cls, event, config, line_limit=line_limit):
+            yield cls.message(line, strip=False)
 
     @classmethod
-    def _create_non_commit_summary(cls, j, config):
+    def _create_non_commit_summary(cls, event, config):
         """
         Create and return a one-line summary of things not involving commits
-        in `j`.
+        in `event`.
         """
-        original = j['original']
-        full_project_name = config.get('full_project_name', False)
+        original = event.payload
 
         line = []
 
-        # The name of the repository.
-        project_name = original['repository']['name']
-        if full_project_name:
-            # The use wants the <username>/<project name> form from
-            # github, not the Notifico name.
-            project_name = '{username}/{project_Name}'.format(
-                username=original['repository']['owner']['name'],
-                project_Name=project_name
-            )
-
-        line.append(u'{RESET}[{BLUE}{name}{RESET}]'.format(
-            name=project_name,
-            **HookService.colors
-        ))
+        line.append(cls.render(config, 'prefix', name=event.project_name))
 
         # The user doing the push, if available.
-        if j['pusher']:
-            line.append(u'{ORANGE}{pusher}{RESET}'.format(
-                pusher=j['pusher'],
-                **HookService.colors
-            ))
+        if event.pusher:
+            line.append(cls.render(config, 'who', who=event.pusher))
 
-        if j['tag']:
+        if event.tag:
             if not original.get('head_commit'):
                 if not is_event_allowed(config, 'delete', 'tag'):
                     return ''
-                line.append(u'deleted' if j['pusher'] else u'Deleted')
+                line.append(u'deleted' if event.pusher else u'Deleted')
                 line.append(u'tag')
             else:
                 if not is_event_allowed(config, 'create', 'tag'):
                     return ''
                 # Verb with proper capitalization
-                line.append(u'tagged' if j['pusher'] else u'Tagged')
+                line.append(u'tagged' if event.pusher else u'Tagged')
 
                 # The sha1 hash of the head (tagged) commit.
-                line.append(u'{GREEN}{sha}{RESET} as'.format(
-                    sha=original['head_commit']['id'][:7],
-                    **HookService.colors
+                line.append(cls.render(
+                    config,
+                    'tagged',
+                    sha=original['head_commit']['id'][:7]
                 ))
 
             # The tag itself.
-            line.append(u'{GREEN}{tag}{RESET}'.format(
-                tag=j['tag'],
-                **HookService.colors
-            ))
-        elif j['branch']:
+            line.append(cls.render(config, 'ref', ref=event.tag))
+        elif event.branch:
             # Verb with proper capitalization
             if original['deleted']:
                 if not is_event_allowed(config, 'delete', 'branch'):
                     return ''
                 line.append(
-                    u'deleted branch' if j['pusher'] else u'Deleted branch'
+                    u'deleted branch' if event.pusher else u'Deleted branch'
                 )
             else:
                 if not is_event_allowed(config, 'create', 'branch'):
                     return ''
                 line.append(
-                    u'created branch' if j['pusher'] else u'Created branch'
+                    u'created branch' if event.pusher else u'Created branch'
                 )
 
             # The branch name
-            line.append(u'{GREEN}{branch}{RESET}'.format(
-                branch=j['branch'],
-                **HookService.colors
-            ))
+            line.append(cls.render(config, 'ref', ref=event.branch))
 
         if original['head_commit']:
             # The shortened URL linking to the head commit.
-            line.append(u'{PINK}{link}{RESET}'.format(
-                link=GithubHook.shorten(original['head_commit']['url']),
-                **HookService.colors
+            line.append(cls.render(
+                config,
+                'link',
+                url=GithubHook.shorten(original['head_commit']['url'])
             ))
 
         return u' '.join(line)
 
-    @classmethod
-    def shorten(cls, url):
-        # Make sure the URL hasn't already been shortened, since github
-        # may does this in the future for web hooks. Better safe than silly.
-        if re.search(r'^https?://git.io', url):
-            return url
-
-        # Only github URLs can be shortened by the git.io service, which
-        # will return a 201 created on success and return the new url
-        # in the Location header.
-        try:
-            r = requests.post('https://git.io', data={
-                'url': url
-            }, timeout=4.0)
-        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
-            # Ignore these errors since we can't do anything about them.
-            return url
-        except Exception:
-            # Send the others to Sentry.
-            from notifico import sentry
-            if sentry.client:
-                sentry.client.captureException()
-            return url
-
-        # Something went wrong, usually means we're being throttled.
-        # TODO: If we are being throttled, handle this smarter instead
-        #       of trying again on the next message.
-        if r.status_code != 201:
-            return url
-
-        return r.headers['Location']
-
     @classmethod
     def form(cls):
         return GithubConfigForm
@@ -8,38 +8,66 @@ import flask_wtf as wtf
 from functools import wraps
 from wtforms.fields import SelectMultipleField
 
-from notifico.services.hooks import HookService
-
-def simplify_payload(payload):
-    result = {
-        'branch': None,
-        'tag': None,
-        'pusher': None,
-        'files': {
-            'all': [],
-            'added': [],
-            'removed': [],
-            'modified': []
-        },
-        'original': payload
-    }
+from notifico.services import handles
+from notifico.services.hooks import HookService, MessageTemplate
+from notifico.services.hooks.forms import TemplateOverridesField
+from notifico.services.hooks.push import Commit, PushEvent, render_push
+
+def push_event(payload, config):
+    """
+    Returns a `PushEvent` filled in from the gitlab push `payload`.
+    """
+    branch = tag = None
 
     # Try to find the branch/tag name from `ref`.
     match = re.match(r'refs/(heads|tags)/(.*)$', payload.get('ref', ''))
     if match:
         type_, name = match.group(1, 2)
-        result[{'heads': 'branch', 'tags': 'tag'}[type_]] = name
-
-    # The name of whoever made this push
-    result['pusher'] = payload.get('user_name')
+        if type_ == 'heads':
+            branch = name
+        else:
+            tag = name
+
+    project_name = payload['project']['name']
+    if config.get('full_project_name', False):
+        project_name = payload['project']['path_with_namespace']
+
+    commits = [
+        Commit(
+            commit['id'],
+            commit['message'],
+            author=commit.get('author', {}).get('name'),
+            added=commit.get('added', ()),
+            removed=commit.get('removed', ()),
+            modified=commit.get('modified', ())
+        )
+        for commit in payload.get('commits', ())
+    ]
 
-    # Summarize file movement over all the commits.
-    for commit in payload.get('commits', []):
-        for type_ in ('added', 'removed', 'modified'):
-            result['files'][type_].extend(commit[type_])
-            result['files']['all'].extend(commit[type_])
+    # Build a compare url.
+    # If this is the first push, link to the after commit.
+    if re.match(r'0+', payload['before']):
+        link = '{0}/commit/{1}'.format(
+            payload['project']['web_url'],
+            payload['after']
+        )
+    else:
+        link = '{0}/compare/{1}...{2}'.format(
+            payload['project']['web_url'],
+            payload['before'],
+            payload['after']
+        )
 
-    return result
+    return PushEvent(
+        project_name,
+        commits,
+        # The name of whoever made this push
+        pusher=payload.get('user_name'),
+        branch=branch,
+        tag=tag,
+        link=link,
+        payload=payload
+    )
 
 def is_event_allowed(config, category, event):
     if not config or not config.get('events'):
@@ -138,123 +166,74 @@ class GitlabConfigForm(wtf.Form):
         'If checked, only the commits title (the commit message up to'
         ' the first new line) will be emitted.'
     ))
-
-def _create_push_summary(project_name, j, config):
-    original = j['original']
-    show_branch = config.get('show_branch', True)
-
-    # Build the push summary.
-    line = []
-
-    line.append(u'{RESET}[{BLUE}{name}{RESET}]'.format(
-        name=project_name,
-        **HookService.colors
-    ))
-
-    # The user doing the push.
-    line.append(u'{ORANGE}{pusher}{RESET} pushed'.format(
-        pusher=j['pusher'],
-        **HookService.colors
-    ))
-
-    # The number of commits included in this push.
-    line.append(u'{GREEN}{count}{RESET} {commits}'.format(
-        count=len(original['commits']),
-        commits='commit' if len(original['commits']) == 1 else 'commits',
-        **HookService.colors
-    ))
-
-    if show_branch and j['branch']:
-        line.append(u'to {GREEN}{branch}{RESET}'.format(
-            branch=j['branch'],
-            **HookService.colors
-        ))
-
-    # File movement summary.
-    line.append(u'[+{added}/-{removed}/\u00B1{modified}]'.format(
-        added=len(j['files']['added']),
-        removed=len(j['files']['removed']),
-        modified=len(j['files']['modified'])
-    ))
-
-    # Build a compare url.
-    # If this is the first push, link to the after commit.
-    if re.match(r'0+', original['before']):
-        link = '{0}/commit/{1}'.format(
-            original['project']['web_url'],
-            original['after']
-        )
-    else:
-        link = '{0}/compare/{1}...{2}'.format(
-            original['project']['web_url'],
-            original['before'],
-            original['after']
-        )
-    line.append(u'{PINK}{0}{RESET}'.format(
-        GitlabHook.shorten(link),
-        **HookService.colors
-    ))
-
-    return u' '.join(line)
-
-def _create_commit_summary(project_name, j, config):
-    title_only = config.get('title_only', False)
-
-    original = j['original']
-
-    for commit in original['commits']:
-        author = commit.get('author', {}).get('name')
-
-        line = []
-
-        line.append(u'{RESET}[{BLUE}{name}{RESET}]'.format(
-            name=project_name,
-            **HookService.colors
-        ))
-
-        if author:
-            line.append(u'{ORANGE}{author}{RESET}'.format(
-                author=author,
-                **HookService.colors
-            ))
-
-        line.append(u'{GREEN}{sha}{RESET}'.format(
-            sha=commit['id'][:7],
-            **HookService.colors
-        ))
-
-        line.append(u'-')
-
-        message = commit['message']
-        if title_only:
-            message_lines = message.split('\n')
-            line.append(message_lines[0] if message_lines else message)
-        else:
-            line.append(message)
-
-        yield u' '.join(line)
-
-def _create_push_final_summary(project_name, j, config):
-    original = j['original']
-    line_limit = config.get('line_limit', 3)
-
-    line = []
-
-    line.append(u'{RESET}[{BLUE}{name}{RESET}]'.format(
-        name=project_name,
-        **HookService.colors
-    ))
-
-    line.append(u'... and {count} more commits.'.format(
-        count = len(original.get('commits', [])) - line_limit
+    templates = TemplateOverridesField('Message Templates', validators=[
+        wtf.Optional()
+    ], description=(
+        'Optionally override message templates, one per line in the form'
+        ' <code>name = template</code>, from the templates listed above.'
     ))
 
-    return u' '.join(line)
-
 class GitlabHook(HookService):
     SERVICE_NAME = 'Gitlab'
     SERVICE_ID = 90
 
+    templates = {
+        'prefix': MessageTemplate(u'{RESET}[{BLUE}{name}{RESET}]'),
+        'pusher': MessageTemplate(u'{ORANGE}{pusher}{RESET} pushed'),
+        'who': MessageTemplate(u'{ORANGE}{who}{RESET}'),
+        'sha': MessageTemplate(u'{GREEN}{sha}{RESET}'),
+        'text': MessageTemplate(u'{text}'),
+        'commit_count': MessageTemplate(
+            u'{GREEN}{count}{RESET} {commits}'
+        ),
+        'to_branch': MessageTemplate(u'to {GREEN}{branch}{RESET}'),
+        'files': MessageTemplate(
+            u'[+{added}/-{removed}/\u00B1{modified}]'
+        ),
+        'link': MessageTemplate(u'{PINK}{url}{RESET}'),
+        'more_commits': MessageTemplate(u'... and {count} more commits.'),
+        'tagged': MessageTemplate(u'tagged {GREEN}{sha}{RESET} as'),
+        'ref': MessageTemplate(u'{GREEN}{ref}{RESET}'),
+        'issue': MessageTemplate(
+            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} {action} '
+            u'issue {GREEN}#{num}{RESET}: {title} - {PINK}{url}{RESET}'
+        ),
+        'issue_comment': MessageTemplate(
+            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} commented on '
+            u'issue {GREEN}#{num}{RESET}: {title} - {PINK}{url}{RESET}'
+        ),
+        'commit_comment': MessageTemplate(
+            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} commented on '
+            u'commit {GREEN}{commit}{RESET} - {PINK}{url}{RESET}'
+        ),
+        'snippet_comment': MessageTemplate(
+            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} commented on '
+            u'snippet {GREEN}${num}{RESET}: {title} - {PINK}{url}{RESET}'
+        ),
+        'mr_comment': MessageTemplate(
+            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} commented on '
+            u'merge request {GREEN}!{num}{RESET}: {title} - {PINK}{url}{RESET}'
+        ),
+        'mr': MessageTemplate(
+            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} {action} '
+            u'merge request {GREEN}!{num}{RESET}: {title} - {PINK}{url}{RESET}'
+        ),
+        'wiki': MessageTemplate(
+            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} {action} '
+            u'page {GREEN}{pname}{RESET} - {PINK}{url}{RESET}'
+        ),
+        'pipeline': MessageTemplate(
+            u'{RESET}[{BLUE}{name}{RESET}] Pipeline {GREEN}#{num}{RESET}: '
+            u'{status_color}{status}{RESET} - {PINK}{url}{RESET}',
+            color_fields=('status_color',)
+        ),
+        'build': MessageTemplate(
+            u'{RESET}[{BLUE}{name}{RESET}] Build {GREEN}#{num}{RESET}: '
+            u'{status_color}{status}{RESET} - {PINK}{url}{RESET}',
+            color_fields=('status_color',)
+        )
+    }
+
     @classmethod
     def service_description(cls):
         return cls.env().get_template('gitlab_desc.html').render()
@@ -265,300 +244,222 @@ class GitlabHook(HookService):
         if not payload:
             return
 
-        event = payload.get('object_kind', '')
-        event_handler = {
-            'push': cls._handle_push,
-            'tag_push': cls._handle_push,
-            'issue': cls._handle_issue,
-            'note': cls._handle_note,
-            'merge_request': cls._handle_merge_request,
-            'wiki_page': cls._handle_wiki_page,
-            'pipeline': cls._handle_pipeline,
-            'build': cls._handle_build
-        }
-
-        if event not in event_handler:
-            return
-
-        return event_handler[event](user, request, hook, payload)
+        return cls.dispatch(
+            payload.get('object_kind', ''),
+            user, request, hook, payload
+        )
 
     @classmethod
+    @handles('issue')
     @action_filter('issue')
     def _handle_issue(cls, user, request, hook, json):
-        fmt_string = (
-            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} {action} '
-            'issue {GREEN}#{num}{RESET}: {title} - {PINK}{url}{RESET}'
-        )
-
         action = json['object_attributes']['action']
         # Add '(e)d' so the action makes sense.
         action += 'd' if action.endswith('e') else 'ed'
 
-        yield fmt_string.format(
+        yield cls.render(
+            hook.config,
+            'issue',
             name=json['project']['name'],
             who=json['user']['username'],
             action=action,
             num=json['object_attributes']['iid'],
             title=json['object_attributes']['title'],
-            url=GitlabHook.shorten(json['object_attributes']['url']),
-            **HookService.colors
+            url=GitlabHook.shorten(json['object_attributes']['url'])
         )
 
     @classmethod
+    @handles('note')
     def _handle_note(cls, user, request, hook, json):
-        note_type = json['object_attributes']['noteable_type']
-
-        note_handler = {
-            'Commit': cls._handle_commit_comment,
-            'Issue': cls._handle_issue_comment,
-            'MergeRequest': cls._handle_merge_request_comment,
-            'Snippet': cls._handle_snippet_comment
-        }
-
-        if note_type not in note_handler:
-            return
-
-        return note_handler[note_type](user, request, hook, json)
+        # Comments are dispatched again by what they're attached to.
+        return cls.dispatch(
+            'note:' + json['object_attributes']['noteable_type'],
+            user, request, hook, json
+        )
 
     @classmethod
+    @handles('note:Issue')
     @action_filter('issue_comment', None)
     def _handle_issue_comment(cls, user, request, hook, json):
-        fmt_string = (
-            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} commented on '
-            'issue {GREEN}#{num}{RESET}: {title} - {PINK}{url}{RESET}'
-        )
-
-        yield fmt_string.format(
+        yield cls.render(
+            hook.config,
+            'issue_comment',
             name=json['project']['name'],
             who=json['user']['username'],
             num=json['issue']['iid'],
             title=json['issue']['title'],
-            url=GitlabHook.shorten(json['object_attributes']['url']),
-            **HookService.colors
+            url=GitlabHook.shorten(json['object_attributes']['url'])
         )
 
     @classmethod
+    @handles('note:Commit')
     @action_filter('commit_comment', None)
     def _handle_commit_comment(cls, user, request, hook, json):
-        fmt_string = (
-            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} commented on '
-            'commit {GREEN}{commit}{RESET} - {PINK}{url}{RESET}'
-        )
-
-        yield fmt_string.format(
+        yield cls.render(
+            hook.config,
+            'commit_comment',
             name=json['project']['name'],
             who=json['user']['username'],
             commit=json['commit']['id'],
-            url=GitlabHook.shorten(json['object_attributes']['url']),
-            **HookService.colors
+            url=GitlabHook.shorten(json['object_attributes']['url'])
         )
 
     @classmethod
+    @handles('note:Snippet')
     @action_filter('snippet_comment', None)
     def _handle_snippet_comment(cls, user, request, hook, json):
-        fmt_string = (
-            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} commented on '
-            'snippet {GREEN}${num}{RESET}: {title} - {PINK}{url}{RESET}'
-        )
-
-        yield fmt_string.format(
+        yield cls.render(
+            hook.config,
+            'snippet_comment',
             name=json['project']['name'],
             who=json['user']['username'],
             num=json['snippet']['id'],
             title=json['snippet']['title'],
-            url=GitlabHook.shorten(json['object_attributes']['url']),
-            **HookService.colors
+            url=GitlabHook.shorten(json['object_attributes']['url'])
         )
 
     @classmethod
+    @handles('note:MergeRequest')
     @action_filter('mr_comment', None)
     def _handle_merge_request_comment(cls, user, request, hook, json):
-        fmt_string = (
-            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} commented on '
-            'merge request {GREEN}!{num}{RESET}: {title} - {PINK}{url}{RESET}'
-        )
-
-        yield fmt_string.format(
+        yield cls.render(
+            hook.config,
+            'mr_comment',
             name=json['project']['name'],
             who=json['user']['username'],
             num=json['merge_request']['iid'],
             title=json['merge_request']['title'],
-            url=GitlabHook.shorten(json['object_attributes']['url']),
-            **HookService.colors
+            url=GitlabHook.shorten(json['object_attributes']['url'])
         )
 
     @classmethod
+    @handles('merge_request')
     @action_filter('mr')
     def _handle_merge_request(cls, user, request, hook, json):
-        fmt_string = (
-            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} {action} '
-            'merge request {GREEN}!{num}{RESET}: {title} - {PINK}{url}{RESET}'
-        )
-
         action = json['object_attributes']['action']
         action += 'd' if action.endswith('e') else 'ed'
 
-        yield fmt_string.format(
+        yield cls.render(
+            hook.config,
+            'mr',
             name=json['project']['name'],
             who=json['user']['username'],
             action=action,
             num=json['object_attributes']['iid'],
             title=json['object_attributes']['title'],
-            url=GitlabHook.shorten(json['object_attributes']['url']),
-            **HookService.colors
+            url=GitlabHook.shorten(json['object_attributes']['url'])
         )
 
     @classmethod
+    @handles('wiki_page')
     @action_filter('wiki')
     def _handle_wiki_page(cls, user, request, hook, json):
-        fmt_string = (
-            u'{RESET}[{BLUE}{name}{RESET}] {ORANGE}{who}{RESET} {action} '
-            'page {GREEN}{pname}{RESET} - {PINK}{url}{RESET}'
-        )
-
         action = json['object_attributes']['action']
         action += 'd' if action.endswith('e') else 'ed'
 
-        yield fmt_string.format(
+        yield cls.render(
+            hook.config,
+            'wiki',
             name=json['project']['name'],
             who=json['user']['username'],
             action=action,
             pname=json['object_attributes']['title'],
-            url=GitlabHook.shorten(json['object_attributes']['url']),
-            **HookService.colors
+            url=GitlabHook.shorten(json['object_attributes']['url'])
         )
 
     @classmethod
+    @handles('pipeline')
     @action_filter('pipeline', 'status')
     def _handle_pipeline(cls, user, request, hook, json):
-        fmt_string = (
-            u'{RESET}[{BLUE}{name}{RESET}] Pipeline {GREEN}#{num}{RESET}: '
-            '{status_color}{status}{RESET} - {PINK}{url}{RESET}'
-        )
-
-        status_color = HookService.colors['GREEN']
+        status_color = 'GREEN'
         if json['object_attributes']['status'].lower() != 'success':
-            status_color = HookService.colors['RED']
+            status_color = 'RED'
         link = u'{0}/pipelines/{1}'.format(
             json['project']['web_url'],
             json['object_attributes']['id']
         )
 
-        yield fmt_string.format(
+        yield cls.render(
+            hook.config,
+            'pipeline',
             name=json['project']['name'],
             num=json['object_attributes']['id'],
             status_color=status_color,
             status=json['object_attributes']['status'],
-            url=GitlabHook.shorten(link),
-            **HookService.colors
+            url=GitlabHook.shorten(link)
         )
 
     @classmethod
+    @handles('build')
     def _handle_build(cls, user, request, hook, json):
-        fmt_string = (
-            u'{RESET}[{BLUE}{name}{RESET}] Build {GREEN}#{num}{RESET}: '
-            '{status_color}{status}{RESET} - {PINK}{url}{RESET}'
-        )
-
         if not is_event_allowed(hook.config, 'build', json['build_status']):
             return
 
-        status_color = HookService.colors['GREEN']
+        status_color = 'GREEN'
         if json['build_status'].lower() != 'success':
-            status_color = HookService.colors['RED']
+            status_color = 'RED'
         link = 'u{0}/builds/{1}'.format(
             json['repository']['homepage'],
             json['build_id']
         )
 
-        yield fmt_string.format(
+        yield cls.render(
+            hook.config,
+            'build',
             name=json['repository']['name'],
             num=json['build_id'],
             status_color=status_color,
             status=json['build_status'],
-            url=GitlabHook.shorten(link),
-            **HookService.colors
+            url=GitlabHook.shorten(link)
         )
 
     @classmethod
+    @handles('push', 'tag_push')
     def _handle_push(cls, user, request, hook, json):
-        j = simplify_payload(json)
-        original = j['original']
-
         config = hook.config or {}
-        strip = not config.get('use_colors', True)
         branches = config.get('branches', None)
         show_tags = config.get('show_tags', True)
         line_limit = config.get('line_limit', 3)
-        full_project_name = config.get('full_project_name', False)
+
+        event = push_event(json, config)
 
         if branches:
             branches = [b.strip().lower() for b in branches.split(',')]
-            if j['branch'] and j['branch'].lower() not in branches:
+            if event.branch and event.branch.lower() not in branches:
                 return
 
-        if not original['commits'] or re.match(r'0+', original['before']):
-            if show_tags and j['tag']:
+        # Colors have already been dealt with by the templates.
+        if not event.commits or re.match(r'0+', json['before']):
+            if show_tags and event.tag:
                 yield cls.message(
-                    cls._create_non_commit_summary(j, config),
-                    strip=strip
+                    cls._create_non_commit_summary(event, config),
+                    strip=False
                 )
-            if j['branch']:
+            if event.branch:
                 yield cls.message(
-                    cls._create_non_commit_summary(j, config),
-                    strip=strip
+                    cls._create_non_commit_summary(event, config),
+                    strip=False
                 )
 
             return
 
-        project_name = original['project']['name']
-        if full_project_name:
-            project_name = original['project']['path_with_namespace']
-
         if not is_event_allowed(config, 'push', None):
             return
 
-        yield cls.message(
-            _create_push_summary(project_name, j, config),
-            strip=strip
-        )
-
-        line_iterator = _create_commit_summary(project_name, j, config)
-
-        num_commits = len(j['original'].get('commits', []))
-        for i, formatted_commit in enumerate(line_iterator):
-            if i > line_limit or (i == line_limit and not num_commits == i+1):
-                yield cls.message(_create_push_final_summary(
-                    project_name,
-                    j,
-                    config
-                ), strip=strip)
-                break
-
-            yield cls.message(formatted_commit, strip=strip)
+        for line in render_push(cls, event, config, line_limit=line_limit):
+            yield cls.message(line, strip=False)
 
     @classmethod
-    def _create_non_commit_summary(cls, j, config):
-        original = j['original']
-        full_project_name = config.get('full_project_name', False)
+    def _create_non_commit_summary(cls, event, config):
+        original = event.payload
 
         line = []
 
-        project_name = original['project']['name']
-        if full_project_name:
-            project_name = original['project']['path_with_namespace']
-
-        line.append(u'{RESET}[{BLUE}{name}{RESET}]'.format(
-            name=project_name,
-            **HookService.colors
-        ))
+        line.append(cls.render(config, 'prefix', name=event.project_name))
 
-        line.append(u'{ORANGE}{pusher}{RESET}'.format(
-            pusher=j['pusher'],
-            **HookService.colors
-        ))
+        line.append(cls.render(config, 'who', who=event.pusher))
 
-        if j['tag']:
+        if event.tag:
             if re.match(r'0+', original['after']):
                 if not is_event_allowed(config, 'delete', 'tag'):
                     return ''
@@ -566,16 +467,10 @@ class GitlabHook(HookService):
             else:
                 if not is_event_allowed(config, 'create', 'tag'):
                     return ''
-                line.append(u'tagged {GREEN}{sha}{RESET} as'.format(
-                    sha=original['after'],
-                    **HookService.colors
-                ))
-
-            line.append(u'{GREEN}{tag}{RESET}'.format(
-                tag=j['tag'],
-                **HookService.colors
-            ))
-        elif j['branch']:
+                line.append(cls.render(config, 'tagged', sha=original['after']))
+
+            line.append(cls.render(config, 'ref', ref=event.tag))
+        elif event.branch:
             if re.match(r'0+', original['after']):
                 if not is_event_allowed(config, 'delete', 'branch'):
                     return ''
@@ -585,10 +480,7 @@ class GitlabHook(HookService):
                     return ''
                 line.append(u'created branch')
 
-            line.append(u'{GREEN}{branch}{RESET}'.format(
-                branch=j['branch'],
-                **HookService.colors
-            ))
+            line.append(cls.render(config, 'ref', ref=event.branch))
 
         return u' '.join(line)
 
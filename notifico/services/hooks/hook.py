@@ -1,15 +1,105 @@
 # -*- coding: utf8 -*-
-__all__ = ('HookService',)
+__all__ = ('HookService', 'MessageTemplate')
 import re
+from string import Formatter
 
-from flask import current_app
+from flask import current_app, g
 from jinja2 import Environment, PackageLoader
 
 from notifico.util import irc
-from notifico.services import Service
+from notifico.services import Service, render_cache
 from notifico.services.messages import MessageService
 
 
+class MessageTemplate(object):
+    """
+    A message format string, compiled once into a colored and a plain
+    variant with the mIRC color codes (``{RESET}``, ``{BLUE}``, ...)
+    already filled in, so rendering only has to substitute the payload
+    fields.
+
+    :param source: The format string.
+    :param color_fields: Names of fields whose value is the name of a
+                         color (ex: ``'GREEN'``) chosen at render time.
+                         They are left out of the plain variant.
+    """
+    __slots__ = (
+        'source', 'fields', 'formats', 'color_fields', '_colored', '_plain'
+    )
+
+    #: Compiled templates by (source, color_fields), so per-hook overrides
+    #: are only compiled once.
+    _cache = {}
+    _cache_size = 1024
+
+    def __init__(self, source, color_fields=()):
+        colors = irc.mirc_colors()
+
+        self.source = source
+        self.color_fields = frozenset(color_fields)
+        self.fields = set()
+        #: The (conversion, format spec) pairs used with each field.
+        self.formats = {}
+
+        colored = []
+        plain = []
+        for literal, name, spec, conversion in Formatter().parse(source):
+            literal = literal.replace('{', '{{').replace('}', '}}')
+            colored.append(literal)
+            plain.append(literal)
+
+            if name is None:
+                continue
+            elif name in colors:
+                colored.append(colors[name])
+                continue
+
+            self.formats.setdefault(name, set()).add((conversion, spec))
+            field = u'{{{0}{1}{2}}}'.format(
+                name,
+                '!' + conversion if conversion else '',
+                ':' + spec if spec else ''
+            )
+            colored.append(field)
+            if name not in self.color_fields:
+                plain.append(field)
+                self.fields.add(re.split(r'[.\[]', name)[0])
+
+        self._colored = u''.join(colored)
+        self._plain = u''.join(plain)
+
+    @classmethod
+    def compile(cls, source, color_fields=()):
+        """
+        Returns a (possibly cached) `MessageTemplate` for `source`.
+        """
+        key = (source, frozenset(color_fields))
+        template = cls._cache.get(key)
+        if template is None:
+            if len(cls._cache) >= cls._cache_size:
+                cls._cache.clear()
+            template = cls._cache[key] = cls(source, color_fields)
+        return template
+
+    def render(self, strip=False, **fields):
+        """
+        Render the template with `fields`, without any mIRC colors if
+        `strip` is ``True``.
+        """
+        if strip:
+            # The payload itself may contain color codes.
+            for k, v in fields.iteritems():
+                if isinstance(v, basestring):
+                    fields[k] = irc.strip_mirc_colors(v)
+            return self._plain.format(**fields)
+
+        if self.color_fields:
+            colors = irc.mirc_colors()
+            for name in self.color_fields:
+                fields[name] = colors[fields[name]]
+        return self._colored.format(**fields)
+
+
 class HookService(object):
     """
     The base type for any `Service`.
@@ -21,6 +111,15 @@ class HookService(object):
     SERVICE_NAME = None
     SERVICE_ID = None
 
+    #: The default `MessageTemplate` for each kind of message this service
+    #: emits. Hooks may override them with the ``templates`` option.
+    templates = {}
+    #: The configuration option (and its default) that enables colors.
+    colors_option = ('use_colors', True)
+    #: Request headers that change the rendered messages, such as the
+    #: event type, and so are part of the render cache key.
+    cache_headers = ()
+
     @classmethod
     def description(cls):
         """
@@ -40,11 +139,13 @@ class HookService(object):
     @classmethod
     def shorten(cls, url):
         """
-        If possible, return a shorter version of `url` shortened by a 3rd
-        party service. Where the service provides its own shortening service,
-        prefer it.
+        If possible, return a shorter version of `url` shortened by one of
+        the configured ``NOTIFICO_SHORTENERS``.
         """
-        return url
+        # Imported on first use, so processes that only use the models
+        # don't pull in requests.
+        from notifico.services import shortener
+        return shortener.shorten(url)
 
     @classmethod
     def strip_colors(cls, msg):
@@ -53,13 +154,66 @@ class HookService(object):
         """
         return irc.strip_mirc_colors(msg)
 
+    @classmethod
+    def use_colors(cls, config):
+        """
+        Returns ``True`` if the hook configuration `config` wants mIRC
+        colors.
+        """
+        key, default = cls.colors_option
+        return (config or {}).get(key, default)
+
+    @classmethod
+    def template(cls, config, template):
+        """
+        Returns the `MessageTemplate` named `template`, preferring the
+        override from the hook configuration `config`.
+        """
+        default = cls.templates[template]
+
+        overrides = (config or {}).get('templates')
+        if overrides and template in overrides:
+            return MessageTemplate.compile(
+                overrides[template],
+                default.color_fields
+            )
+
+        return default
+
+    @classmethod
+    def render(cls, config, template, **fields):
+        """
+        Renders the template named `template` with `fields` for a hook
+        with the configuration `config`.
+        """
+        return cls.template(config, template).render(
+            strip=not cls.use_colors(config),
+            **fields
+        )
+
     @classmethod
     def message(cls, message, strip=True):
-        # Optionally strip mIRC color codes.
-        message = cls.strip_colors(message) if strip else message
-        # Strip newlines and other whitespace.
-        message = re.sub(r'\s+', ' ', message)
-        return message
+        # Optionally strip mIRC color codes, and strip newlines and other
+        # whitespace.
+        return irc.normalize(message, strip=strip)
+
+    @classmethod
+    def dispatch(cls, event, *args):
+        """
+        Calls the handler declared for `event` with `args` and returns its
+        result, or ``None`` if this service doesn't handle `event`.
+        """
+        handler = cls.event_handlers.get(event)
+        if handler is not None:
+            return handler(*args)
+
+    @classmethod
+    def accepts(cls, request):
+        """
+        Returns ``False`` if `request` is for an event this service ignores,
+        when that can be told without reading the payload.
+        """
+        return True
 
     @classmethod
     def _redis(cls):
@@ -72,21 +226,54 @@ class HookService(object):
     def _request(cls, user, request, hook, *args, **kwargs):
         combined = []
 
+        if not cls.accepts(request):
+            # Not worth a cache lookup, let alone rendering.
+            return
+
         ms = MessageService(redis=cls._redis())
-        handler = cls.handle_request(user, request, hook, *args, **kwargs)
 
-        if handler is None:
-            # It's entirely possible for a message body to be a NOP,
-            # so don't do anything at all.
-            return
+        cache_key = None
+        lines = None
+        if current_app.config.get('NOTIFICO_RENDER_CACHE_SIZE'):
+            cache_key = render_cache.request_key(cls, request, hook.config)
+            lines = render_cache.get(cache_key)
 
-        for message in handler:
+        if lines is None:
+            g.shorten_fallback = False
+            handler = cls.handle_request(user, request, hook, *args, **kwargs)
+
+            if handler is None:
+                # It's entirely possible for a message body to be a NOP,
+                # so don't do anything at all.
+                return
+
+            lines = list(handler)
+            # A link that couldn't be shortened in time will be shortened
+            # for later messages, so don't keep it long in the cache.
+            if cache_key is not None and not g.shorten_fallback:
+                render_cache.put(cache_key, lines)
+
+        # Identical lines sent to the same channel within this many seconds
+        # (such as from a project with both GitHub and CI hooks) are only
+        # delivered once.
+        window = current_app.config.get('NOTIFICO_DEDUPE_WINDOW')
+        channels = hook.project.channels.all()
+
+        for message in lines:
             combined.append(message)
-            for channel in hook.project.channels:
+            targets = channels
+            if window:
+                targets = ms.unseen_channels(message, channels, window)
+            for channel in targets:
                 ms.send_message(message, channel)
 
-        if hook.project.public:
-            ms.log_message('\n'.join(combined), hook.project)
+        if combined:
+            ms.log_message(
+                '\n'.join(combined),
+                hook.project,
+                log_cap=current_app.config['NOTIFICO_HISTORY_SIZE'],
+                project_cap=current_app.config['NOTIFICO_PROJECT_HISTORY_SIZE']
+            )
 
     @classmethod
     def form(cls):
@@ -102,16 +289,75 @@ class HookService(object):
         Returns `True` if the form passes validation, `False` otherwise.
         Should be subclassed by complex service configurations.
         """
-        return form.validate_on_submit()
+        if not form.validate_on_submit():
+            return False
+
+        if 'templates' in form:
+            return cls.validate_templates(form.templates)
+
+        return True
+
+    @classmethod
+    def validate_templates(cls, field):
+        """
+        Ensures every template override in `field` replaces a template
+        this service has and only uses fields the original provides.
+        """
+        for name, source in (field.data or {}).items():
+            if name not in cls.templates:
+                field.errors.append(
+                    u'There is no template named {0}.'.format(name)
+                )
+                continue
+
+            default = cls.templates[name]
+            try:
+                template = MessageTemplate(source, default.color_fields)
+            except ValueError:
+                field.errors.append(
+                    u'The {0} template is not valid.'.format(name)
+                )
+                continue
+
+            unknown = template.fields - default.fields
+            if unknown:
+                field.errors.append(
+                    u'The {0} template may only use {1}.'.format(
+                        name,
+                        u', '.join(sorted(default.fields)) or u'colors'
+                    )
+                )
+
+            # Attributes and items of fields could reach anything, and
+            # format specs like a huge width cost us on every message, so
+            # fields may only be formatted the way the original does.
+            if any(re.search(r'[.\[]', f) for f in template.formats):
+                field.errors.append(
+                    u'The {0} template may not use attributes or items of'
+                    u' fields.'.format(name)
+                )
+            elif any(
+                    not formats <= default.formats.get(f, formats)
+                    for f, formats in template.formats.items()):
+                field.errors.append(
+                    u'The {0} template may not change how fields are'
+                    u' formatted.'.format(name)
+                )
+
+        return not field.errors
 
     @classmethod
     def pack_form(cls, form):
         """
         Returns a dictionary of configuration options processed from `form`.
         By default, simply iterates all fields, taking their ``.id`` as the
-        key and ``.data`` as value.
+        key and ``.data`` as value. Multiple choice fields are stored as
+        frozensets, which are quicker to check against.
         """
-        return dict((f.id, f.data) for f in form)
+        return dict(
+            (f.id, frozenset(f.data) if isinstance(f.data, list) else f.data)
+            for f in form
+        )
 
     @classmethod
     def load_form(cls, form, config):
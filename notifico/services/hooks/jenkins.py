@@ -6,7 +6,8 @@ import urllib
 
 import flask_wtf as wtf
 
-from notifico.services.hooks import HookService
+from notifico.services.hooks import HookService, MessageTemplate
+from notifico.services.hooks.forms import TemplateOverridesField
 
 
 class JenkinsConfigForm(wtf.Form):
@@ -38,6 +39,13 @@ class JenkinsConfigForm(wtf.Form):
         'If checked, messages will include minor mIRC coloring.'
     ))
 
+    templates = TemplateOverridesField('Message Templates', validators=[
+        wtf.Optional()
+    ], description=(
+        'Optionally override message templates, one per line in the form'
+        ' <code>name = template</code>, from the templates listed above.'
+    ))
+
 
 class JenkinsHook(HookService):
     """
@@ -47,6 +55,23 @@ class JenkinsHook(HookService):
     SERVICE_NAME = 'Jenkins CI'
     SERVICE_ID = 70
 
+    templates = {
+        'prefix': MessageTemplate(u'{RESET}[{BLUE}{name}{RESET}] '),
+        'summary': MessageTemplate(
+            u'{ORANGE}jenkins{RESET} build {status_color}#{number}{RESET} '
+            u'{commit}{phase}{status} {PINK}{url}{RESET}',
+            color_fields=('status_color',)
+        ),
+        # make sure this string starts with a space or
+        # the formatting won't look good (see summary)
+        'status': MessageTemplate(
+            u': {status_color}{status}{RESET}',
+            color_fields=('status_color',)
+        ),
+        # space is important again
+        'commit': MessageTemplate(u'({GREEN}{commit}{RESET}) ')
+    }
+
     @classmethod
     def service_description(cls):
         return cls.env().get_template('jenkins_desc.html').render()
@@ -75,38 +100,39 @@ class JenkinsHook(HookService):
         if status not in hook.config.get('status', []):
             return
 
-        strip = not hook.config.get('use_colors', True)
-        summary = cls._create_summary(payload)
+        summary = cls._create_summary(payload, hook.config)
 
-        yield cls.message(summary, strip)
+        # Colors have already been dealt with by the templates.
+        yield cls.message(summary, False)
 
     @classmethod
-    def _prefix_line(cls, line, payload):
+    def _prefix_line(cls, line, payload, config):
         """
         Prefixes lines with [JobName] and adds colours
         """
-        prefix = u'{RESET}[{BLUE}{name}{RESET}] '.format(
+        prefix = cls.render(
+            config,
+            'prefix',
             # Project names may be encoded depending on the version of
             # jekins being used.
-            name=urllib.unquote(payload['name']),
-            **HookService.colors
+            name=urllib.unquote(payload['name'])
         )
         return prefix + line
 
     @classmethod
-    def _create_summary(cls, payload):
+    def _create_summary(cls, payload, config):
         """
         Create and return a one-line summary of the build
         """
-        status_colour = {
-            'SUCCESS': HookService.colors['GREEN'],
-            'UNSTABLE': HookService.colors['ORANGE'],
+        status_color = {
+            'SUCCESS': 'GREEN',
+            'UNSTABLE': 'ORANGE',
             # documentation differs from implementation
-            'FAILURE': HookService.colors['RED'],
-            'FAILED': HookService.colors['RED']
+            'FAILURE': 'RED',
+            'FAILED': 'RED'
         }.get(
             payload['build'].get('status', 'SUCCESS').upper(),
-            HookService.colors['RED']
+            'RED'
         )
 
         number = payload['build']['number']
@@ -115,38 +141,29 @@ class JenkinsHook(HookService):
 
         status = payload['build'].get('status', '').lower()
         if status:
-            # make sure this string starts with a space or
-            # the formatting won't look good (see fmt_string)
-            status = ': {status_colour}{status}{RESET}'.format(
-                status_colour=status_colour,
-                status=status,
-                **HookService.colors
+            status = cls.render(
+                config,
+                'status',
+                status_color=status_color,
+                status=status
             )
 
         commit = ''
         scm = payload['build'].get('scm', {})
         if scm.get('commit'):
-            # space is important again
-            commit = '({GREEN}{commit}{RESET}) '.format(
-                commit=scm.get('commit')[:7],
-                **HookService.colors
-            )
-
-        fmt_string = (
-            '{ORANGE}jenkins{RESET} build {status_colour}#{number}{RESET} '
-            '{commit}{phase}{status} {PINK}{url}{RESET}'
-        )
+            commit = cls.render(config, 'commit', commit=scm['commit'][:7])
 
-        line = fmt_string.format(
-            status_colour=status_colour,
+        line = cls.render(
+            config,
+            'summary',
+            status_color=status_color,
             number=number,
             commit=commit,
             phase=phase,
             status=status,
-            url=url,
-            **HookService.colors
+            url=url
         )
-        return cls._prefix_line(line, payload)
+        return cls._prefix_line(line, payload, config)
 
     @classmethod
     def form(cls):
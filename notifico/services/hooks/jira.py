@@ -4,7 +4,9 @@ from urlparse import urlsplit
 
 import flask_wtf as wtf
 
-from notifico.services.hooks import HookService
+from notifico.services import handles
+from notifico.services.hooks import HookService, MessageTemplate
+from notifico.services.hooks.forms import TemplateOverridesField
 
 
 def _simplify(j):
@@ -60,6 +62,12 @@ class JIRAConfigForm(wtf.Form):
         'If checked, prefer displaying JIRA account names instead of'
         ' full names.'
     ))
+    templates = TemplateOverridesField('Message Templates', validators=[
+        wtf.Optional()
+    ], description=(
+        'Optionally override message templates, one per line in the form'
+        ' <code>name = template</code>, from the templates listed above.'
+    ))
 
 
 class JIRAHook(HookService):
@@ -69,6 +77,14 @@ class JIRAHook(HookService):
     SERVICE_NAME = 'JIRA'
     SERVICE_ID = 40
 
+    templates = {
+        'prefix': MessageTemplate(u'{RESET}[{BLUE}{name}{RESET}]'),
+        'created': MessageTemplate(u'{LIGHT_CYAN}{who}{RESET} created'),
+        'updated': MessageTemplate(u'{LIGHT_CYAN}{who}{RESET} updated'),
+        'issue': MessageTemplate(u'{PINK}{key}{RESET}'),
+        'text': MessageTemplate(u'{text}')
+    }
+
     @classmethod
     def service_description(cls):
         return cls.env().get_template('jira_desc.html').render()
@@ -77,24 +93,16 @@ class JIRAHook(HookService):
     def handle_request(cls, user, request, hook):
         j = request.json
         config = hook.config or {}
-        # Should we get rid of mIRC colors before sending?
-        strip = not config.get('use_colors', True)
-
-        # Identify the type of incoming event.
-        event = j.get('webhookEvent')
-        handler = {
-            'jira:issue_updated': cls._jira_event_issue_updated,
-            'jira:issue_created': cls._jira_event_issue_created
-        }.get(event, cls._jira_event_unknown)
 
-        for message in handler(j, config):
-            yield cls.message(message, strip=strip)
+        # Identify the type of incoming event, ignoring any we don't know.
+        messages = cls.dispatch(j.get('webhookEvent'), j, config) or ()
 
-    @classmethod
-    def _jira_event_unknown(self, j, config):
-        return []
+        # Colors have already been dealt with by the templates.
+        for message in messages:
+            yield cls.message(message, strip=False)
 
     @classmethod
+    @handles('jira:issue_created')
     def _jira_event_issue_created(self, j, config):
         prefer_username = config.get('prefer_username', True)
         line = []
@@ -103,9 +111,10 @@ class JIRAHook(HookService):
         # Build our message output.
         # What project was the change made on?
         if simplified['project_key']:
-            line.append('{RESET}[{BLUE}{name}{RESET}]'.format(
-                name=simplified['project_key'],
-                **HookService.colors
+            line.append(self.render(
+                config,
+                'prefix',
+                name=simplified['project_key']
             ))
         # Who made the change?
         attribute_to = None
@@ -115,19 +124,21 @@ class JIRAHook(HookService):
             attribute_to = simplified['who_name']
 
         if attribute_to:
-            line.append('{LIGHT_CYAN}{attribute_to}{RESET} created'.format(
-                attribute_to=attribute_to,
-                **HookService.colors
-            ))
+            line.append(self.render(config, 'created', who=attribute_to))
 
         # What was changed?
         if simplified['issue_key']:
-            line.append('{PINK}{key}{RESET}'.format(
-                key=simplified['issue_key'],
-                **HookService.colors
+            line.append(self.render(
+                config,
+                'issue',
+                key=simplified['issue_key']
             ))
         if simplified['issue_title']:
-            line.append(simplified['issue_title'])
+            line.append(self.render(
+                config,
+                'text',
+                text=simplified['issue_title']
+            ))
 
         yield ' '.join(line)
 
@@ -135,14 +146,16 @@ class JIRAHook(HookService):
         if simplified['link']:
             line = []
             if simplified['project_key']:
-                line.append('{RESET}[{BLUE}{name}{RESET}]'.format(
-                    name=simplified['project_key'],
-                    **HookService.colors
+                line.append(self.render(
+                    config,
+                    'prefix',
+                    name=simplified['project_key']
                 ))
             line.append(simplified['link'])
             yield ' '.join(line)
 
     @classmethod
+    @handles('jira:issue_updated')
     def _jira_event_issue_updated(self, j, config):
         prefer_username = config.get('prefer_username', True)
         line = []
@@ -152,9 +165,10 @@ class JIRAHook(HookService):
         # Build our message output.
         # What project was the change made on?
         if simplified['project_key']:
-            line.append('{RESET}[{BLUE}{name}{RESET}]'.format(
-                name=simplified['project_key'],
-                **HookService.colors
+            line.append(self.render(
+                config,
+                'prefix',
+                name=simplified['project_key']
             ))
         # Who made the change?
         attribute_to = None
@@ -164,22 +178,20 @@ class JIRAHook(HookService):
             attribute_to = simplified['who_name']
 
         if attribute_to:
-            line.append('{LIGHT_CYAN}{attribute_to}{RESET} updated'.format(
-                attribute_to=attribute_to,
-                **HookService.colors
-            ))
+            line.append(self.render(config, 'updated', who=attribute_to))
 
         # What was changed?
         if simplified['issue_key']:
-            line.append('{PINK}{key}{RESET}'.format(
-                key=simplified['issue_key'],
-                **HookService.colors
+            line.append(self.render(
+                config,
+                'issue',
+                key=simplified['issue_key']
             ))
         if simplified['changes']:
             changes = simplified['changes']
-            line.append(' -'.join([
-                '{0} set to "{1}"'.format(k, v) for k, v in changes.items()
-            ]))
+            line.append(self.render(config, 'text', text=' -'.join([
+                u'{0} set to "{1}"'.format(k, v) for k, v in changes.items()
+            ])))
 
         yield ' '.join(line)
 
@@ -187,20 +199,26 @@ class JIRAHook(HookService):
         if simplified['comment']:
             line = []
             if simplified['project_key']:
-                line.append('{RESET}[{BLUE}{name}{RESET}]'.format(
-                    name=simplified['project_key'],
-                    **HookService.colors
+                line.append(self.render(
+                    config,
+                    'prefix',
+                    name=simplified['project_key']
                 ))
-            line.append(simplified['comment'])
+            line.append(self.render(
+                config,
+                'text',
+                text=simplified['comment']
+            ))
             yield ' '.join(line)
 
         # Build the next line with link details.
         if simplified['link']:
             line = []
             if simplified['project_key']:
-                line.append('{RESET}[{BLUE}{name}{RESET}]'.format(
-                    name=simplified['project_key'],
-                    **HookService.colors
+                line.append(self.render(
+                    config,
+                    'prefix',
+                    name=simplified['project_key']
                 ))
             line.append(simplified['link'])
             yield ' '.join(line)
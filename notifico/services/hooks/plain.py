@@ -20,6 +20,8 @@ class PlainTextHook(HookService):
     SERVICE_ID = 20
     SERVICE_NAME = 'Plain Text'
 
+    colors_option = ('use_colours', False)
+
     @classmethod
     def service_description(cls):
         return cls.env().get_template('plain_desc.html').render()
@@ -40,7 +42,7 @@ class PlainTextHook(HookService):
                 #        This needs to be done intelligently, likely
                 #        by the bot itself.
                 line[:512],
-                strip=not config.get('use_colours', False)
+                strip=not cls.use_colors(config)
             )
 
     @classmethod
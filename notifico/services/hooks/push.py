@@ -0,0 +1,209 @@
+# -*- coding: utf8 -*-
+"""
+A provider-neutral model of a push, filled in from each provider's
+payload, and the messages rendered from it.
+"""
+__all__ = ('Commit', 'PushEvent', 'render_push')
+
+#: Commit messages are capped to this many characters, which should be
+#: around two lines on IRC and stops really long messages from spamming
+#: channels.
+COMMIT_MESSAGE_LENGTH_LIMIT = 1000
+
+
+class Commit(object):
+    """
+    A single commit in a `PushEvent`.
+    """
+    __slots__ = (
+        'sha',
+        'message',
+        'author',
+        'distinct',
+        'added',
+        'removed',
+        'modified'
+    )
+
+    def __init__(self, sha, message, author=None, distinct=True,
+                 added=(), removed=(), modified=()):
+        self.sha = sha
+        self.message = message
+        #: Whoever the commit should be attributed to, if known.
+        self.author = author
+        #: ``False`` if this commit has been seen in the repo before.
+        self.distinct = distinct
+        self.added = added
+        self.removed = removed
+        self.modified = modified
+
+    @property
+    def short_sha(self):
+        return self.sha[:7]
+
+    @property
+    def title(self):
+        """
+        The commit message up to the first new line.
+        """
+        return self.message.split('\n', 1)[0]
+
+
+class PushEvent(object):
+    """
+    A push of zero or more commits, or of a new or deleted branch or tag.
+    """
+    __slots__ = (
+        'project_name',
+        'commits',
+        'pusher',
+        'branch',
+        'tag',
+        'link',
+        'payload',
+        '_files'
+    )
+
+    def __init__(self, project_name, commits, pusher=None, branch=None,
+                 tag=None, link=None, payload=None):
+        self.project_name = project_name
+        self.commits = commits
+        self.pusher = pusher
+        self.branch = branch
+        self.tag = tag
+        #: The page comparing this push to the previous one.
+        self.link = link
+        #: The provider's original payload.
+        self.payload = payload
+        self._files = None
+
+    @property
+    def files(self):
+        """
+        The number of files (added, removed, modified) over all of the
+        commits, counted on first use.
+        """
+        if self._files is None:
+            added = removed = modified = 0
+            for commit in self.commits:
+                added += len(commit.added)
+                removed += len(commit.removed)
+                modified += len(commit.modified)
+            self._files = (added, removed, modified)
+        return self._files
+
+
+def summary_line(service, event, config):
+    """
+    Returns a one-line summary of the commits in `event`, using the
+    templates of the hook service `service`.
+    """
+    show_branch = config.get('show_branch', True)
+    count = len(event.commits)
+    added, removed, modified = event.files
+
+    line = [service.render(config, 'prefix', name=event.project_name)]
+
+    # The user doing the push, if available.
+    if event.pusher:
+        line.append(service.render(config, 'pusher', pusher=event.pusher))
+
+    # The number of commits included in this push.
+    line.append(service.render(
+        config,
+        'commit_count',
+        count=count,
+        commits='commit' if count == 1 else 'commits'
+    ))
+
+    if show_branch and event.branch:
+        line.append(service.render(config, 'to_branch', branch=event.branch))
+
+    # File movement summary.
+    line.append(service.render(
+        config,
+        'files',
+        added=added,
+        removed=removed,
+        modified=modified
+    ))
+
+    # The shortened URL linking to the compare page.
+    if event.link:
+        line.append(service.render(
+            config,
+            'link',
+            url=service.shorten(event.link)
+        ))
+
+    return u' '.join(line)
+
+
+def commit_lines(service, event, config):
+    """
+    Yields a one-line summary of each commit in `event`.
+    """
+    title_only = config.get('title_only', False)
+    distinct_only = config.get('distinct_only', True)
+
+    # The same for every commit.
+    prefix = service.render(config, 'prefix', name=event.project_name)
+
+    for commit in event.commits:
+        if distinct_only and not commit.distinct:
+            # This commit has been seen in the repo
+            # before, skip over it and to the next one
+            continue
+
+        line = [prefix]
+
+        if commit.author:
+            line.append(service.render(config, 'who', who=commit.author))
+
+        line.append(service.render(config, 'sha', sha=commit.short_sha))
+
+        line.append(u'-')
+
+        message = commit.title if title_only else commit.message
+        if len(message) > COMMIT_MESSAGE_LENGTH_LIMIT:
+            message = message[:COMMIT_MESSAGE_LENGTH_LIMIT] + '...'
+        line.append(service.render(config, 'text', text=message))
+
+        yield u' '.join(line)
+
+
+def more_commits_line(service, event, config, line_limit):
+    """
+    Returns a line counting the commits in `event` past `line_limit`.
+    """
+    return u' '.join([
+        service.render(config, 'prefix', name=event.project_name),
+        service.render(
+            config,
+            'more_commits',
+            count=len(event.commits) - line_limit
+        )
+    ])
+
+
+def render_push(service, event, config, line_limit=None):
+    """
+    Yields every line for a push with commits: the summary, a line for
+    each commit and, if there are more than `line_limit` commits, a line
+    counting the rest.
+    """
+    yield summary_line(service, event, config)
+
+    lines = commit_lines(service, event, config)
+    if line_limit is None:
+        for line in lines:
+            yield line
+        return
+
+    num_commits = len(event.commits)
+    for i, line in enumerate(lines):
+        if i > line_limit or (i == line_limit and not num_commits == i + 1):
+            yield more_commits_line(service, event, config, line_limit)
+            break
+
+        yield line
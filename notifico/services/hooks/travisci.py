@@ -6,7 +6,8 @@ from hashlib import sha256
 
 import flask_wtf as wtf
 
-from notifico.services.hooks import HookService
+from notifico.services.hooks import HookService, MessageTemplate
+from notifico.services.hooks.forms import TemplateOverridesField
 from notifico.services.hooks.github import GithubHook
 
 
@@ -36,6 +37,12 @@ class TravisConfigForm(wtf.Form):
     ], default=True, description=(
         'If checked, commit messages will include minor mIRC coloring.'
     ))
+    templates = TemplateOverridesField('Message Templates', validators=[
+        wtf.Optional()
+    ], description=(
+        'Optionally override message templates, one per line in the form'
+        ' <code>name = template</code>, from the templates listed above.'
+    ))
 
 
 class TravisHook(HookService):
@@ -44,6 +51,19 @@ class TravisHook(HookService):
     """
     SERVICE_NAME = 'Travis CI'
     SERVICE_ID = 60
+    cache_headers = ('Authorization',)
+
+    templates = {
+        'prefix': MessageTemplate(u'{RESET}[{BLUE}{name}{RESET}] '),
+        'summary': MessageTemplate(
+            u'Travis CI - build #{number} '
+            u'{status_color}{message}{RESET}. '
+            u'({GREEN}{branch}{RESET} @ {GREEN}{commit}{RESET}) '
+            u'{PINK}{url}{RESET}',
+            color_fields=('status_color',)
+        ),
+        'details': MessageTemplate(u'Details: {url}')
+    }
 
     @classmethod
     def service_description(cls):
@@ -59,7 +79,6 @@ class TravisHook(HookService):
         user = hook.config.get('gh_user')
         repo = hook.config.get('repo_name')
         token = hook.config.get('token')
-        strip = not hook.config.get('use_colors', True)
 
         # http://about.travis-ci.org/docs/user/notifications/#Authorization
         auth_header = request.headers.get('Authorization')
@@ -74,64 +93,47 @@ class TravisHook(HookService):
         if payload['finished_at'] is None:
             return
 
-        summary = cls._create_summary(payload)
-        details = 'Details: {0}'.format(payload['build_url'])
-        details = cls._prefix_line(details, payload)
+        summary = cls._create_summary(payload, hook.config)
+        details = cls.render(hook.config, 'details', url=payload['build_url'])
+        details = cls._prefix_line(details, payload, hook.config)
 
-        yield cls.message(summary, strip)
-        yield cls.message(details, strip)
+        # Colors have already been dealt with by the templates.
+        yield cls.message(summary, False)
+        yield cls.message(details, False)
 
     @classmethod
-    def _prefix_line(cls, line, payload):
+    def _prefix_line(cls, line, payload, config):
         """
         Prefixes lines with [RepoName] and adds colours
         """
-
-        prefix = u'{RESET}[{BLUE}{name}{RESET}] '.format(
-            name=payload['repository']['name'],
-            **HookService.colors
+        prefix = cls.render(
+            config,
+            'prefix',
+            name=payload['repository']['name']
         )
         return prefix + line
 
     @classmethod
-    def _create_summary(cls, payload):
+    def _create_summary(cls, payload, config):
         """
         Create and return a one-line summary of the build
         """
-        status_colour = HookService.colors['RED']
+        status_color = 'RED'
         if payload['result'] == 0:
-            status_colour = HookService.colors['GREEN']
+            status_color = 'GREEN'
 
-        lines = []
-
-        # Build number
-        lines.append(u'Travis CI - build #{number}'.format(
+        line = cls.render(
+            config,
+            'summary',
             number=payload['number'],
-        ))
-
-        # Status and correct colours
-        lines.append(u'{status}{message}{RESET}.'.format(
-            status=status_colour,
+            status_color=status_color,
             message=payload['result_message'].lower(),
-            **HookService.colors
-        ))
-
-        # branch & commit hash
-        lines.append(u'({G}{branch}{R} @ {G}{commit}{R})'.format(
             branch=payload['branch'],
             commit=payload['commit'][:7],
-            G=HookService.colors['GREEN'],
-            R=HookService.colors['RESET']
-        ))
-
-        # Short URL to changes on GH
-        lines.append(u'{PINK}{url}{RESET}'.format(
-            url=GithubHook.shorten(payload['compare_url']),
-            **HookService.colors
-        ))
-
-        line = u' '.join(lines)
-        return cls._prefix_line(line, payload)
+            # Short URL to changes on GH
+            url=GithubHook.shorten(payload['compare_url'])
+        )
+        return cls._prefix_line(line, payload, config)
 
     @classmethod
     def form(cls):
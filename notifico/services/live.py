@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+Live message feeds, as Server-Sent Events.
+
+`MessageService.log_message` publishes every message to a public project
+on a Redis channel. Each web process has a single subscription to it (see
+`Broadcaster`), which hands each message to the queue of every client
+following the feed it's in. Queues are bounded, and a client that falls
+behind is disconnected rather than buffered for. Browsers reconnect on
+their own, sending the id of the last event they saw, and are caught up
+from the message history.
+
+Each client holds a connection open for as long as it's listening, so the
+web tier should run gevent workers.
+"""
+__all__ = ('publish', 'Broadcaster', 'stream', 'response')
+import json
+import time
+import logging
+import threading
+from Queue import Queue, Empty, Full
+
+from flask import Response, current_app, request
+from redis.exceptions import RedisError
+
+from notifico.services import history
+
+#: Name of the Redis channel messages are published to.
+key_channel = 'history_live'
+
+logger = logging.getLogger(__name__)
+
+
+def publish(redis, message, project, entry_id, global_entry_id=None):
+    """
+    Publishes `message` to the feeds of `project` (as history entry
+    `entry_id`) and, if it has a `global_entry_id`, the global feed.
+    """
+    redis.publish(key_channel, json.dumps({
+        'i': entry_id,
+        'g': global_entry_id,
+        'p': project.id,
+        'n': project.full_name,
+        'm': message
+    }))
+
+
+def _sort_key(id):
+    return tuple(int(part) for part in id.split('-'))
+
+
+def _frame(id, project_name, message):
+    """
+    Returns the event for a message.
+    """
+    return 'id: {0}\nevent: message\ndata: {1}\n\n'.format(
+        id,
+        json.dumps({'project': project_name, 'message': message})
+    )
+
+
+class Subscriber(object):
+    """
+    A client of the feed of `project_id` (or the global feed), with a
+    queue of at most `size` events waiting to be sent to it.
+    """
+    def __init__(self, project_id=None, size=100):
+        self.project_id = project_id
+        self.queue = Queue(maxsize=size)
+        #: Set when the client fell behind, and should be disconnected.
+        self.dropped = False
+
+    def offer(self, event):
+        """
+        Queues `event`, or drops the subscriber if its queue is full.
+        """
+        try:
+            self.queue.put_nowait(event)
+        except Full:
+            self.dropped = True
+        return not self.dropped
+
+
+class Broadcaster(object):
+    """
+    Shares one subscription to the published messages between every
+    `Subscriber` in the process.
+    """
+    def __init__(self, redis):
+        self.redis = redis
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self, project_id=None, size=100):
+        sub = Subscriber(project_id, size)
+        with self._lock:
+            self._subscribers.add(sub)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def _drop_all(self):
+        with self._lock:
+            subscribers, self._subscribers = self._subscribers, set()
+        for sub in subscribers:
+            sub.dropped = True
+
+    def _run(self):
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(key_channel)
+                for message in pubsub.listen():
+                    self._dispatch(message['data'])
+            except RedisError:
+                logger.exception('Lost the live feed subscription.')
+                # Anything published in the meantime is lost, so have
+                # everyone reconnect and catch up from the history.
+                self._drop_all()
+                time.sleep(1)
+
+    def _dispatch(self, data):
+        try:
+            event = json.loads(data)
+        except ValueError:
+            return
+
+        # Each event is only formatted once per feed.
+        events = {
+            event['p']: (
+                event['i'],
+                _frame(event['i'], event['n'], event['m'])
+            )
+        }
+        if event.get('g'):
+            events[None] = (
+                event['g'],
+                _frame(event['g'], event['n'], event['m'])
+            )
+
+        with self._lock:
+            subscribers = list(self._subscribers)
+
+        for sub in subscribers:
+            e = events.get(sub.project_id)
+            if e is not None and not sub.offer(e):
+                self.unsubscribe(sub)
+
+
+# A Broadcaster for each Redis client, normally just the one per process.
+_broadcasters = {}
+_broadcasters_lock = threading.Lock()
+
+
+def broadcaster(redis):
+    with _broadcasters_lock:
+        b = _broadcasters.get(id(redis))
+        if b is None:
+            b = _broadcasters[id(redis)] = Broadcaster(redis)
+        return b
+
+
+def stream(redis, project_id=None, last_id=None, heartbeat=15,
+           queue_size=100, backlog=100):
+    """
+    Yields the events of the feed of `project_id`, or the global feed,
+    starting with (at most `backlog` of) the messages since `last_id`. A
+    comment is sent after `heartbeat` seconds without a message, so idle
+    connections aren't closed. Stops if the client falls more than
+    `queue_size` messages behind.
+    """
+    b = broadcaster(redis)
+    # Subscribe before reading the backlog, so nothing falls in between.
+    sub = b.subscribe(project_id, queue_size)
+    try:
+        last = None
+        if last_id:
+            try:
+                last = _sort_key(last_id)
+            except ValueError:
+                last_id = None
+
+        # How long the browser should wait before reconnecting.
+        yield 'retry: 3000\n\n'
+
+        if last_id:
+            for entry in history.since(redis, last_id, project_id, backlog):
+                last = _sort_key(entry.id)
+                yield _frame(entry.id, entry.project_name, entry.message)
+
+        while not sub.dropped:
+            try:
+                id, frame = sub.queue.get(timeout=heartbeat)
+            except Empty:
+                yield ': heartbeat\n\n'
+                continue
+
+            key = _sort_key(id)
+            if last is not None and key <= last:
+                # Already sent as part of the backlog.
+                continue
+            last = key
+            yield frame
+    finally:
+        b.unsubscribe(sub)
+
+
+def response(project_id=None):
+    """
+    Returns a streaming response for the feed of `project_id`, or the
+    global feed, resuming from the request's Last-Event-ID.
+    """
+    config = current_app.config
+    last_id = (
+        request.headers.get('Last-Event-ID') or
+        request.args.get('last_id')
+    )
+
+    r = Response(stream(
+        current_app.redis,
+        project_id=project_id,
+        last_id=last_id,
+        heartbeat=config['NOTIFICO_LIVE_HEARTBEAT'],
+        queue_size=config['NOTIFICO_LIVE_QUEUE_SIZE'],
+        backlog=config['NOTIFICO_LIVE_BACKLOG']
+    ), mimetype='text/event-stream')
+    r.headers['Cache-Control'] = 'no-cache'
+    # Don't let nginx hold events back.
+    r.headers['X-Accel-Buffering'] = 'no'
+    return r
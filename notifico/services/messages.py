@@ -1,13 +1,22 @@
 # -*- coding: utf8 -*-
 __all__ = ('MessageService',)
 import json
+import logging
+import hashlib
+
+from redis.exceptions import ResponseError
+
+from notifico.services import history, live
+from notifico.util import irc
+
+logger = logging.getLogger(__name__)
 
 
 class MessageService(object):
     #: Key name for the outgoing message queue.
     key_queue_messages = 'queue_message'
-    #: Key name for recent messages.
-    key_recent_messages = 'recent_messages'
+    #: Key name prefix for recently delivered message digests.
+    key_seen_prefix = 'seen_message_'
 
     def __init__(self, redis=None):
         self._redis = redis
@@ -16,18 +25,17 @@ class MessageService(object):
     def r(self):
         return self._redis
 
-    def recent_messages(self, start=0, stop=-1):
+    def recent_messages(self, project=None, cursor=None, per_page=25):
         """
-        Returns a list of recent messages from `start` to `stop`.
+        Returns a `KeysetPage` of recent messages to `project`, or to any
+        public project, following `cursor`.
         """
-        if not self.r:
-            return []
-
-        return [
-            json.loads(m) for m in self.r.lrange(
-                self.key_recent_messages, start, stop
-            )
-        ]
+        return history.page(
+            self.r,
+            project_id=project.id if project else None,
+            cursor=cursor,
+            per_page=per_page
+        )
 
     def send_message(self, message, channel):
         """
@@ -51,18 +59,62 @@ class MessageService(object):
         message_dump = json.dumps(final_message)
         self.r.rpush(self.key_queue_messages, message_dump)
 
-    def log_message(self, message, project, log_cap=200):
+    def _seen_key(self, message, channel):
         """
-        Log up to `log_cap` messages,
+        Returns the key used to remember that `message` was recently sent
+        to `channel`. Colors and whitespace are ignored, so the same line
+        from two different hooks is considered the same.
         """
-        final_message = {
-            'msg': message,
-            'project_id': project.id,
-            'owner_id': project.owner.id
-        }
-        message_dump = json.dumps(final_message)
+        text = irc.normalize(message, strip=True).strip()
+        if isinstance(text, str):
+            text = text.decode('utf-8', 'replace')
+        digest = hashlib.sha1(u'\x00'.join([
+            channel.host,
+            unicode(channel.port),
+            channel.channel.lower(),
+            text
+        ]).encode('utf-8')).hexdigest()
+        return self.key_seen_prefix + digest
+
+    def unseen_channels(self, message, channels, window=60):
+        """
+        Returns the subset of `channels` to which `message` has not been sent
+        in the last `window` seconds, and marks it as sent to all of them.
+        """
+        channels = list(channels)
 
         with self.r.pipeline() as pipe:
-            pipe.lpush(self.key_recent_messages, message_dump)
-            pipe.ltrim(self.key_recent_messages, 0, log_cap)
-            pipe.execute()
+            for channel in channels:
+                pipe.set(
+                    self._seen_key(message, channel),
+                    1,
+                    nx=True,
+                    ex=window
+                )
+            first_seen = pipe.execute()
+
+        return [c for c, first in zip(channels, first_seen) if first]
+
+    def log_message(self, message, project, log_cap=10000, project_cap=100):
+        """
+        Adds `message` to the history of `project`, keeping about
+        `project_cap` messages for each project and `log_cap` messages
+        to public projects, and publishes it to the live feeds of public
+        projects.
+        """
+        try:
+            entry_id, global_entry_id = history.record(
+                self.r,
+                message,
+                project,
+                project_size=project_cap,
+                global_size=log_cap
+            )
+        except ResponseError:
+            # Most likely a Redis older than 5.0, without streams. The
+            # message has already been delivered, so just go without.
+            logger.exception('Could not record a message in the history.')
+            return
+
+        if project.public:
+            live.publish(self.r, message, project, entry_id, global_entry_id)
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Per-network channel counts, kept in Redis.
+
+Rather than aggregating every channel whenever the statistics are shown,
+the networks touched by a commit (by creating, changing or deleting a
+channel, or by changing the visibility of or deleting a project) are
+recounted as part of it and the counts stored in sorted sets. Only
+public channels in public projects are counted. `rebuild` recounts every
+network, to repair any drift.
+"""
+from itertools import chain
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, inspect
+
+from notifico import db
+from notifico.models import Channel, Project
+
+#: Key name for the sorted set of networks by distinct channel names.
+key_distinct = 'network_channels'
+#: Key name for the sorted set of networks by number of channels.
+key_total = 'network_channels_total'
+
+# Session.info keys for networks waiting to be recounted and for the
+# counts waiting on the commit.
+_PENDING = 'network_stats_pending'
+_COUNTED = 'network_stats_counted'
+
+
+def _counts(session, hosts=None):
+    """
+    Returns a query of (host, distinct channels, channels) for every
+    network in `hosts`, or every network.
+    """
+    q = (
+        session.query(
+            Channel.host,
+            func.count(func.distinct(Channel.channel)),
+            func.count(Channel.id)
+        )
+        .join(Channel.project)
+        .filter(
+            Project.public == True,
+            Channel.public == True
+        )
+        .group_by(Channel.host)
+    )
+    if hosts is not None:
+        q = q.filter(Channel.host.in_(hosts))
+    return q
+
+
+def _collect(session, flush_context, instances):
+    """
+    Remembers the networks changed by the objects about to be flushed.
+    """
+    pending = session.info.setdefault(_PENDING, set())
+
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Channel):
+            # Both the old and new network, if it changed.
+            history = inspect(obj).attrs.host.history
+            pending.update(host for host in history.sum() if host)
+        elif isinstance(obj, Project) and obj.id is not None:
+            if (obj not in session.deleted and
+                    not inspect(obj).attrs.public.history.has_changes()):
+                continue
+
+            with session.no_autoflush:
+                pending.update(host for host, in (
+                    session.query(Channel.host)
+                    .filter(Channel.project_id == obj.id)
+                    .distinct()
+                ))
+
+
+def _recount(session):
+    """
+    Recounts the changed networks within the committing transaction.
+    """
+    if not (session.info.get(_PENDING) or session.new or session.dirty or
+            session.deleted):
+        return
+
+    session.flush()
+
+    pending = session.info.pop(_PENDING, None)
+    if not pending:
+        return
+
+    counts = dict((host, (0, 0)) for host in pending)
+    for host, distinct, total in _counts(session, pending):
+        counts[host] = (distinct, total)
+
+    session.info.setdefault(_COUNTED, {}).update(counts)
+
+
+def _store(session):
+    """
+    Stores the recounted networks once they've been committed.
+    """
+    counts = session.info.pop(_COUNTED, None)
+    if not counts or not has_app_context():
+        return
+
+    with current_app.redis.pipeline() as pipe:
+        for host, (distinct, total) in counts.items():
+            if total:
+                pipe.zadd(key_distinct, {host: distinct})
+                pipe.zadd(key_total, {host: total})
+            else:
+                pipe.zrem(key_distinct, host)
+                pipe.zrem(key_total, host)
+        pipe.execute()
+
+
+def _discard(session, *args):
+    session.info.pop(_PENDING, None)
+    session.info.pop(_COUNTED, None)
+
+
+def changed(session, *hosts):
+    """
+    Marks the networks `hosts` as changed by the transaction in `session`,
+    for channels not created through the ORM such as bulk inserts.
+    """
+    session.info.setdefault(_PENDING, set()).update(hosts)
+
+
+def listen(session):
+    """
+    Keeps the counts up to date with changes committed by `session`.
+    """
+    for name, f in (
+            ('before_flush', _collect),
+            ('before_commit', _recount),
+            ('after_commit', _store),
+            ('after_rollback', _discard)):
+        if not event.contains(session, name, f):
+            event.listen(session, name, f)
+
+
+def rebuild():
+    """
+    Recounts every network, replacing the stored counts. Returns the
+    number of networks.
+    """
+    counts = _counts(db.session).all()
+
+    with current_app.redis.pipeline() as pipe:
+        pipe.delete(key_distinct, key_total)
+        if counts:
+            pipe.zadd(key_distinct, dict((h, d) for h, d, t in counts))
+            pipe.zadd(key_total, dict((h, t) for h, d, t in counts))
+        pipe.execute()
+
+    return len(counts)
+
+
+def total_networks():
+    """
+    Returns the number of networks with at least one public channel.
+    """
+    return current_app.redis.zcard(key_distinct)
+
+
+def top_networks(start=0, limit=20):
+    """
+    Returns a list of (host, distinct channels, channels) for networks
+    by the number of distinct channel names on them, from `start`.
+    """
+    r = current_app.redis
+
+    networks = r.zrevrange(key_distinct, start, start + limit - 1,
+                           withscores=True)
+    if not networks:
+        return []
+
+    with r.pipeline() as pipe:
+        for host, _ in networks:
+            pipe.zscore(key_total, host)
+        totals = pipe.execute()
+
+    return [
+        (host, int(distinct), int(total or 0))
+        for (host, distinct), total in zip(networks, totals)
+    ]
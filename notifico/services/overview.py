@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Batched loading for the project pages.
+
+The project relationships are ``dynamic``, so walking them from a template
+costs a query for every project and every channel. These load everything
+a page shows up front in a fixed number of queries, however many projects
+and channels there are.
+"""
+from collections import defaultdict
+
+from sqlalchemy import and_, func
+
+from notifico import db
+from notifico.models import BotEvent, Channel, Hook, Project
+
+
+class ProjectSummary(object):
+    """
+    A project with its (visible) channels, number of hooks and the latest
+    event in any of its channels.
+    """
+    __slots__ = ('project', 'channels', 'hook_count', 'last_event')
+
+    def __init__(self, project, channels, hook_count, last_event=None):
+        self.project = project
+        self.channels = channels
+        self.hook_count = hook_count
+        self.last_event = last_event
+
+
+def _channel_key(c):
+    return (c.host, c.port, c.ssl, c.channel)
+
+
+def latest_events(channels):
+    """
+    Returns a dict of the latest `BotEvent` for each of `channels` that
+    has one, keyed by channel id.
+    """
+    keys = set(_channel_key(c) for c in channels)
+    if not keys:
+        return {}
+
+    # Narrowed to the hosts and names involved so the lookup can use the
+    # (host, port, ssl, channel, created) index.
+    latest = (
+        db.session.query(
+            BotEvent.host,
+            BotEvent.port,
+            BotEvent.ssl,
+            BotEvent.channel,
+            func.max(BotEvent.created).label('created')
+        )
+        .filter(
+            BotEvent.host.in_(set(k[0] for k in keys)),
+            BotEvent.channel.in_(set(k[3] for k in keys))
+        )
+        .group_by(
+            BotEvent.host,
+            BotEvent.port,
+            BotEvent.ssl,
+            BotEvent.channel
+        )
+        .subquery()
+    )
+
+    q = BotEvent.query.join(latest, and_(
+        BotEvent.host == latest.c.host,
+        BotEvent.port == latest.c.port,
+        BotEvent.ssl == latest.c.ssl,
+        BotEvent.channel == latest.c.channel,
+        BotEvent.created == latest.c.created
+    ))
+
+    events = {}
+    for e in q:
+        key = _channel_key(e)
+        # Two events at the same instant are settled by id.
+        if key in keys and (key not in events or e.id > events[key].id):
+            events[key] = e
+
+    return dict(
+        (c.id, events[_channel_key(c)])
+        for c in channels if _channel_key(c) in events
+    )
+
+
+def user_projects(user, public_only=True):
+    """
+    Returns a list of `ProjectSummary` for each of `user`'s projects, by
+    descending creation date. If `public_only`, private projects and
+    channels are left out.
+    """
+    q = Project.query.filter(Project.owner_id == user.id)
+    if public_only:
+        q = q.filter(Project.public == True)
+    projects = q.order_by(Project.created.desc()).all()
+    if not projects:
+        return []
+
+    ids = [p.id for p in projects]
+
+    channels = defaultdict(list)
+    q = Channel.query.filter(Channel.project_id.in_(ids))
+    if public_only:
+        q = q.filter(Channel.public == True)
+    for c in q.order_by(Channel.id):
+        channels[c.project_id].append(c)
+
+    hook_counts = dict(
+        db.session.query(Hook.project_id, func.count(Hook.id))
+        .filter(Hook.project_id.in_(ids))
+        .group_by(Hook.project_id)
+    )
+
+    events = latest_events([c for p in ids for c in channels[p]])
+
+    def _last_event(project):
+        found = [events[c.id] for c in channels[project.id] if c.id in events]
+        return max(found, key=lambda e: (e.created, e.id)) if found else None
+
+    return [
+        ProjectSummary(
+            p,
+            channels[p.id],
+            hook_counts.get(p.id, 0),
+            _last_event(p)
+        ) for p in projects
+    ]
+
+
+def project_details(project, public_only=True):
+    """
+    Returns the hooks and (visible) channels of `project` as lists, and a
+    dict of the latest event in each channel by channel id.
+    """
+    hooks = project.hooks.all()
+
+    channels = project.channels
+    if public_only:
+        channels = channels.filter_by(public=True)
+    channels = channels.all()
+
+    return hooks, channels, latest_events(channels)
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+HTTP caching for public pages.
+
+Each table has a content version in Redis, the time it was last changed,
+which is bumped whenever a commit changes a row in it. A cached page
+depends on some of these "topics", and its ETag and Last-Modified come
+from their versions, so conditional GETs can be answered with a 304
+without running the view at all. Pages rendered for anonymous visitors
+are the same for everyone and are also kept in Redis, so they're only
+rendered once per version. Logged in users see their own name (and
+sometimes their private projects) on every page, so only get the 304s.
+
+Expensive parts of a page can be cached on their own with the
+``cached_fragment`` template global, which is shared by every visitor
+they're rendered the same for.
+"""
+import time
+import hashlib
+import datetime
+from itertools import chain
+from functools import wraps
+
+from flask import (
+    current_app,
+    g,
+    has_app_context,
+    make_response,
+    request,
+    session
+)
+from jinja2 import Markup
+from sqlalchemy import event
+from werkzeug.http import is_resource_modified
+
+from notifico.version import __version__
+
+#: Key name for the hash of content versions by topic.
+key_versions = 'page_versions'
+#: Key name prefix for cached pages.
+key_prefix = 'page_'
+#: Key name prefix for cached fragments.
+key_fragment_prefix = 'fragment_'
+
+#: Topic bumped when message counts change, which happens far too often
+#: to show the change straight away.
+MESSAGE_COUNT = 'message_count'
+
+# Session.info key for the topics changed in the current transaction.
+_PENDING = 'page_cache_pending'
+
+
+def _collect(session, flush_context, instances):
+    """
+    Remembers the tables changed by the objects about to be flushed.
+    """
+    pending = session.info.setdefault(_PENDING, set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        table = getattr(obj, '__table__', None)
+        if table is not None and (obj not in session.dirty or
+                                  session.is_modified(obj)):
+            pending.add(table.name)
+
+
+def _store(session):
+    """
+    Bumps the versions of the topics changed by a commit.
+    """
+    topics = session.info.pop(_PENDING, None)
+    if topics and has_app_context():
+        bump(*topics)
+
+
+def _discard(session, *args):
+    session.info.pop(_PENDING, None)
+
+
+def listen(session):
+    """
+    Bumps the topics changed by commits made by `session`.
+    """
+    for name, f in (
+            ('before_flush', _collect),
+            ('after_commit', _store),
+            ('after_rollback', _discard)):
+        if not event.contains(session, name, f):
+            event.listen(session, name, f)
+
+
+def changed(session, *topics):
+    """
+    Marks `topics` as changed by the transaction in `session`, for changes
+    not made through the ORM such as bulk updates.
+    """
+    session.info.setdefault(_PENDING, set()).update(topics)
+
+
+def bump(*topics):
+    """
+    Marks `topics` as changed now.
+    """
+    now = time.time()
+    with current_app.redis.pipeline() as pipe:
+        for topic in topics:
+            pipe.hset(key_versions, topic, now)
+        pipe.execute()
+
+
+def versions(topics):
+    """
+    Returns the current version of each of `topics`.
+    """
+    if not topics:
+        return []
+
+    stamps = [
+        float(v or 0) for v in current_app.redis.hmget(key_versions, topics)
+    ]
+
+    # Message counts only move on every `delay` seconds, so a busy
+    # project doesn't change every page it's on with every message.
+    delay = current_app.config['NOTIFICO_PAGE_CACHE_COUNT_DELAY']
+    if delay and MESSAGE_COUNT in topics:
+        i = list(topics).index(MESSAGE_COUNT)
+        stamps[i] = min(stamps[i], time.time() // delay * delay)
+
+    return stamps
+
+
+def _digest(*parts):
+    def _part(p):
+        if isinstance(p, unicode):
+            return p.encode('utf-8')
+        return p if isinstance(p, str) else repr(p)
+    return hashlib.sha1('\x00'.join(_part(p) for p in parts)).hexdigest()
+
+
+def cached_page(*topics):
+    """
+    A decorator for views whose page only changes with `topics`, the
+    names of the tables it shows. GETs are answered with a 304 if the
+    page hasn't changed, and pages for anonymous visitors are cached.
+    """
+    def _wrap(f):
+        @wraps(f)
+        def _wrapped(*args, **kwargs):
+            ttl = current_app.config['NOTIFICO_PAGE_CACHE_TTL']
+            if (not ttl or request.method not in ('GET', 'HEAD') or
+                    session.get('_flashes')):
+                # Flashed messages are only shown once.
+                return f(*args, **kwargs)
+
+            # Only the session is needed, so a 304 doesn't load the user.
+            identity = g.identity
+            anonymous = identity.anonymous
+            viewer = 'anonymous'
+            if not anonymous:
+                viewer = 'user_{0}'.format(identity.user_id)
+
+            stamps = versions(topics)
+            etag = _digest(__version__, viewer, request.full_path, *stamps)
+            last_modified = None
+            if stamps and max(stamps):
+                last_modified = datetime.datetime.utcfromtimestamp(
+                    int(max(stamps))
+                )
+
+            if not is_resource_modified(request.environ, etag=etag,
+                                        last_modified=last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                key = key_prefix + etag
+                body = current_app.redis.get(key) if anonymous else None
+                if body is not None:
+                    response = current_app.response_class(body)
+                else:
+                    response = make_response(f(*args, **kwargs))
+                    if (response.status_code != 200 or
+                            response.direct_passthrough):
+                        return response
+                    if anonymous:
+                        current_app.redis.set(
+                            key,
+                            response.get_data(),
+                            ex=ttl
+                        )
+
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            response.cache_control.no_cache = True
+            if anonymous:
+                response.cache_control.public = True
+            else:
+                response.cache_control.private = True
+            response.vary.add('Cookie')
+            return response
+        return _wrapped
+    return _wrap
+
+
+def fragment(name, topics, *vary, **kwargs):
+    """
+    Returns the template block passed as `caller` (using ``{% call %}``),
+    rendered at most once for each version of `topics` and value of
+    `vary`. The block must look the same for every visitor.
+    """
+    caller = kwargs['caller']
+
+    ttl = current_app.config['NOTIFICO_PAGE_CACHE_TTL']
+    if not ttl:
+        return caller()
+
+    key = key_fragment_prefix + _digest(
+        __version__,
+        name,
+        *chain((repr(v) for v in vary), versions(topics))
+    )
+
+    html = current_app.redis.get(key)
+    if html is not None:
+        return Markup(html.decode('utf-8'))
+
+    html = caller()
+    current_app.redis.set(key, html.encode('utf-8'), ex=ttl)
+    return Markup(html)
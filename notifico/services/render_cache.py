@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+A cache of the lines rendered by hooks for a request.
+
+The same payload is often rendered many times over, such as redeliveries
+or a commit pushed to several forks with hooks of their own. Rendered
+lines are cached in Redis by (service, event type, payload digest, hook
+configuration), so a repeat skips parsing and formatting entirely. The
+cache holds at most ``NOTIFICO_RENDER_CACHE_SIZE`` entries, evicting the
+least recently used.
+"""
+import json
+import time
+import hashlib
+
+from flask import current_app
+
+#: Key name prefix for cached lines.
+key_prefix = 'render_'
+#: Key name for the sorted set of cached keys by last use.
+key_lru = 'render_lru'
+#: Key name for the hash of hit and miss counts.
+key_stats = 'render_stats'
+
+
+def _encode(o):
+    # Multiple choice options are stored as frozensets.
+    if isinstance(o, (set, frozenset)):
+        return sorted(o)
+    raise TypeError(repr(o))
+
+
+def fingerprint(config):
+    """
+    Returns a digest of the hook configuration `config`.
+    """
+    return hashlib.sha1(json.dumps(
+        config or {},
+        sort_keys=True,
+        default=_encode
+    )).hexdigest()
+
+
+def request_key(service, request, config):
+    """
+    Returns the cache key for `request` to the `service` hook with the
+    configuration `config`.
+    """
+    payload = hashlib.sha1(request.query_string)
+    payload.update('\x00')
+    payload.update(request.get_data())
+
+    parts = [str(service.SERVICE_ID)]
+    parts.extend(
+        request.headers.get(header, '').encode('utf-8')
+        for header in service.cache_headers
+    )
+    parts.append(payload.hexdigest())
+    parts.append(fingerprint(config))
+
+    return key_prefix + hashlib.sha1('\x00'.join(parts)).hexdigest()
+
+
+def get(key):
+    """
+    Returns the cached lines for `key`, or ``None``.
+    """
+    r = current_app.redis
+
+    lines = r.get(key)
+    with r.pipeline() as pipe:
+        if lines is None:
+            pipe.hincrby(key_stats, 'misses', 1)
+        else:
+            pipe.hincrby(key_stats, 'hits', 1)
+            pipe.zadd(key_lru, {key: time.time()})
+        pipe.execute()
+
+    if lines is not None:
+        return json.loads(lines)
+
+
+def put(key, lines):
+    """
+    Caches `lines` under `key`, evicting the least recently used entries
+    if the cache is full.
+    """
+    r = current_app.redis
+    size = current_app.config['NOTIFICO_RENDER_CACHE_SIZE']
+
+    with r.pipeline() as pipe:
+        pipe.set(
+            key,
+            json.dumps(lines),
+            ex=current_app.config['NOTIFICO_RENDER_CACHE_TTL']
+        )
+        pipe.zadd(key_lru, {key: time.time()})
+        pipe.zcard(key_lru)
+        count = pipe.execute()[-1]
+
+    if count > size:
+        oldest = r.zrange(key_lru, 0, count - size - 1)
+        if oldest:
+            with r.pipeline() as pipe:
+                pipe.delete(*oldest)
+                pipe.zrem(key_lru, *oldest)
+                pipe.hincrby(key_stats, 'evictions', len(oldest))
+                pipe.execute()
+
+
+def stats():
+    """
+    Returns the number of entries, hits, misses and evictions and the hit
+    rate of the cache.
+    """
+    r = current_app.redis
+
+    counts = r.hgetall(key_stats)
+    hits = int(counts.get('hits', 0))
+    misses = int(counts.get('misses', 0))
+
+    return {
+        'size': r.zcard(key_lru),
+        'max_size': current_app.config['NOTIFICO_RENDER_CACHE_SIZE'],
+        'hits': hits,
+        'misses': misses,
+        'evictions': int(counts.get('evictions', 0)),
+        'hit_rate': float(hits) / (hits + misses) if hits + misses else 0.0
+    }
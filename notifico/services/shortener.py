@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+Cached URL shortening for hook messages.
+
+Short URLs are cached in Redis, so a URL seen in many messages (such as
+a pull request) is only shortened once. On a miss, the backends listed in
+``NOTIFICO_SHORTENERS`` are tried in order, within a total budget of
+``NOTIFICO_SHORTEN_BUDGET`` seconds. If none succeed, the long URL is
+used and the URL is shortened again in the background so later messages
+can use the short one. ``g.shorten_fallback`` is set when that happens,
+so the lines rendered with the long URL aren't cached.
+"""
+import re
+import time
+import hashlib
+
+import requests
+from flask import current_app, g, has_app_context, url_for
+
+from notifico import db
+
+#: Key name prefix for cached short URLs.
+key_prefix = 'short_url_'
+#: Key name prefix for URLs waiting to be shortened in the background.
+key_pending_prefix = 'short_url_pending_'
+
+#: Every available backend, by name.
+backends = {}
+
+
+def register(cls):
+    """
+    A class decorator adding the `Shortener` `cls` to the available
+    backends.
+    """
+    backends[cls.name] = cls()
+    return cls
+
+
+class Shortener(object):
+    """
+    The base type for URL shortening backends.
+    """
+    #: The name used to enable this backend in ``NOTIFICO_SHORTENERS``.
+    name = None
+
+    def accepts(self, url):
+        """
+        Returns `True` if this backend is able to shorten `url`.
+        """
+        return True
+
+    def shorten(self, url, timeout):
+        """
+        Returns the short version of `url`, or ``None``, taking no longer
+        than `timeout` seconds.
+        """
+        raise NotImplementedError()
+
+
+@register
+class GitIOShortener(Shortener):
+    """
+    Shortens github.com URLs with the git.io service.
+    """
+    name = 'gitio'
+
+    def accepts(self, url):
+        # Only github URLs can be shortened by the git.io service.
+        return re.match(r'^https?://([^/]+\.)?github\.com/', url) is not None
+
+    def shorten(self, url, timeout):
+        # git.io will return a 201 created on success and return the new
+        # url in the Location header.
+        r = requests.post('https://git.io', data={
+            'url': url
+        }, timeout=timeout)
+
+        # Something went wrong, usually means we're being throttled.
+        if r.status_code != 201:
+            return None
+
+        return r.headers['Location']
+
+
+@register
+class LocalShortener(Shortener):
+    """
+    Shortens any URL using a short link served by Notifico itself.
+    """
+    name = 'local'
+
+    def shorten(self, url, timeout):
+        # Must be imported here due to the circular nature of
+        # Hook <-> HookService.
+        from notifico.models import ShortLink
+
+        link = ShortLink.for_url(url)
+
+        root = current_app.config.get('NOTIFICO_SHORT_LINK_ROOT')
+        if root:
+            return root.rstrip('/') + '/' + link.code
+        return url_for('public.short_link', code=link.code, _external=True)
+
+
+def _digest(url):
+    if isinstance(url, unicode):
+        url = url.encode('utf-8')
+    return hashlib.sha1(url).hexdigest()
+
+
+def _backends_for(url):
+    """
+    Returns the enabled backends willing to shorten `url`, in order of
+    preference.
+    """
+    return [
+        backends[name]
+        for name in current_app.config.get('NOTIFICO_SHORTENERS', ())
+        if name in backends and backends[name].accepts(url)
+    ]
+
+
+def resolve(url, timeout):
+    """
+    Shortens `url` with the first backend able to, spending no more than
+    `timeout` seconds in total. Returns ``None`` if every backend failed.
+    """
+    deadline = time.time() + timeout
+
+    for backend in _backends_for(url):
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            break
+
+        try:
+            short = backend.shorten(url, remaining)
+        except (requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout):
+            # Ignore these errors since we can't do anything about them.
+            continue
+        except Exception:
+            # Send the others to Sentry.
+            from notifico import sentry
+            if sentry.client:
+                sentry.client.captureException()
+            continue
+
+        if short:
+            return short
+
+    return None
+
+
+def shorten(url):
+    """
+    Returns a short version of `url` if one is cached or can be made in
+    time, otherwise `url` itself.
+    """
+    if not url or not has_app_context() or not _backends_for(url):
+        return url
+
+    r = current_app.redis
+    digest = _digest(url)
+
+    short = r.get(key_prefix + digest)
+    if short:
+        return short.decode('utf-8')
+
+    short = resolve(url, current_app.config['NOTIFICO_SHORTEN_BUDGET'])
+    if short:
+        r.set(
+            key_prefix + digest,
+            short,
+            ex=current_app.config['NOTIFICO_SHORTEN_TTL']
+        )
+        return short
+
+    # Whatever this ends up in shouldn't be cached, or it would keep the
+    # long URL after the short one is ready.
+    g.shorten_fallback = True
+
+    # Out of time, try again in the background (just the once, no matter
+    # how many messages want this URL in the meantime).
+    if r.set(key_pending_prefix + digest, 1, nx=True, ex=60 * 10):
+        from notifico.services.background import shorten_url
+        shorten_url.delay(url)
+
+    return url
+
+
+def refresh(url):
+    """
+    Shortens `url` with the more generous
+    ``NOTIFICO_SHORTEN_BACKGROUND_TIMEOUT`` and caches the result for
+    future messages.
+    """
+    r = current_app.redis
+    digest = _digest(url)
+
+    short = resolve(
+        url,
+        current_app.config['NOTIFICO_SHORTEN_BACKGROUND_TIMEOUT']
+    )
+    if short:
+        # The local backend may have created a new link.
+        db.session.commit()
+        r.set(
+            key_prefix + digest,
+            short,
+            ex=current_app.config['NOTIFICO_SHORTEN_TTL']
+        )
+
+    r.delete(key_pending_prefix + digest)
+    return short
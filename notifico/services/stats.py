@@ -1,56 +1,179 @@
 # -*- coding: utf-8 -*-
 """
 A collection of utility methods for common site statistics.
+
+The site-wide totals are counters kept in Redis, rather than counted from
+the tables when they're shown. Rows created and deleted in a transaction
+are tallied as they're flushed, and the counters are changed together
+once it commits. Messages are counted by the hook endpoints with
+`count_message`. `reconcile` recounts everything, to repair any drift,
+and is run periodically by the worker.
 """
-from sqlalchemy import func, text
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, inspect
+
+from notifico import db
+from notifico.models import Channel, Hook, Project, User
+from notifico.services import network_stats
+
+#: Key name for the hash of site-wide totals.
+key_totals = 'stats_totals'
+#: Key name for the hash of messages by project owner.
+key_user_messages = 'stats_user_messages'
+
+#: The counter for each counted model.
+_COUNTERS = {
+    User: 'users',
+    Project: 'projects',
+    Channel: 'channels',
+    Hook: 'hooks'
+}
+
+# Session.info key for the changes waiting on the commit.
+_PENDING = 'stats_pending'
+
+
+def _pending(session):
+    return session.info.setdefault(_PENDING, {
+        key_totals: {},
+        key_user_messages: {}
+    })
+
+
+def _add(session, key, field, amount):
+    fields = _pending(session)[key]
+    fields[field] = fields.get(field, 0) + amount
+
+
+def _inserted(mapper, connection, target):
+    _add(inspect(target).session, key_totals, _COUNTERS[mapper.class_], 1)
+
+
+def _deleting(mapper, connection, target):
+    session = inspect(target).session
+    _add(session, key_totals, _COUNTERS[mapper.class_], -1)
 
-from notifico import db, cache
-from notifico.models import Project, Channel, User
+    if isinstance(target, Project):
+        # The project's messages go with it.
+        _add(session, key_totals, 'messages', -(target.message_count or 0))
+        _add(session, key_user_messages, target.owner_id,
+             -(target.message_count or 0))
+
+
+def _store(session):
+    """
+    Applies the changes made by a commit to the counters.
+    """
+    pending = session.info.pop(_PENDING, None)
+    if not pending or not has_app_context():
+        return
+
+    with current_app.redis.pipeline() as pipe:
+        for key, fields in pending.items():
+            for field, amount in fields.items():
+                if amount:
+                    pipe.hincrby(key, field, amount)
+        pipe.execute()
+
+
+def _discard(session, *args):
+    session.info.pop(_PENDING, None)
+
+
+def listen(session):
+    """
+    Keeps the counters up to date with changes committed by `session`.
+    """
+    for target, name, f in [
+            (session, 'after_commit', _store),
+            (session, 'after_rollback', _discard)] + [
+            (model, name, f) for model in _COUNTERS for name, f in (
+                ('after_insert', _inserted),
+                ('before_delete', _deleting))]:
+        if not event.contains(target, name, f):
+            event.listen(target, name, f)
+
+
+def count_message(session, project):
+    """
+    Counts a message sent to `project` when the transaction in `session`
+    commits. Message counts are changed with bulk updates, which we'd
+    otherwise never see.
+    """
+    _add(session, key_totals, 'messages', 1)
+    _add(session, key_user_messages, project.owner_id, 1)
+
+
+def count_rows(session, model, amount):
+    """
+    Counts `amount` rows of `model` created with bulk inserts when the
+    transaction in `session` commits.
+    """
+    _add(session, key_totals, _COUNTERS[model], amount)
+
+
+def reconcile():
+    """
+    Recounts every counter from the database, replacing the stored
+    counts.
+    """
+    totals = dict(
+        (name, model.query.count()) for model, name in _COUNTERS.items()
+    )
+    by_user = dict(
+        db.session.query(Project.owner_id, func.sum(Project.message_count))
+        .group_by(Project.owner_id)
+    )
+    totals['messages'] = sum(v or 0 for v in by_user.values())
+
+    with current_app.redis.pipeline() as pipe:
+        pipe.delete(key_totals, key_user_messages)
+        pipe.hmset(key_totals, totals)
+        for owner_id, count in by_user.items():
+            if count:
+                pipe.hset(key_user_messages, owner_id, int(count))
+        pipe.execute()
+
+    return totals
+
+
+def _total(name):
+    return int(current_app.redis.hget(key_totals, name) or 0)
 
 
-@cache.memoize(timeout=60 * 5)
 def total_messages(user=None):
     """
     Sum the total number of messages across all projects.
     """
-    q = db.session.query(
-        func.sum(Project.message_count)
-    )
     if user:
-        q = q.filter(Project.owner_id == user.id)
-
-    return q.scalar() or 0
+        return int(
+            current_app.redis.hget(key_user_messages, user.id) or 0
+        )
+    return _total('messages')
 
 
-@cache.memoize(timeout=60 * 5)
 def total_users():
-    return User.query.count()
+    return _total('users')
 
 
-@cache.memoize(timeout=60 * 5)
 def total_projects():
-    return Project.query.count()
+    return _total('projects')
+
+
+def total_channels():
+    return _total('channels')
+
+
+def total_hooks():
+    return _total('hooks')
 
 
-@cache.memoize(timeout=60 * 5)
 def total_networks():
-    return db.session.query(
-        func.count(func.distinct(Channel.host)).label('count')
-    ).scalar()
+    return network_stats.total_networks()
 
 
-@cache.memoize(timeout=60 * 5)
 def top_networks(limit=20):
-    return (
-        db.session.query(
-            Channel.host,
-            func.count(func.distinct(Channel.channel)).label('count'),
-        )
-        .join(Channel.project).filter(
-            Project.public == True,
-            Channel.public == True
-        )
-        .group_by(Channel.host)
-        .order_by(text('count desc'))
-        .limit(limit)
-    ).all()
+    return [
+        (host, distinct)
+        for host, distinct, total in network_stats.top_networks(limit=limit)
+    ]
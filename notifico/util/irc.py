@@ -2,11 +2,29 @@
 """
 Generic IRC utilities.
 """
-__all__ = ('mirc_colors', 'strip_mirc_colors')
+__all__ = ('mirc_colors', 'strip_mirc_colors', 'normalize', 'to_html')
 import re
+from collections import OrderedDict
 
-#: Precompiled regex for matching mIRC color codes.
-_STRIP_R = re.compile('\x03(?:\d{1,2}(?:,\d{1,2})?)?', re.UNICODE)
+from jinja2 import Markup, escape
+
+#: Every IRC formatting code: colors (mIRC and hex), bold, reset,
+#: monospace, reverse, italics, strikethrough and underline.
+_FORMATTING = (
+    r'\x03(?:\d{1,2}(?:,\d{1,2})?)?'
+    r'|\x04(?:[0-9a-fA-F]{6}(?:,[0-9a-fA-F]{6})?)?'
+    r'|[\x02\x0f\x11\x16\x1d\x1e\x1f]'
+)
+#: Whitespace, less the separator characters Python considers whitespace
+#: in unicode strings (\x1f is also underline).
+_SPACE = r'[^\S\x1c-\x1f]'
+#: Whitespace other than a lone space, which collapses to a single space.
+_WHITESPACE = r' {0}+|[^\S \x1c-\x1f]{0}*'.format(_SPACE)
+
+#: Precompiled regex for matching formatting codes.
+_STRIP_R = re.compile(_FORMATTING, re.UNICODE)
+#: Precompiled regex for matching whitespace to collapse.
+_COLLAPSE_R = re.compile(_WHITESPACE, re.UNICODE)
 
 #: Common mIRC color codes.
 _colors = dict(
@@ -38,48 +56,167 @@ def mirc_colors():
 
 def strip_mirc_colors(msg):
     """
-    Strips mIRC color codes from `msg`, returning the new string.
+    Strips mIRC color codes (and any other formatting) from `msg`,
+    returning the new string.
     """
     return _STRIP_R.sub('', msg)
 
 
+def normalize(msg, strip=True):
+    """
+    Collapses all whitespace in `msg` (including newlines) into single
+    spaces and, if `strip` is ``True``, removes all formatting codes.
+    """
+    # Both are plain substitutions run entirely by the regex engine, which
+    # is quicker than a single pattern needing a Python callback to decide
+    # what each match becomes. Formatting goes first so that codes between
+    # two spaces don't leave both behind.
+    if strip:
+        msg = _STRIP_R.sub('', msg)
+    return _COLLAPSE_R.sub(' ', msg)
+
+
+#: CSS colors for each mIRC color number when rendering HTML.
+_html_colors = {
+    0: 'white',
+    1: '#DADADA',
+    2: '#7FA5EB',
+    3: 'green',
+    4: '#DB5858',
+    5: 'brown',
+    6: 'purple',
+    7: 'orange',
+    8: 'yellow',
+    9: 'lightgreen',
+    10: 'teal',
+    11: '#25B8C2',
+    12: 'lightblue',
+    13: '#E36FB8',
+    14: 'gray',
+    15: 'lightgray'
+}
+
+#: Precompiled regex for tokenizing messages for `to_html()`. Colors
+#: capture their foreground and background, toggles capture the code.
+_TOKEN_R = re.compile(
+    r'\x03(?:(\d{1,2})(?:,(\d{1,2}))?)?'
+    r'|\x04(?:([0-9a-fA-F]{6})(?:,([0-9a-fA-F]{6}))?)?'
+    r'|([\x02\x0f\x11\x16\x1d\x1e\x1f\n])',
+    re.UNICODE
+)
+
+#: Toggles, by their formatting code.
+_TOGGLES = {
+    '\x02': 'bold',
+    '\x11': 'mono',
+    '\x16': 'reverse',
+    '\x1d': 'italic',
+    '\x1e': 'strike',
+    '\x1f': 'underline'
+}
+
+#: Recently rendered messages, least recently used first.
+_html_cache = OrderedDict()
+_html_cache_size = 2048
+
+
+def _html_color(color):
+    """
+    Returns the CSS color for a mIRC color number or hex color.
+    """
+    if isinstance(color, int):
+        return _html_colors.get(color)
+    return color
+
+
+def _html_span(text, fg, bg, toggles):
+    """
+    Returns `text` escaped and wrapped in a span styled with the given
+    colors and toggles, if it has any.
+    """
+    if 'reverse' in toggles:
+        fg, bg = (0 if bg is None else bg), (1 if fg is None else fg)
+
+    style = []
+    if fg is not None and _html_color(fg):
+        style.append('color: {0}'.format(_html_color(fg)))
+    if bg is not None and _html_color(bg):
+        style.append('background-color: {0}'.format(_html_color(bg)))
+    if 'bold' in toggles:
+        style.append('font-weight: bold')
+    if 'italic' in toggles:
+        style.append('font-style: italic')
+    if 'mono' in toggles:
+        style.append('font-family: monospace')
+
+    decoration = [
+        d for t, d in (('underline', 'underline'), ('strike', 'line-through'))
+        if t in toggles
+    ]
+    if decoration:
+        style.append('text-decoration: {0}'.format(' '.join(decoration)))
+
+    text = escape(text)
+    if not style:
+        return text
+    return u'<span style="{0};">{1}</span>'.format('; '.join(style), text)
+
+
+def _render_html(message):
+    fg = bg = None
+    toggles = set()
+    html = []
+
+    # Everything between two codes is rendered as a single span with the
+    # formatting at that point, so spans never need to nest.
+    position = 0
+    for m in _TOKEN_R.finditer(message):
+        if m.start() > position:
+            html.append(_html_span(
+                message[position:m.start()],
+                fg,
+                bg,
+                toggles
+            ))
+        position = m.end()
+
+        mirc_fg, mirc_bg, hex_fg, hex_bg, code = m.groups()
+        if code is None and message[m.start()] == '\x03':
+            # A color code on its own resets the colors.
+            fg = None if mirc_fg is None else int(mirc_fg)
+            if mirc_fg is None or mirc_bg is not None:
+                bg = None if mirc_bg is None else int(mirc_bg)
+        elif code is None:
+            fg = None if hex_fg is None else '#' + hex_fg
+            if hex_fg is None or hex_bg is not None:
+                bg = None if hex_bg is None else '#' + hex_bg
+        elif code == '\n':
+            html.append(u'<br/>')
+        elif code == '\x0f':
+            fg = bg = None
+            toggles.clear()
+        else:
+            toggles.symmetric_difference_update((_TOGGLES[code],))
+
+    if position < len(message):
+        html.append(_html_span(message[position:], fg, bg, toggles))
+
+    return Markup(u''.join(html))
+
+
 def to_html(message):
-    from jinja2 import Markup, escape
-
-    c_to_c = {
-        0: 'white',
-        1: '#DADADA',
-        2: '#7FA5EB',
-        3: 'green',
-        4: '#DB5858',
-        5: 'brown',
-        6: 'purple',
-        7: 'orange',
-        8: 'yellow',
-        9: 'lightgreen',
-        10: 'teal',
-        11: '#25B8C2',
-        12: 'lightblue',
-        13: '#E36FB8'
-    }
-
-    def _mirc_to_span(m):
-        return Markup(
-            '<span style="color: {fore};">{text}</span>'.format(
-                text=m.group(3),
-                fore=c_to_c.get(int(m.group(1)), 'black"')
-        ))
-
-    m = []
-    for line in message.split('\n'):
-        m.append(
-            re.sub(
-                #r'\x03(\d{1,2}),?(\d{1,2})(.*?)\x03',
-                #r'\x03([0-9]{1,2}),?([0-9]{1,2})(.*?)\x03',
-                r'\x03(\d{1,2})(,[0-9]{1,2})?(.*?)\x03',
-                _mirc_to_span,
-                escape(line),
-            )
-        )
-
-    return Markup('<br/>'.join(m))
+    """
+    Renders `message` as HTML, with its IRC formatting (colors, bold,
+    italics, underline, strikethrough, monospace and reverse) as styled
+    spans and newlines as line breaks.
+
+    Recently rendered messages are cached, since pages listing messages
+    tend to show the same ones over and over.
+    """
+    html = _html_cache.pop(message, None)
+    if html is None:
+        html = _render_html(message)
+        if len(_html_cache) >= _html_cache_size:
+            _html_cache.popitem(last=False)
+    _html_cache[message] = html
+    return html
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Keyset (cursor) pagination.
+
+Rather than an ``OFFSET``, each page continues from the sort key of the
+last row of the previous one, so page N costs the same as the first.
+"""
+__all__ = ('KeysetPage', 'paginate', 'approximate_total')
+import json
+import base64
+import datetime
+
+from sqlalchemy import and_, or_
+
+from notifico import cache
+
+_DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+
+def _encode_value(value):
+    if isinstance(value, datetime.datetime):
+        return {'d': value.strftime(_DATETIME_FORMAT)}
+    return value
+
+
+def _decode_value(value, key):
+    """
+    Returns `value` decoded for the column `key`, raising a `ValueError`
+    if it isn't of the column's type.
+    """
+    if isinstance(value, dict):
+        value = datetime.datetime.strptime(value['d'], _DATETIME_FORMAT)
+
+    try:
+        expected = key.type.python_type
+    except NotImplementedError:
+        return value
+
+    if expected in (int, long):
+        expected = (int, long)
+    elif expected is float:
+        expected = (int, long, float)
+    elif issubclass(expected, basestring):
+        expected = basestring
+
+    # JSON booleans are ints as far as isinstance() is concerned.
+    if isinstance(value, bool) or not isinstance(value, expected):
+        raise ValueError('not a value of {0!r}'.format(key))
+    return value
+
+
+def encode_cursor(direction, values):
+    """
+    Returns an opaque token for continuing from the sort key `values` in
+    `direction`, either ``'next'`` or ``'prev'``.
+    """
+    return base64.urlsafe_b64encode(json.dumps(
+        [direction[0]] + [_encode_value(v) for v in values]
+    )).rstrip('=')
+
+
+def decode_cursor(cursor, keys):
+    """
+    Returns the direction and sort key from the token `cursor`, or
+    ``None`` if it isn't a valid cursor for the columns `keys`.
+    """
+    try:
+        cursor = str(cursor)
+        data = json.loads(base64.urlsafe_b64decode(
+            cursor + '=' * (-len(cursor) % 4)
+        ))
+        direction, values = data[0], data[1:]
+        if direction not in ('n', 'p') or len(values) != len(keys):
+            return None
+        return (
+            'next' if direction == 'n' else 'prev',
+            [_decode_value(v, k) for v, k in zip(values, keys)]
+        )
+    except (TypeError, ValueError, KeyError, IndexError, UnicodeError):
+        return None
+
+
+def _beyond(keys, values, reverse=False):
+    """
+    Returns a clause matching rows sorted after `values` on `keys`, which
+    are sorted in descending order (ascending if `reverse`).
+    """
+    key, value = keys[0], values[0]
+    past = key > value if reverse else key < value
+    if len(keys) == 1:
+        return past
+    return or_(past, and_(key == value, _beyond(keys[1:], values[1:], reverse)))
+
+
+class KeysetPage(object):
+    """
+    A page of `items`, with the cursors for the pages either side of it.
+    """
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None,
+                 total=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        #: The (approximate) number of items over all pages, if known.
+        self.total = total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def paginate(q, keys, cursor=None, per_page=25, total=None):
+    """
+    Returns the `KeysetPage` of the query `q` following `cursor`, or the
+    first page.
+
+    :param keys: The columns to sort by, in descending order. The last
+                 must be unique, such as the primary key.
+    """
+    position = decode_cursor(cursor, keys) if cursor else None
+    direction, values = position or ('next', None)
+    backwards = direction == 'prev'
+
+    if values is not None:
+        q = q.filter(_beyond(keys, values, reverse=backwards))
+
+    q = q.order_by(False).order_by(*[
+        key.asc() if backwards else key.desc() for key in keys
+    ])
+
+    # One extra row tells us if there's another page.
+    items = q.limit(per_page + 1).all()
+    more = len(items) > per_page
+    items = items[:per_page]
+    if backwards:
+        items.reverse()
+
+    def _cursor(direction, item):
+        return encode_cursor(direction, [getattr(item, k.key) for k in keys])
+
+    if backwards:
+        # We came back from the next page, so there must be one.
+        has_next, has_prev = True, more
+    else:
+        has_next, has_prev = more, values is not None
+
+    next_cursor = prev_cursor = None
+    if items:
+        if has_next:
+            next_cursor = _cursor('next', items[-1])
+        if has_prev:
+            prev_cursor = _cursor('prev', items[0])
+
+    return KeysetPage(
+        items,
+        per_page,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor,
+        total=total
+    )
+
+
+def approximate_total(name, q, timeout=60 * 5):
+    """
+    Returns the number of rows in the query `q`, counted at most once
+    every `timeout` seconds for each `name`.
+    """
+    key = 'keyset_total_' + name
+    total = cache.get(key)
+    if total is None:
+        total = q.order_by(False).count()
+        cache.set(key, total, timeout=timeout)
+    return total
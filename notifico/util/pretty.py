@@ -2,11 +2,13 @@
 """
 Utilities for pretty-printing data[types].
 """
-__all__ = ('pretty_date', 'plural', 'trim', 'fix_link')
+__all__ = ('pretty_date', 'time_tag', 'plural', 'trim', 'fix_link')
 import re
 import sys
 from datetime import datetime
 
+from jinja2 import Markup
+
 
 def pretty_date(time=False):
     """
@@ -46,6 +48,24 @@ def pretty_date(time=False):
     return str(day_diff / 365) + " years ago"
 
 
+def time_tag(time):
+    """
+    Returns a ``<time>`` element for the datetime `time`, which a script
+    on the page shows the same way as `pretty_date`. Unlike `pretty_date`,
+    the markup doesn't depend on when it was rendered.
+    """
+    if not time:
+        return Markup('')
+
+    return Markup(
+        u'<time class="pretty-date" datetime="{0}Z" title="{1} UTC">'
+        u'{1} UTC</time>'
+    ).format(
+        time.strftime('%Y-%m-%dT%H:%M:%S'),
+        time.strftime('%Y-%m-%d %H:%M')
+    )
+
+
 def plural(v, singular, plural):
     return plural.format(v=v) if v > 1 else singular.format(v=v)
 
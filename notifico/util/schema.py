@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Bringing an existing database up to date with the models.
+"""
+__all__ = ('existing_indexes', 'create_missing_indexes')
+from sqlalchemy import inspect
+
+from notifico import db
+
+
+def existing_indexes():
+    """
+    Returns the names of the indexes in the database. Reflection leaves
+    out expression indexes (such as those on ``lower(name)``), so they're
+    read from the catalog where we can.
+    """
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        q = "SELECT name FROM sqlite_master WHERE type = 'index'"
+    elif dialect == 'postgresql':
+        q = (
+            'SELECT indexname FROM pg_indexes'
+            ' WHERE schemaname = current_schema()'
+        )
+    else:
+        inspector = inspect(db.engine)
+        return set(
+            i['name']
+            for table in inspector.get_table_names()
+            for i in inspector.get_indexes(table)
+        )
+
+    return set(name for name, in db.engine.execute(q))
+
+
+def create_missing_indexes():
+    """
+    Creates the indexes declared on the models that don't exist in the
+    database yet. Returns the names of the indexes created.
+    """
+    existing = existing_indexes()
+    created = []
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(db.engine)
+                created.append(index.name)
+    return created
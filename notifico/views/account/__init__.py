@@ -1,6 +1,4 @@
 # -*- coding: utf-8 -*-
-import json
-
 from flask import (
     Blueprint,
     render_template,
@@ -10,13 +8,15 @@ from flask import (
     url_for,
     session,
     abort,
-    make_response,
+    Response,
+    stream_with_context,
     request,
     flash
 )
 from notifico import db, user_required
 from notifico.models import User, AuthToken
-from notifico.services import reset, background
+from notifico.services import reset, background, export
+from notifico.views.account.identity import Identity
 from notifico.views.account.forms import (
     UserLoginForm,
     UserRegisterForm,
@@ -29,17 +29,13 @@ from notifico.views.account.forms import (
 account = Blueprint('account', __name__, template_folder='templates')
 # Usernames that cannot be registered because they clash with internal
 # routes.
-_reserved = ('new',)
+_reserved = ('new', 'api')
 
 
 @account.before_app_request
 def set_user():
-    g.user = None
-    if '_u' in session and '_uu' in session:
-        g.user = User.query.filter_by(
-            id=session['_u'],
-            username=session['_uu']
-        ).first()
+    # The user itself is only loaded when g.user is first used.
+    g.identity = Identity.from_session(session)
 
 
 @account.route('/login', methods=['GET', 'POST'])
@@ -236,8 +232,9 @@ def settings(do=None):
             del session['_u']
         if '_ue' in session:
             del session['_ue']
-        # Remove the user from the DB.
-        g.user.projects.order_by(False).delete()
+        # Remove the user from the DB. Their projects, and the projects'
+        # channels and hooks, are deleted along with them so the site
+        # statistics see them go.
         db.session.delete(g.user)
         db.session.commit()
 
@@ -257,13 +254,12 @@ def user_export():
     Provides the user, their projects, channels, and hooks as a JSON
     file.
     """
-    response = make_response(
-        json.dumps(
-            g.user.export(), sort_keys=True, indent=4
-        )
+    # Written out a batch of projects at a time, rather than built in
+    # memory first.
+    return Response(
+        stream_with_context(export.export_user(g.user)),
+        mimetype='application/json'
     )
-    response.headers['Content-Type'] = 'application/json'
-    return response
 
 
 @account.route('/tokens/')
@@ -290,3 +286,23 @@ def tokens(tid=None):
         return redirect(url_for('.tokens'))
 
     return render_template('tokens.html')
+
+
+@account.route('/tokens/new', methods=['POST'])
+@user_required
+def new_api_token():
+    """
+    Creates a new token for the JSON API. Its secret is only ever shown
+    this once.
+    """
+    t, secret = AuthToken.new_api_token()
+    g.user.tokens.append(t)
+    db.session.add(t)
+    db.session.commit()
+
+    flash(
+        'Your new API token is {0} - keep it safe, it will not be shown'
+        ' again.'.format(secret),
+        'success'
+    )
+    return redirect(url_for('.tokens'))
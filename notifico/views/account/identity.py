@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+The identity of the user making a request.
+
+The session only names the user, so the user is only loaded the first
+time something asks for ``g.user``. Requests that never do, such as those
+to hook endpoints, don't query for the user at all.
+"""
+__all__ = ('Identity', 'RequestGlobals')
+from flask.ctx import _AppCtxGlobals
+
+# Marks a user not yet loaded, as ``None`` means there's no such user.
+_UNLOADED = object()
+
+
+class Identity(object):
+    """
+    The user named by a request's session, loaded on first use.
+    """
+    def __init__(self, user_id=None, username=None):
+        self.user_id = user_id
+        self.username = username
+        self._user = _UNLOADED if user_id is not None else None
+
+    @classmethod
+    def from_session(cls, session):
+        """
+        Returns the `Identity` for the user logged in to `session`.
+        """
+        if '_u' in session and '_uu' in session:
+            return cls(session['_u'], session['_uu'])
+        return cls()
+
+    @property
+    def anonymous(self):
+        """
+        ``True`` if the session doesn't name a user. The user it names
+        may still turn out not to exist.
+        """
+        return self.user_id is None
+
+    @property
+    def user(self):
+        """
+        The logged in `User`, or ``None``.
+        """
+        if self._user is _UNLOADED:
+            from notifico.models import User
+
+            self._user = User.query.filter_by(
+                id=self.user_id,
+                username=self.username
+            ).first()
+        return self._user
+
+    @property
+    def groups(self):
+        """
+        A frozenset of the names of the groups the user is in.
+        """
+        user = self.user
+        return user.group_names if user else frozenset()
+
+    def in_group(self, name):
+        return name.lower() in self.groups
+
+
+class RequestGlobals(_AppCtxGlobals):
+    """
+    Flask's ``g``, with ``g.user`` taken from ``g.identity`` when it's
+    first used.
+    """
+    @property
+    def user(self):
+        identity = self.__dict__.get('identity')
+        return identity.user if identity is not None else None
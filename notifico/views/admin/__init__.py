@@ -6,12 +6,15 @@ from flask import (
     redirect,
     request,
     render_template,
-    abort
+    abort,
+    jsonify
 )
 import flask_wtf as wtf
 
 from notifico import db, user_required, group_required
 from notifico.models import Group, Project, Channel, Hook, User
+from notifico.services import render_cache
+from notifico.util import keyset
 
 admin = Blueprint('admin', __name__, template_folder='templates')
 
@@ -41,20 +44,22 @@ def admin_make():
     return redirect(url_for('public.landing'))
 
 
-@admin.route('/projects/', defaults={'page': 1})
-@admin.route('/projects/<int:page>')
+@admin.route('/projects/')
 @group_required('admin')
-def admin_projects(page=1):
+def admin_projects():
     per_page = min(int(request.args.get('l', 25)), 100)
     sort_by = request.args.get('s', 'created')
 
-    q = Project.query.order_by(False)
-    q = q.order_by({
-        'created': Project.created.desc(),
-        'messages': Project.message_count.desc()
-    }.get(sort_by, Project.created.desc()))
-
-    pagination = q.paginate(page, per_page, False)
+    pagination = keyset.paginate(
+        Project.query,
+        {
+            'created': (Project.created, Project.id),
+            'messages': (Project.message_count, Project.id)
+        }.get(sort_by, (Project.created, Project.id)),
+        cursor=request.args.get('c'),
+        per_page=per_page,
+        total=keyset.approximate_total('projects_admin', Project.query)
+    )
 
     return render_template(
         'admin_projects.html',
@@ -63,6 +68,16 @@ def admin_projects(page=1):
     )
 
 
+@admin.route('/projects/<int:page>')
+@group_required('admin')
+def old_admin_projects(page):
+    """
+    Numbered pages were replaced by cursors, so old links go to the
+    first page.
+    """
+    return redirect(url_for('.admin_projects', **request.args.to_dict()), 301)
+
+
 @admin.route('/user/<username>/', methods=['GET', 'POST'])
 @group_required('admin')
 def admin_user(username):
@@ -119,6 +134,16 @@ def admin_orphans():
     return 'Orphans cleaned.'
 
 
+@admin.route('/render-cache')
+@group_required('admin')
+def admin_render_cache():
+    """
+    Hit rate and size of the hook render cache, for tuning
+    ``NOTIFICO_RENDER_CACHE_SIZE``.
+    """
+    return jsonify(render_cache.stats())
+
+
 @admin.route('/error/<int:code>')
 @group_required('admin')
 def admin_error(code):
@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+"""__init__.py
+
+A token-authenticated JSON API for managing many projects, channels and
+hooks at once.
+"""
+from functools import wraps
+
+from flask import Blueprint, jsonify, request, url_for
+from sqlalchemy import func
+from werkzeug.datastructures import MultiDict
+
+from notifico import db
+from notifico.models import AuthToken, Channel, Hook, Project
+from notifico.services.hooks import HookService
+from notifico.views.projects import ChannelDetailsForm, ProjectDetailsForm
+
+api = Blueprint('api', __name__)
+
+#: The most projects in a single bulk request.
+MAX_PROJECTS = 500
+
+
+def token_required(f):
+    """
+    A decorator for views which require an API token, given in an
+    ``Authorization: Token <secret>`` header. The token's owner is passed
+    to the view as `user`.
+    """
+    @wraps(f)
+    def _wrapped(*args, **kwargs):
+        scheme, _, secret = request.headers.get(
+            'Authorization', ''
+        ).partition(' ')
+        token = None
+        if scheme.lower() == 'token' and secret.strip():
+            token = AuthToken.by_api_secret(secret.strip())
+        if token is None or token.owner is None:
+            return _error(401, 'A valid API token is required.')
+
+        kwargs['user'] = token.owner
+        return f(*args, **kwargs)
+    return _wrapped
+
+
+def _error(status, message, errors=None):
+    response = jsonify(error=message, errors=errors or [])
+    response.status_code = status
+    return response
+
+
+def _form(form_class, data):
+    """
+    Returns `form_class` filled from the JSON object `data`, rather than
+    from the request's form.
+    """
+    formdata = MultiDict()
+    for key, value in data.items():
+        if isinstance(value, list):
+            formdata.setlist(key, value)
+        elif isinstance(value, bool):
+            # A checkbox that isn't checked isn't sent at all.
+            if value:
+                formdata[key] = 'y'
+        elif value is not None:
+            formdata[key] = unicode(value)
+
+    return form_class(formdata=formdata, csrf_enabled=False)
+
+
+def _list(data, key):
+    """
+    Returns the list `key` from the JSON object `data`, an empty list if
+    it's missing, or ``None`` if it isn't a list.
+    """
+    value = data.get(key)
+    if value is None:
+        return []
+    return value if isinstance(value, list) else None
+
+
+def _is_id(value):
+    # JSON's true and false are ints to Python, but aren't ids.
+    return isinstance(value, (int, long)) and not isinstance(value, bool)
+
+
+def _hook_config(service, config):
+    """
+    Returns the packed configuration for `service` from the JSON object
+    `config`, and any errors.
+    """
+    form_class = service.form()
+    if form_class is None:
+        return None, {}
+
+    form = _form(form_class, config or {})
+    if not form.validate():
+        return None, form.errors
+    if 'templates' in form and not service.validate_templates(form.templates):
+        return None, form.errors
+    return service.pack_form(form), {}
+
+
+def _hook_url(project, hook):
+    return hook.absolute_url() or url_for(
+        'projects.hook_receive',
+        pid=project.id,
+        key=hook.key,
+        _external=True
+    )
+
+
+@api.route('/bulk', methods=['POST'])
+@token_required
+def bulk(user):
+    """
+    Creates or updates many projects and their channels and hooks in one
+    transaction. Everything is validated before anything is written, so
+    either the whole batch is applied or none of it is.
+
+    The body is a JSON object with a list of ``projects``, each with the
+    project ``name`` and optionally ``public``, ``website``, a list of
+    ``channels`` (``channel``, ``host``, ``port``, ``ssl``, ``public``)
+    and a list of ``hooks`` (``service_id`` and ``config``, and ``id`` to
+    update an existing hook). Projects are matched by name and channels by
+    host and channel, and are updated if they already exist.
+    """
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict) or not isinstance(
+            body.get('projects'), list):
+        return _error(400, 'Expected an object with a list of projects.')
+
+    batch = body['projects']
+    if len(batch) > MAX_PROJECTS:
+        return _error(400, 'At most {0} projects may be sent at once.'.format(
+            MAX_PROJECTS
+        ))
+
+    errors = []
+
+    def _invalid(path, field_errors):
+        errors.append({'path': path, 'errors': field_errors})
+
+    # Validate the whole batch before touching anything, keeping the
+    # filled in forms and packed hook configurations.
+    validated = []
+    for i, data in enumerate(batch):
+        path = 'projects[{0}]'.format(i)
+        if not isinstance(data, dict):
+            _invalid(path, {'project': ['Expected an object.']})
+            continue
+
+        form = _form(ProjectDetailsForm, dict(
+            (k, data[k]) for k in ('name', 'public', 'website') if k in data
+        ))
+        # New projects are public unless told otherwise.
+        form.public.data = bool(data.get('public', True))
+        if not form.validate():
+            _invalid(path, form.errors)
+
+        channel_list = _list(data, 'channels')
+        if channel_list is None:
+            _invalid(path, {'channels': ['Expected a list.']})
+            channel_list = []
+
+        channel_forms = []
+        for j, c in enumerate(channel_list):
+            cpath = '{0}.channels[{1}]'.format(path, j)
+            if not isinstance(c, dict):
+                _invalid(cpath, {'channel': ['Expected an object.']})
+                continue
+            cform = _form(ChannelDetailsForm, c)
+            cform.public.data = bool(c.get('public', True))
+            if not cform.validate():
+                _invalid(cpath, cform.errors)
+            channel_forms.append(cform)
+
+        hook_list = _list(data, 'hooks')
+        if hook_list is None:
+            _invalid(path, {'hooks': ['Expected a list.']})
+            hook_list = []
+
+        hook_configs = []
+        for j, h in enumerate(hook_list):
+            hpath = '{0}.hooks[{1}]'.format(path, j)
+            if not isinstance(h, dict):
+                _invalid(hpath, {'hook': ['Expected an object.']})
+                continue
+            service_id = h.get('service_id')
+            service = None
+            if _is_id(service_id):
+                service = HookService.services.get(service_id)
+            if service is None:
+                _invalid(hpath, {'service_id': ['There is no such service.']})
+                continue
+            hook_id = h.get('id')
+            if hook_id is not None and not _is_id(hook_id):
+                _invalid(hpath, {'id': ['There is no such hook.']})
+                continue
+            config, hook_errors = _hook_config(service, h.get('config'))
+            if hook_errors:
+                _invalid(hpath, {'config': hook_errors})
+            hook_configs.append((hpath, h.get('id'), service_id, config))
+
+        validated.append((data, form, channel_forms, hook_configs))
+
+    if errors:
+        return _error(400, 'The batch is not valid.', errors)
+
+    # Everything that might be updated, in one query each.
+    names = set(form.name.data.lower() for _, form, _, _ in validated)
+    projects = {}
+    if names:
+        projects = dict((p.name.lower(), p) for p in Project.query.filter(
+            Project.owner_id == user.id,
+            func.lower(Project.name).in_(names)
+        ))
+    by_id = dict((p.id, p) for p in projects.values())
+
+    channels = {}
+    hooks = {}
+    if by_id:
+        channels = dict(
+            ((by_id[c.project_id].name.lower(), c.host, c.channel), c)
+            for c in Channel.query.filter(Channel.project_id.in_(list(by_id)))
+        )
+
+        hook_ids = [
+            hook_id for _, _, _, configs in validated
+            for _, hook_id, _, _ in configs if hook_id
+        ]
+        if hook_ids:
+            hooks = dict((h.id, h) for h in Hook.query.filter(
+                Hook.id.in_(hook_ids),
+                Hook.project_id.in_(list(by_id))
+            ))
+
+    # Hooks can only be updated through the project they belong to.
+    for _, form, _, configs in validated:
+        for hpath, hook_id, _, _ in configs:
+            h = hooks.get(hook_id)
+            if hook_id and (h is None or by_id[h.project_id].name.lower() !=
+                            form.name.data.lower()):
+                _invalid(hpath, {'id': ['There is no such hook.']})
+
+    if errors:
+        return _error(400, 'The batch is not valid.', errors)
+
+    results = []
+    new = []
+    for data, form, channel_forms, configs in validated:
+        name = form.name.data.lower()
+        p = projects.get(name)
+        created = p is None
+        if created:
+            p = Project.new(form.name.data, public=form.public.data,
+                            website=form.website.data)
+            p.full_name = '{0}/{1}'.format(user.username, p.name)
+            p.owner = user
+            projects[name] = p
+            new.append(p)
+        else:
+            if 'public' in data:
+                p.public = form.public.data
+            if 'website' in data:
+                p.website = (form.website.data or '').strip() or None
+
+        for cform in channel_forms:
+            host = cform.host.data.strip().lower()
+            channel = cform.channel.data.strip().lower()
+            c = channels.get((name, host, channel))
+            if c is None:
+                c = Channel.new(
+                    channel,
+                    host,
+                    port=cform.port.data,
+                    ssl=cform.ssl.data,
+                    public=cform.public.data
+                )
+                c.project = p
+                channels[(name, host, channel)] = c
+                new.append(c)
+            else:
+                c.port = cform.port.data
+                c.ssl = cform.ssl.data
+                c.public = cform.public.data
+
+        project_hooks = []
+        for _, hook_id, service_id, config in configs:
+            h = hooks.get(hook_id) if hook_id else None
+            if h is None:
+                h = Hook.new(service_id, config=config)
+                h.project = p
+                new.append(h)
+            else:
+                h.service_id = service_id
+                h.config = config
+            project_hooks.append(h)
+
+        results.append((p, created, project_hooks))
+
+    db.session.add_all(new)
+    # One flush and one commit for the whole batch, so the counters and
+    # caches are updated once.
+    db.session.commit()
+
+    return jsonify(projects=[{
+        'id': p.id,
+        'name': p.name,
+        'created': created,
+        'hooks': [{
+            'id': h.id,
+            'service_id': h.service_id,
+            'url': _hook_url(p, h)
+        } for h in project_hooks]
+    } for p, created, project_hooks in results])
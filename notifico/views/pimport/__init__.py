@@ -1,7 +1,6 @@
 # -*- coding: utf8 -*-
 import urllib
 import requests
-from itertools import chain
 
 from flask import (
     Blueprint,
@@ -10,13 +9,16 @@ from flask import (
     url_for,
     redirect,
     request,
-    current_app
+    current_app,
+    abort,
+    jsonify
 )
 import flask_wtf as wtf
-from github import Github, GithubException
+from github import GithubException
 
 from notifico import db, user_required
-from notifico.models import AuthToken, Project, Hook, Channel
+from notifico.models import AuthToken
+from notifico.services import github_import
 
 pimport = Blueprint('pimport', __name__, template_folder='templates')
 
@@ -90,14 +92,9 @@ def github():
             )
         )
 
-    # Set authentication and pull a JSON blob of all their
-    # repos that they have actually created (or forked).
-    # If we leave type as the default ("all") we also get
-    # repos they have permission on, which we probably don't want.
-    git = Github(
-        access_token.token,
-        user_agent="Notifico Github Import/0.1"
-    )
+    # Set authentication and pull all of the repos they administer, both
+    # their own and their organizations', a page at a time.
+    git = github_import.client(access_token)
     # Test to make sure our token is still good...
     try:
         git.get_user().login
@@ -117,104 +114,59 @@ def github():
                 db.session.commit()
             return redirect(request.path)
 
-    user = git.get_user()
-    # Get all of the users own repositories
-    user_repos = user.get_repos(type='all')
-    # ... and get all of the repos in the users organizations ...
-    all_repos = chain(user_repos, *[o.get_repos() for o in user.get_orgs()])
-    admin_repos = (r for r in all_repos if r.permissions.admin)
-
-    summary = None
     options_form = GithubForm()
     if options_form.validate_on_submit():
-        summary = []
-
-        for repo in admin_repos:
-            # User didn't check the box, don't import this project.
-            # A hack-ish solution to wtform's BooleanField limitation,
-            # or I would be using wtf.FieldList(wtf.BooleanField(...)).
-            if request.form.get(str(repo.id), None) != 'y':
-                continue
-
-            # Make sure this project doesn't already exists.
-            p = Project.by_name_and_owner(repo.name, g.user)
-            if p is None:
-                p = Project.new(
-                    repo.name,
-                    public=not repo.private,
-                    website=repo.homepage
-                )
-                p.full_name = '{0}/{1}'.format(g.user.username, p.name)
-                g.user.projects.append(p)
-                db.session.add(p)
-                # We need to commit to generate the project.id which is
-                # used for the following steps.
-                db.session.commit()
-
-                summary.append((
-                    'Project {0} created.'.format(repo.name),
-                    True
-                ))
-            elif p is not None and not options_form.update_projects.data:
-                summary.append((
-                    'Skipping existing project {0}.'.format(repo.name),
-                    False
-                ))
-                continue
-            else:
-                summary.append((
-                    'Project {0} updated.'.format(repo.name),
-                    True
-                ))
-
-            if options_form.set_hooks.data:
-                # The user wanted us to auto-create web hooks for them.
-                h = Hook.query.filter_by(
-                    project_id=p.id,
-                    service_id=10
-                ).first()
-                if h is None:
-                    # No hooks for github have been setup yet, so go ahead
-                    # and create one.
-                    h = Hook.new(10)
-                    p.hooks.append(h)
-                    db.session.add(h)
-
-                    repo.create_hook('web', {
-                        'url': url_for(
-                            'projects.hook_receive',
-                            pid=p.id,
-                            key=h.key,
-                            _external=True
-                        )
-                    })
-
-            if options_form.set_commits.data and p.public:
-                # The user wanted us to add their public projects
-                # to #commits@chat.freenode.net for them, but only if it
-                # isn't already there.
-                c = Channel.query.filter_by(
-                    host='chat.freenode.net',
-                    channel='#commits',
-                    project_id=p.id
-                ).first()
-                if c is None:
-                    # It does *not* already exist, so go ahead and add it.
-                    c = Channel.new(
-                        '#commits',
-                        'chat.freenode.net',
-                        6667,
-                        ssl=False,
-                        public=True
-                    )
-                    p.channels.append(c)
-                    db.session.add(c)
-
-        db.session.commit()
+        # A hack-ish solution to wtform's BooleanField limitation,
+        # or I would be using wtf.FieldList(wtf.BooleanField(...)).
+        repo_ids = [
+            int(k) for k, v in request.form.items() if k.isdigit() and v == 'y'
+        ]
+        # Importing hundreds of repositories takes far longer than a
+        # request should, so it's done in the background.
+        job_id = github_import.start(
+            g.user,
+            repo_ids,
+            update_projects=options_form.update_projects.data,
+            set_hooks=options_form.set_hooks.data,
+            set_commits=options_form.set_commits.data
+        )
+        return redirect(url_for('.github_progress', job_id=job_id))
 
     return render_template(
         'github.html',
         options_form=options_form,
-        summary=summary,
-        user_repos=admin_repos
+        user_repos=github_import.repos(git)
     )
+
+
+def _job_progress(job_id, since=0):
+    """
+    Returns the progress of the import `job_id`, if it belongs to the
+    current user, otherwise aborts with a 404.
+    """
+    p = github_import.progress(job_id, since=since)
+    if p is None or p['owner_id'] != g.user.id:
+        abort(404)
+    return p
+
+
+@pimport.route('/github/<job_id>')
+@user_required
+def github_progress(job_id):
+    """
+    Shows the progress of a Github import.
+    """
+    _job_progress(job_id)
+    return render_template('github_progress.html', job_id=job_id)
+
+
+@pimport.route('/github/<job_id>/status')
+@user_required
+def github_status(job_id):
+    """
+    The progress of a Github import as JSON, polled by the progress page.
+    Only the lines of the summary from ``since`` on are included.
+    """
+    p = _job_progress(job_id, since=request.args.get('since', 0, type=int))
+    del p['owner_id']
+    return jsonify(p)
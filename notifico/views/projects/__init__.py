@@ -13,12 +13,14 @@ from flask import (
     redirect,
     url_for,
     abort,
-    request
+    request,
+    current_app
 )
 import flask_wtf as wtf
 
 from notifico import db, user_required
 from notifico.models import User, Project, Hook, Channel
+from notifico.services import history, live, overview, page_cache, stats
 from notifico.services.hooks import HookService
 
 projects = Blueprint('projects', __name__, template_folder='templates')
@@ -103,6 +105,10 @@ def project_action(f):
 
 
 @projects.route('/<u>/')
+@page_cache.cached_page(
+    'project', 'user', 'channel', 'hook', 'bot_event',
+    page_cache.MESSAGE_COUNT
+)
 def dashboard(u):
     """
     Display an overview of all the user's projects with summary
@@ -115,16 +121,9 @@ def dashboard(u):
 
     is_owner = (g.user and g.user.id == u.id)
 
-    # Get all projects by decending creation date.
-    projects = (
-        u.projects
-        .order_by(False)
-        .order_by(Project.created.desc())
-    )
-    if not is_owner:
-        # If this isn't the users own page, only
-        # display public projects.
-        projects = projects.filter_by(public=True)
+    # Get all projects by decending creation date. If this isn't the
+    # users own page, only display public projects.
+    projects = overview.user_projects(u, public_only=not is_owner)
 
     return render_template('dashboard.html',
         user=u,
@@ -231,6 +230,10 @@ def delete_project(u, p):
 
 
 @projects.route('/<u>/<p>')
+@page_cache.cached_page(
+    'project', 'user', 'channel', 'hook', 'bot_event',
+    page_cache.MESSAGE_COUNT
+)
 @project_action
 def details(u, p):
     """
@@ -241,15 +244,25 @@ def details(u, p):
 
     can_modify = p.can_modify(g.user)
 
-    visible_channels = p.channels
-    if not can_modify:
-        visible_channels = visible_channels.filter_by(public=True)
+    hooks, visible_channels, last_events = overview.project_details(
+        p,
+        public_only=not can_modify
+    )
+    messages = history.page(
+        current_app.redis,
+        project_id=p.id,
+        cursor=request.args.get('c'),
+        per_page=min(int(request.args.get('l', 10)), 100)
+    )
 
     return render_template(
         'project_details.html',
         project=p,
         user=u,
+        hooks=hooks,
         visible_channels=visible_channels,
+        last_events=last_events,
+        messages=messages,
         can_modify=can_modify,
         page_title='Notifico! - {u.username}/{p.name}'.format(
             u=u,
@@ -336,6 +349,18 @@ def edit_hook(u, p, hid):
     )
 
 
+@projects.route('/<u>/<p>/live')
+@project_action
+def live_feed(u, p):
+    """
+    Stream messages sent to a public project, as Server-Sent Events.
+    """
+    if not p.public:
+        return abort(404)
+
+    return live.response(project_id=p.id)
+
+
 @projects.route('/h/<int:pid>/<key>', methods=['GET', 'POST'])
 def hook_receive(pid, key):
     h = Hook.query.filter_by(key=key, project_id=pid).first()
@@ -353,6 +378,8 @@ def hook_receive(pid, key):
     Project.query.filter_by(id=h.project.id).update({
         Project.message_count: Project.message_count + 1
     })
+    page_cache.changed(db.session, page_cache.MESSAGE_COUNT)
+    stats.count_message(db.session, h.project)
 
     hook = HookService.services.get(h.service_id)
     if hook is None:
@@ -1,33 +1,53 @@
 # -*- coding: utf-8 -*-
+import hashlib
+
 from flask import (
     Blueprint,
     render_template,
     g,
-    request
+    request,
+    redirect,
+    url_for,
+    abort
 )
 from flask_sqlalchemy import Pagination
 from sqlalchemy import func, text
 
 from notifico import db
-from notifico.services import stats
-from notifico.models import User, Channel, Project
+from notifico.services import stats, network_stats, page_cache, live
+from notifico.models import User, Channel, Project, ShortLink
 from notifico.services.hooks import HookService
+from notifico.util import keyset
 
 public = Blueprint('public', __name__, template_folder='templates')
 
 
+def _visibility(user):
+    """
+    Returns a name for what `user` is able to see, for caching totals.
+    """
+    if user and user.in_group('admin'):
+        return 'admin'
+    elif user:
+        return 'user_{0}'.format(user.id)
+    return 'public'
+
+
 @public.route('/')
+@page_cache.cached_page('project', 'user', 'channel', page_cache.MESSAGE_COUNT)
 def landing():
     """
     Show a landing page giving a short intro blurb to unregistered users
     and very basic metrics such as total users.
     """
     # Find the 10 latest public projects.
-    new_projects = (
-        Project.visible(Project.query, user=g.user)
-        .order_by(False)
-        .order_by(Project.created.desc())
-    ).paginate(1, 10, False)
+    q = Project.visible(Project.query, user=g.user)
+    new_projects = keyset.paginate(
+        q,
+        (Project.created, Project.id),
+        per_page=10,
+        total=keyset.approximate_total('projects_' + _visibility(g.user), q)
+    )
 
     return render_template(
         'landing.html',
@@ -39,41 +59,72 @@ def landing():
 
 
 @public.route('/s/networks/')
+@page_cache.cached_page('channel', 'project')
 def networks():
     per_page = min(int(request.args.get('l', 25)), 100)
     page = max(int(request.args.get('page', 1)), 1)
-
-    q = (
-        Channel.visible(db.session.query(
-            Channel.host,
-            func.count(func.distinct(Channel.channel)).label('di_count'),
-            func.count(Channel.channel).label('count')
-        ), user=g.user)
-        .group_by(Channel.host)
-        .order_by(text('di_count desc'))
-    )
-    total = q.count()
-    items = q.limit(per_page).offset((page - 1) * per_page).all()
-    pagination = Pagination(q, page, per_page, total, items)
+    is_admin = bool(g.user and g.user.in_group('admin'))
+
+    def load():
+        # Only called by the template when the table isn't cached.
+        if is_admin:
+            # Admins can see every channel, which isn't what the network
+            # counters track.
+            q = (
+                Channel.visible(db.session.query(
+                    Channel.host,
+                    func.count(func.distinct(Channel.channel)).label(
+                        'di_count'
+                    ),
+                    func.count(Channel.channel).label('count')
+                ), user=g.user)
+                .group_by(Channel.host)
+                .order_by(text('di_count desc'))
+            )
+            total = q.count()
+            items = q.limit(per_page).offset((page - 1) * per_page).all()
+        else:
+            total = network_stats.total_networks()
+            items = network_stats.top_networks(
+                start=(page - 1) * per_page,
+                limit=per_page
+            )
+
+        return Pagination(None, page, per_page, total, items)
 
     return render_template(
         'networks.html',
-        pagination=pagination,
+        load=load,
+        is_admin=is_admin,
+        page=page,
         per_page=per_page
     )
 
 
 @public.route('/s/networks/<network>/')
+@page_cache.cached_page('channel', 'project', 'user')
 def network(network):
     per_page = min(int(request.args.get('l', 25)), 100)
-    page = max(int(request.args.get('page', 1)), 1)
 
     q = Channel.visible(
         Channel.query.filter(Channel.host == network),
         user=g.user
-    ).order_by(Channel.created.desc())
+    )
 
-    pagination = q.paginate(page, per_page, False)
+    pagination = keyset.paginate(
+        q,
+        (Channel.created, Channel.id),
+        cursor=request.args.get('c'),
+        per_page=per_page,
+        total=keyset.approximate_total(
+            # The network comes straight from the URL, and may be anything.
+            'network_{0}_{1}'.format(
+                hashlib.sha1(network.encode('utf-8')).hexdigest(),
+                _visibility(g.user)
+            ),
+            q
+        )
+    )
 
     return render_template(
         'channels.html',
@@ -83,19 +134,27 @@ def network(network):
     )
 
 
-@public.route('/s/projects', defaults={'page': 1})
-@public.route('/s/projects/<int:page>')
-def projects(page=1):
+@public.route('/s/projects')
+@page_cache.cached_page('project', 'user', page_cache.MESSAGE_COUNT)
+def projects():
     per_page = min(int(request.args.get('l', 25)), 100)
     sort_by = request.args.get('s', 'created')
 
-    q = Project.visible(Project.query, user=g.user).order_by(False)
-    q = q.order_by({
-        'created': Project.created.desc(),
-        'messages': Project.message_count.desc()
-    }.get(sort_by, Project.created.desc()))
+    q = Project.visible(Project.query, user=g.user)
 
-    pagination = q.paginate(page, per_page, False)
+    pagination = keyset.paginate(
+        q,
+        {
+            'created': (Project.created, Project.id),
+            'messages': (Project.message_count, Project.id)
+        }.get(sort_by, (Project.created, Project.id)),
+        cursor=request.args.get('c'),
+        per_page=per_page,
+        total=keyset.approximate_total(
+            'projects_' + _visibility(g.user),
+            q
+        )
+    )
 
     return render_template(
         'projects.html',
@@ -104,18 +163,29 @@ def projects(page=1):
     )
 
 
-@public.route('/s/users', defaults={'page': 1})
-@public.route('/s/users/<int:page>')
-def users(page=1):
+@public.route('/s/projects/<int:page>')
+def old_projects(page):
+    """
+    Numbered pages were replaced by cursors, so old links go to the
+    first page.
+    """
+    return redirect(url_for('.projects', **request.args.to_dict()), 301)
+
+
+@public.route('/s/users')
+@page_cache.cached_page('user', 'project')
+def users():
     per_page = min(int(request.args.get('l', 25)), 100)
-    sort_by = request.args.get('s', 'created')
 
-    q = User.query.order_by(False)
-    q = q.order_by({
-        'created': User.joined.desc()
-    }.get(sort_by, User.joined.desc()))
+    q = User.query
 
-    pagination = q.paginate(page, per_page, False)
+    pagination = keyset.paginate(
+        q,
+        (User.joined, User.id),
+        cursor=request.args.get('c'),
+        per_page=per_page,
+        total=keyset.approximate_total('users', q)
+    )
 
     return render_template(
         'users.html',
@@ -124,10 +194,40 @@ def users(page=1):
     )
 
 
+@public.route('/s/users/<int:page>')
+def old_users(page):
+    """
+    Numbered pages were replaced by cursors, so old links go to the
+    first page.
+    """
+    return redirect(url_for('.users', **request.args.to_dict()), 301)
+
+
 @public.route('/s/services')
+@page_cache.cached_page()
 def services():
     services = HookService.services
     return render_template(
         'services.html',
         services=services
     )
+
+
+@public.route('/s/live')
+def live_feed():
+    """
+    Stream messages sent to any public project, as Server-Sent Events.
+    """
+    return live.response()
+
+
+@public.route('/l/<code>')
+def short_link(code):
+    """
+    Redirect to the full URL behind a local short link.
+    """
+    link = ShortLink.by_code(code)
+    if link is None:
+        return abort(404)
+
+    return redirect(link.url, code=301)
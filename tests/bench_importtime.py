@@ -0,0 +1,105 @@
+# -*- coding: utf8 -*-
+"""Import time benchmark
+
+Times importing each of Notifico's entry points in a fresh interpreter,
+and lists the hook service modules each one ended up importing. On
+Python 3.7+ the time is the cumulative time reported by
+``python -X importtime``, otherwise it's the wall time of the imports.
+
+Usage:
+    bench_importtime.py [options] [<entry>...]
+
+Options:
+    --repeat=<n>    Number of runs per entry point, the best is
+                    reported. [default: 5]
+"""
+from __future__ import print_function
+import re
+import sys
+import json
+import subprocess
+
+#: The code run by each entry point before it gets to any real work.
+ENTRY_POINTS = {
+    'web': 'from notifico import create_instance; create_instance()',
+    'worker': (
+        'from notifico.models import *; import notifico.services.background'
+    ),
+    'bots': 'import notifico.bots',
+    'models': 'from notifico.models import *'
+}
+
+_PROBE = '''
+import sys, json, time
+start = time.time()
+{code}
+elapsed = time.time() - start
+sys.stdout.write(json.dumps({{
+    'elapsed': elapsed,
+    'services': sorted(
+        m for m in sys.modules
+        if m.startswith('notifico.services.hooks.') and sys.modules[m]
+    )
+}}))
+'''
+
+_IMPORTTIME_R = re.compile(r'import time:\s+\d+\s+\|\s+(\d+)\s+\| (\s*)\S+')
+
+
+def measure(code):
+    """
+    Runs `code` in a new interpreter and returns the time taken, in
+    seconds, and the hook service modules it imported.
+    """
+    args = [sys.executable]
+    importtime = sys.version_info >= (3, 7)
+    if importtime:
+        args.extend(['-X', 'importtime'])
+    args.extend(['-c', _PROBE.format(code=code)])
+
+    p = subprocess.Popen(
+        args,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True
+    )
+    out, err = p.communicate()
+    if p.returncode != 0:
+        raise RuntimeError(err)
+
+    result = json.loads(out)
+    if importtime:
+        # Sum the cumulative time (in microseconds) of every top-level
+        # import.
+        result['elapsed'] = sum(
+            int(us) for us, indent in _IMPORTTIME_R.findall(err)
+            if not indent
+        ) / 1e6
+    return result['elapsed'], result['services']
+
+
+def run(entries=None, repeat=5):
+    """
+    Returns the best time and the imported service modules for each of
+    `entries`, or every entry point.
+    """
+    stats = {}
+    for entry in entries or sorted(ENTRY_POINTS):
+        runs = [measure(ENTRY_POINTS[entry]) for _ in range(repeat)]
+        stats[entry] = (min(r[0] for r in runs), runs[-1][1])
+    return stats
+
+
+if __name__ == '__main__':
+    from docopt import docopt
+
+    args = docopt(__doc__)
+    stats = run(
+        entries=args['<entry>'],
+        repeat=int(args['--repeat'])
+    )
+    for entry in sorted(stats):
+        elapsed, services = stats[entry]
+        print('{0:>8}: {1:.3f}s'.format(entry, elapsed))
+        for service in services:
+            print('          {0}'.format(service))
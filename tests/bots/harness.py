@@ -0,0 +1,169 @@
+# -*- coding: utf8 -*-
+"""Bot throughput harness
+
+Pushes messages through `MessageService` into a running bot manager
+connected to a local `FakeIRCServer` and reports on end-to-end latency,
+delivered lines per second, reconnects and memory growth.
+
+The Redis server from the Notifico configuration is used, but with a
+database of its own, so the bots' queue, channels and topology aren't
+mixed up with those of a real deployment.
+
+Usage:
+    harness.py [options]
+
+Options:
+    --messages=<n>      Number of messages to send. [default: 1000]
+    --channels=<n>      Number of channels to spread them over. [default: 50]
+    --chanlimit=<n>     CHANLIMIT advertised by the server. [default: 20]
+    --flood=<n>         Lines per 2 seconds before a client is
+                        disconnected for flooding. [default: 10]
+    --timeout=<s>       Seconds to wait for delivery. [default: 300]
+    --redis-db=<n>      Redis database to use, which must not be the one
+                        Notifico uses. [default: 15]
+"""
+import time
+import uuid
+import resource
+from collections import namedtuple
+
+import redis
+import gevent
+import gevent.event
+
+from notifico import config
+from notifico.bots import start_manager, warm
+from notifico.services.messages import MessageService
+
+from ircd import FakeIRCServer
+
+#: Stands in for `notifico.models.Channel` when sending messages.
+Destination = namedtuple('Destination', ['channel', 'host', 'port', 'ssl'])
+
+#: The Redis database used by default, kept apart from Notifico's own.
+REDIS_DB = 15
+
+
+def _percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def _reset(r):
+    """
+    Clears the queue, channels and topology left in `r` by a previous run.
+    """
+    r.delete(
+        warm.key_topology,
+        warm.key_active_channels,
+        warm.key_queue_messages
+    )
+
+
+def run(messages=1000, channels=50, timeout=300, redis_db=REDIS_DB,
+        **server_options):
+    """
+    Run the bots against a `FakeIRCServer` (created with `server_options`)
+    until all `messages` have been delivered or `timeout` seconds have
+    passed, returning a dict of statistics.
+
+    :param redis_db: The Redis database used by the bots for the run.
+    """
+    if redis_db == config.REDIS_DB:
+        raise ValueError('The harness needs a Redis database of its own.')
+
+    r = redis.StrictRedis(
+        host=config.REDIS_HOST,
+        port=config.REDIS_PORT,
+        db=redis_db
+    )
+    _reset(r)
+    # The manager connects to the database from the configuration.
+    notifico_db, config.REDIS_DB = config.REDIS_DB, redis_db
+
+    server = FakeIRCServer(**server_options)
+    server.start()
+
+    # Every message is tagged with this run and the time it was sent so
+    # we can pick out our own and time them.
+    run_id = uuid.uuid4().hex[:8]
+    latencies = []
+    done = gevent.event.Event()
+
+    def on_privmsg(client, target, text):
+        parts = text.split()
+        if len(parts) != 4 or parts[0] != 'harness' or parts[1] != run_id:
+            return
+        latencies.append(time.time() - float(parts[3]))
+        if len(latencies) >= messages:
+            done.set()
+
+    server.on_privmsg = on_privmsg
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    stopping = gevent.event.Event()
+    try:
+        manager = gevent.spawn(start_manager, stopping=stopping)
+
+        ms = MessageService(redis=r)
+        destinations = [
+            Destination(
+                '#harness{0}'.format(i),
+                server.host,
+                server.port,
+                False
+            )
+            for i in range(channels)
+        ]
+
+        started = time.time()
+        for i in range(messages):
+            ms.send_message(
+                'harness {0} {1} {2:.6f}'.format(run_id, i, time.time()),
+                destinations[i % channels]
+            )
+
+        done.wait(timeout)
+        elapsed = time.time() - started
+
+        stopping.set()
+        manager.join()
+    finally:
+        stopping.set()
+        config.REDIS_DB = notifico_db
+        server.stop()
+        _reset(r)
+
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return {
+        'sent': messages,
+        'delivered': len(latencies),
+        'elapsed': elapsed,
+        'lines_per_second': len(latencies) / elapsed if elapsed else 0,
+        'latency_p50': _percentile(latencies, 0.50),
+        'latency_p90': _percentile(latencies, 0.90),
+        'latency_p99': _percentile(latencies, 0.99),
+        'latency_max': max(latencies) if latencies else None,
+        'connections': server.connections,
+        'registrations': server.registrations,
+        'max_rss_growth_kb': rss_after - rss_before
+    }
+
+
+if __name__ == '__main__':
+    from docopt import docopt
+
+    args = docopt(__doc__)
+    stats = run(
+        messages=int(args['--messages']),
+        channels=int(args['--channels']),
+        timeout=float(args['--timeout']),
+        redis_db=int(args['--redis-db']),
+        chanlimit=int(args['--chanlimit']),
+        flood_lines=int(args['--flood'])
+    )
+    for key in sorted(stats):
+        print '{0:>20}: {1}'.format(key, stats[key])
@@ -0,0 +1,275 @@
+# -*- coding: utf8 -*-
+"""
+A small gevent IRC server that stands in for a real network when testing
+the bots. It implements just enough of the protocol for the bots to
+register, join and send messages, and lets tests misbehave on purpose with
+nick collisions, channel limits, flood limits, kicks and disconnects.
+"""
+__all__ = ('FakeIRCServer',)
+import time
+import socket
+from collections import deque
+
+from gevent.server import StreamServer
+
+
+def _parse(line):
+    """
+    Splits a raw IRC line into its (command, params) pair, dropping any
+    prefix.
+    """
+    if line.startswith(':'):
+        line = line.split(' ', 1)[1] if ' ' in line else ''
+
+    if ' :' in line:
+        line, trailing = line.split(' :', 1)
+        params = line.split() + [trailing]
+    else:
+        params = line.split()
+
+    if not params:
+        return None, []
+
+    return params[0].upper(), params[1:]
+
+
+class FakeClient(object):
+    """
+    A single connection to the `FakeIRCServer`.
+    """
+    def __init__(self, server, sock):
+        self.server = server
+        self.sock = sock
+        self.nick = None
+        self.user = None
+        self.registered = False
+        self.channels = set()
+        # Timestamps of recently received PRIVMSGs, for flood control.
+        self.recent = deque()
+
+    @property
+    def prefix(self):
+        return '{0}!{1}@fake'.format(self.nick, self.user)
+
+    def send(self, line):
+        try:
+            self.sock.sendall(line + '\r\n')
+        except socket.error:
+            pass
+
+    def numeric(self, code, *args):
+        self.send(':{0} {1:03d} {2} {3}'.format(
+            self.server.name,
+            code,
+            self.nick or '*',
+            ' '.join(args)
+        ))
+
+    def close(self, reason=None):
+        if reason:
+            self.send('ERROR :Closing Link: {0}'.format(reason))
+        self.server.clients.discard(self)
+        try:
+            self.sock.close()
+        except socket.error:
+            pass
+
+
+class FakeIRCServer(object):
+    """
+    A stand-in IRC server.
+
+    :param chanlimit: The most channels a single client may join, advertised
+                      as ``CHANLIMIT`` in ISUPPORT.
+    :param targmax: The most targets a PRIVMSG may have, advertised as
+                    ``TARGMAX`` in ISUPPORT.
+    :param flood_lines: Clients sending more than this many PRIVMSGs within
+                        `flood_window` seconds are disconnected.
+    :param flood_window: See `flood_lines`.
+    :param reserved_nicks: Nicknames which are always "in use".
+    """
+    name = 'fake.irc'
+
+    def __init__(self, host='127.0.0.1', port=0, chanlimit=20, targmax=4,
+                 flood_lines=10, flood_window=2.0, reserved_nicks=None):
+        self.chanlimit = chanlimit
+        self.targmax = targmax
+        self.flood_lines = flood_lines
+        self.flood_window = flood_window
+        self.reserved_nicks = set(n.lower() for n in reserved_nicks or ())
+
+        self.clients = set()
+        #: Every PRIVMSG accepted, as (time, nick, target, text) tuples.
+        self.messages = []
+        #: Total number of connections accepted.
+        self.connections = 0
+        #: Total number of clients that completed registration.
+        self.registrations = 0
+        #: Called as ``on_privmsg(client, target, text)`` for every
+        #: PRIVMSG accepted.
+        self.on_privmsg = None
+
+        self._server = StreamServer((host, port), self._handle)
+
+    @property
+    def host(self):
+        return self._server.server_host
+
+    @property
+    def port(self):
+        return self._server.server_port
+
+    def start(self):
+        self._server.start()
+
+    def stop(self):
+        for client in list(self.clients):
+            client.close('Server shutting down')
+        self._server.stop()
+
+    def find(self, nick):
+        """
+        Returns the connected client using `nick`, or ``None``.
+        """
+        for client in self.clients:
+            if client.nick and client.nick.lower() == nick.lower():
+                return client
+        return None
+
+    def kick(self, channel, nick, reason='Kicked'):
+        """
+        Kicks `nick` from `channel`.
+        """
+        client = self.find(nick)
+        if client is None or channel.lower() not in client.channels:
+            return False
+
+        client.channels.discard(channel.lower())
+        client.send(':op!op@fake KICK {0} {1} :{2}'.format(
+            channel, client.nick, reason
+        ))
+        return True
+
+    def disconnect(self, nick, reason='Connection reset by peer'):
+        """
+        Drops the connection for `nick`.
+        """
+        client = self.find(nick)
+        if client is None:
+            return False
+
+        client.close(reason)
+        return True
+
+    def _handle(self, sock, address):
+        client = FakeClient(self, sock)
+        self.clients.add(client)
+        self.connections += 1
+
+        f = sock.makefile('rb')
+        try:
+            for line in f:
+                line = line.rstrip('\r\n')
+                if not line:
+                    continue
+
+                command, params = _parse(line)
+                handler = getattr(self, '_on_{0}'.format(command), None)
+                if handler is not None:
+                    handler(client, params)
+
+                if client not in self.clients:
+                    break
+        except socket.error:
+            pass
+        finally:
+            client.close()
+
+    def _register(self, client):
+        if client.registered or not (client.nick and client.user):
+            return
+
+        client.registered = True
+        self.registrations += 1
+
+        client.numeric(1, ':Welcome to the fake network', client.prefix)
+        client.numeric(
+            5,
+            'CHANLIMIT=#:{0}'.format(self.chanlimit),
+            'TARGMAX=PRIVMSG:{0},NOTICE:{0}'.format(self.targmax),
+            'CHANTYPES=#',
+            ':are supported by this server'
+        )
+        client.numeric(422, ':MOTD File is missing')
+
+    def _on_NICK(self, client, params):
+        if not params:
+            return
+
+        nick = params[0]
+        in_use = self.find(nick)
+        if nick.lower() in self.reserved_nicks or (
+                in_use is not None and in_use is not client):
+            client.numeric(433, nick, ':Nickname is already in use')
+            return
+
+        client.nick = nick
+        self._register(client)
+
+    def _on_USER(self, client, params):
+        if params:
+            client.user = params[0]
+            self._register(client)
+
+    def _on_PING(self, client, params):
+        client.send(':{0} PONG {0} :{1}'.format(
+            self.name,
+            params[0] if params else ''
+        ))
+
+    def _on_QUIT(self, client, params):
+        client.close('Quit: {0}'.format(params[0] if params else ''))
+
+    def _on_JOIN(self, client, params):
+        if not client.registered or not params:
+            return
+
+        for channel in params[0].split(','):
+            if channel.lower() in client.channels:
+                continue
+
+            if len(client.channels) >= self.chanlimit:
+                client.numeric(
+                    405, channel, ':You have joined too many channels'
+                )
+                continue
+
+            client.channels.add(channel.lower())
+            client.send(':{0} JOIN {1}'.format(client.prefix, channel))
+
+    def _on_PRIVMSG(self, client, params):
+        if not client.registered or len(params) < 2:
+            return
+
+        now = time.time()
+        client.recent.append(now)
+        while client.recent and client.recent[0] < now - self.flood_window:
+            client.recent.popleft()
+
+        if len(client.recent) > self.flood_lines:
+            client.close('Excess Flood')
+            return
+
+        targets = params[0].split(',')
+        if len(targets) > self.targmax:
+            client.numeric(407, params[0], ':Too many targets')
+            return
+
+        for target in targets:
+            if target.lower() not in client.channels:
+                client.numeric(404, target, ':Cannot send to channel')
+                continue
+
+            self.messages.append((now, client.nick, target, params[1]))
+            if self.on_privmsg is not None:
+                self.on_privmsg(client, target, params[1])
@@ -0,0 +1,51 @@
+import pytest
+
+redis = pytest.importorskip('redis')
+
+from notifico import config
+
+import harness
+
+
+@pytest.fixture(autouse=True)
+def require_redis():
+    r = redis.StrictRedis(
+        host=config.REDIS_HOST,
+        port=config.REDIS_PORT,
+        db=harness.REDIS_DB
+    )
+    try:
+        r.ping()
+    except redis.ConnectionError:
+        pytest.skip('A Redis server is required for the bot harness.')
+
+
+# The manager sends up to 10 lines a second, which is more than the fake
+# server allows by default. These tests aren't about flooding, so make sure
+# a burst can't get the bot disconnected.
+FLOOD_LINES = 100
+
+
+def test_delivers_every_message():
+    stats = harness.run(
+        messages=20,
+        channels=10,
+        timeout=30,
+        flood_lines=FLOOD_LINES
+    )
+
+    assert stats['delivered'] == 20
+    # One bot is plenty for 10 channels.
+    assert stats['registrations'] == 1
+
+
+def test_recovers_from_nick_collision():
+    stats = harness.run(
+        messages=5,
+        channels=5,
+        timeout=30,
+        flood_lines=FLOOD_LINES,
+        reserved_nicks=[config.IRC_NICKNAME]
+    )
+
+    assert stats['delivered'] == 5
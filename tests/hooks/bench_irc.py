@@ -0,0 +1,77 @@
+# -*- coding: utf8 -*-
+"""IRC normalization microbenchmark
+
+Times `notifico.util.irc.normalize` against the previous two-pass approach
+(strip colors, then collapse whitespace) over a corpus built by rendering
+every hook service's message templates, with and without colors.
+
+Usage:
+    bench_irc.py [options]
+
+Options:
+    --repeat=<n>    Number of timing runs, the best is reported. [default: 5]
+    --number=<n>    Passes over the corpus per run. [default: 200]
+"""
+import re
+import timeit
+
+from notifico.util import irc
+from notifico.services.hooks import HookService
+
+
+def corpus():
+    """
+    Returns a list of lines as emitted by the hook services, before
+    normalization.
+    """
+    lines = []
+    for service in HookService.services.values():
+        for name, template in sorted(service.templates.items()):
+            fields = dict(
+                (field, u'{0} \x02{1}\x02\n  text'.format(field, name))
+                for field in template.fields
+            )
+            fields.update((f, 'GREEN') for f in template.color_fields)
+            lines.append(template.render(**fields))
+            lines.append(template.render(strip=True, **fields))
+    return lines
+
+
+def two_pass(message, strip=True):
+    message = irc.strip_mirc_colors(message) if strip else message
+    return re.sub(r'\s+', ' ', message)
+
+
+def run(repeat=5, number=200):
+    """
+    Returns the best time, in seconds, of each approach over `number`
+    passes of the corpus.
+    """
+    lines = corpus()
+
+    def _bench(func):
+        return min(timeit.repeat(
+            lambda: [func(line) for line in lines],
+            repeat=repeat,
+            number=number
+        ))
+
+    return {
+        'lines': len(lines),
+        'two_pass': _bench(two_pass),
+        'normalize': _bench(irc.normalize),
+        'two_pass_colors': _bench(lambda l: two_pass(l, strip=False)),
+        'normalize_colors': _bench(lambda l: irc.normalize(l, strip=False))
+    }
+
+
+if __name__ == '__main__':
+    from docopt import docopt
+
+    args = docopt(__doc__)
+    stats = run(
+        repeat=int(args['--repeat']),
+        number=int(args['--number'])
+    )
+    for key in sorted(stats):
+        print '{0:>20}: {1}'.format(key, stats[key])
@@ -1,5 +1,5 @@
 import textwrap
-from notifico.services.hooks import github
+from notifico.services.hooks import github, push
 from notifico.services.hooks import HookService
 
 
@@ -33,8 +33,10 @@ def test_create_commit_summary_title_only():
     config = {
         'title_only': True
     }
-    summary_generator = github._create_commit_summary(
-        'test/project', {'original': test_push_payload}, config
+    summary_generator = push.commit_lines(
+        github.GithubHook,
+        github.push_event(test_push_payload, config, 'test/project'),
+        config
     )
     # Strip out the colors, we only care about the content of the message.
     summary_lines = [HookService.strip_colors(l) for l in summary_generator]
@@ -48,8 +50,10 @@ def test_create_commit_summary_really_long_message():
     config = {
         'title_only': False
     }
-    summary_generator = github._create_commit_summary(
-        'test/project', {'original': test_push_payload}, config
+    summary_generator = push.commit_lines(
+        github.GithubHook,
+        github.push_event(test_push_payload, config, 'test/project'),
+        config
     )
     # Strip out the colors, we only care about the content of the message.
     summary_lines = [HookService.strip_colors(l) for l in summary_generator]
@@ -0,0 +1,35 @@
+from notifico.services.hooks import github
+
+
+class Overrides(object):
+    """
+    Just enough of a `TemplateOverridesField` to validate.
+    """
+    def __init__(self, **data):
+        self.data = data
+        self.errors = []
+
+
+def validate(**overrides):
+    field = Overrides(**overrides)
+    github.GithubHook.validate_templates(field)
+    return field.errors
+
+
+def test_valid_override():
+    assert not validate(prefix=u'{YELLOW}{name}{RESET}:')
+
+
+def test_unknown_field():
+    assert validate(prefix=u'{name} {password}')
+
+
+def test_attributes_and_items():
+    assert validate(prefix=u'{name.__class__}')
+    assert validate(prefix=u'{name[0]}')
+
+
+def test_format_specs_and_conversions():
+    assert validate(prefix=u'{name:>2000000000}')
+    assert validate(prefix=u'{name:{name}}')
+    assert validate(prefix=u'{name!r}')
@@ -0,0 +1,122 @@
+"""
+Checks that the project pages are loaded in a fixed number of queries,
+however many projects and channels there are.
+"""
+import datetime
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from notifico import create_instance, db
+from notifico.models import BotEvent, Channel, Hook, Project, User
+from notifico.services import overview
+
+
+@pytest.fixture
+def app():
+    app = create_instance()
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@contextmanager
+def count_queries():
+    """
+    Counts the statements executed within the block.
+    """
+    statements = []
+
+    def _before(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', _before)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', _before)
+
+
+def make_user(projects):
+    """
+    Creates a user with `projects` projects, each with a hook and public
+    and private channels that have seen an event.
+    """
+    u = User.new('tktech', 'tk@tkte.ch', 'password')
+    db.session.add(u)
+
+    now = datetime.datetime.utcnow()
+    for i in range(projects):
+        p = Project.new('project-{0}'.format(i), public=i % 2 == 0)
+        p.full_name = 'tktech/project-{0}'.format(i)
+        p.owner = u
+        h = Hook.new(10)
+        h.project = p
+        for public in (True, False):
+            c = Channel.new(
+                '#p{0}-{1}'.format(i, int(public)),
+                'chat.freenode.net',
+                public=public
+            )
+            c.project = p
+            e = BotEvent.new(c.host, c.port, c.ssl, 'joined', 'ok', 'join',
+                             channel=c.channel)
+            e.created = now - datetime.timedelta(minutes=i)
+            db.session.add(e)
+
+    # Flushed rather than committed, which would update the network
+    # counts in Redis.
+    db.session.flush()
+    db.session.expire_all()
+    return u
+
+
+@pytest.mark.parametrize('public_only', [True, False])
+def test_user_projects(app, public_only):
+    counts = []
+    for projects in (1, 20):
+        u = make_user(projects)
+        with count_queries() as statements:
+            summaries = overview.user_projects(u, public_only=public_only)
+            for s in summaries:
+                s.project.owner.username
+                [c.channel for c in s.channels]
+                s.last_event and s.last_event.status
+        counts.append(len(statements))
+        db.session.rollback()
+
+    assert counts[0] == counts[1] <= 5
+
+    # Again, with the events checked this time.
+    u = make_user(4)
+    summaries = overview.user_projects(u, public_only=public_only)
+    assert len(summaries) == (2 if public_only else 4)
+    for s in summaries:
+        assert s.hook_count == 1
+        assert len(s.channels) == (1 if public_only else 2)
+        assert s.last_event.channel in [c.channel for c in s.channels]
+
+
+def test_project_details(app):
+    make_user(1)
+    p = Project.query.first()
+    for _ in range(10):
+        c = Channel.new('#more', 'irc.example.com', public=True)
+        c.project = p
+    db.session.flush()
+    db.session.expire_all()
+    p = Project.query.first()
+
+    with count_queries() as statements:
+        hooks, channels, events = overview.project_details(p)
+        for c in channels:
+            events.get(c.id)
+    assert len(statements) == 3
+
+    assert len(hooks) == 1
+    assert len(channels) == 11
+    assert list(events) == [c.id for c in channels if c.host != 'irc.example.com']
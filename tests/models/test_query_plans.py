@@ -0,0 +1,156 @@
+"""
+Checks that each hot query is answered using an index, rather than by
+reading a whole table.
+
+Runs against an in-memory SQLite database, and against PostgreSQL if
+``NOTIFICO_TEST_POSTGRES`` is set to the URI of a scratch database.
+"""
+import os
+import re
+import json
+import datetime
+
+import pytest
+
+from notifico import create_instance, db
+from notifico.models import BotEvent, Channel, Hook, Project, User
+from notifico.services import network_stats
+from notifico.util import keyset
+
+BACKENDS = {
+    'sqlite': 'sqlite://',
+    'postgres': os.environ.get('NOTIFICO_TEST_POSTGRES')
+}
+
+
+@pytest.fixture(params=sorted(BACKENDS))
+def app(request):
+    uri = BACKENDS[request.param]
+    if not uri:
+        pytest.skip('NOTIFICO_TEST_POSTGRES is not set.')
+
+    app = create_instance()
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def _seq_scans(node):
+    if node.get('Node Type') == 'Seq Scan':
+        yield node['Relation Name']
+    for child in node.get('Plans', ()):
+        for table in _seq_scans(child):
+            yield table
+
+
+def full_scans(query):
+    """
+    Returns the tables read in full to answer `query`.
+    """
+    compiled = query.statement.compile(dialect=db.engine.dialect)
+    if compiled.positional:
+        params = tuple(compiled.params[k] for k in compiled.positiontup)
+    else:
+        params = compiled.params
+
+    with db.engine.connect() as conn:
+        if db.engine.dialect.name == 'sqlite':
+            plan = conn.execute(
+                'EXPLAIN QUERY PLAN ' + unicode(compiled),
+                params
+            )
+            # Subqueries (such as a LIMIT wrapped for a joined eager load)
+            # are scanned too, but aren't tables.
+            return [
+                m.group(2) for m in (
+                    re.match(r'SCAN (TABLE )?(\w+)$', row[-1]) for row in plan
+                ) if m and m.group(2) in db.metadata.tables
+            ]
+
+        # Tables are empty, so the planner would rather read them in full
+        # even when there's a usable index.
+        conn.execute('SET enable_seqscan = off')
+        plan = conn.execute(
+            'EXPLAIN (FORMAT JSON) ' + unicode(compiled),
+            params
+        ).scalar()
+        if isinstance(plan, basestring):
+            plan = json.loads(plan)
+        return list(_seq_scans(plan[0]['Plan']))
+
+
+def test_hook_receive(app):
+    assert not full_scans(Hook.query.filter_by(key='abc', project_id=1))
+
+
+def test_duplicate_channel(app):
+    assert not full_scans(Channel.query.filter_by(
+        host='chat.freenode.net',
+        channel='#commits',
+        project_id=1
+    ))
+
+
+def test_channel_last_event(app):
+    assert not full_scans(BotEvent.query.filter_by(
+        host='chat.freenode.net',
+        port=6667,
+        ssl=False,
+        channel='#commits'
+    ).order_by(BotEvent.created.desc()).limit(1))
+
+
+@pytest.mark.parametrize('keys', [
+    (Project.created, Project.id),
+    (Project.message_count, Project.id)
+])
+def test_project_listing(app, keys):
+    q = Project.visible(Project.query)
+    assert not full_scans(q.order_by(*[k.desc() for k in keys]).limit(26))
+
+    # Any page after the first.
+    values = (datetime.datetime.utcnow(), 10)
+    if keys[0] is Project.message_count:
+        values = (5, 10)
+    assert not full_scans(
+        q.filter(keyset._beyond(keys, values))
+        .order_by(*[k.desc() for k in keys])
+        .limit(26)
+    )
+
+
+def test_user_listing(app):
+    assert not full_scans(
+        User.query.order_by(User.joined.desc(), User.id.desc()).limit(26)
+    )
+
+
+def test_network_channels(app):
+    assert not full_scans(
+        Channel.visible(Channel.query.filter(
+            Channel.host == 'chat.freenode.net'
+        ))
+        .order_by(Channel.created.desc(), Channel.id.desc())
+        .limit(26)
+    )
+
+
+def test_network_counts(app):
+    assert not full_scans(
+        network_stats._counts(db.session, ['chat.freenode.net'])
+    )
+
+
+def test_username_lookup(app):
+    assert not full_scans(User.query.filter_by(username_i='TkTech'))
+
+
+def test_project_lookup(app):
+    assert not full_scans(
+        Project.query.filter(Project.owner_id == 1)
+        .filter(Project.name_i == 'Notifico')
+    )
+    assert not full_scans(Project.query.filter_by(name_i='Notifico'))
@@ -0,0 +1,32 @@
+from notifico.util import irc
+
+
+def test_normalize_strips_all_formatting():
+    assert irc.normalize(
+        u'\x0304red\x03 \x02bold\x02 \x1funderline\x1f \x16rev\x0f'
+        u' \x04ff00ffhex'
+    ) == u'red bold underline rev hex'
+
+
+def test_normalize_collapses_whitespace():
+    assert irc.normalize(u'one\n\ntwo\t three  four') == u'one two three four'
+    # Formatting between spaces shouldn't leave a double space behind.
+    assert irc.normalize(u'one \x02 two') == u'one two'
+
+
+def test_normalize_keeps_formatting():
+    assert irc.normalize(
+        u'\x0304red\x03\n \x1funderline\x1f',
+        strip=False
+    ) == u'\x0304red\x03 \x1funderline\x1f'
+
+
+def test_to_html():
+    assert irc.to_html(u'\x0304,02red <b>\x03 \x02bold\x1f under\x0f') == (
+        u'<span style="color: #DB5858; background-color: #7FA5EB;">'
+        u'red &lt;b&gt;</span> '
+        u'<span style="font-weight: bold;">bold</span>'
+        u'<span style="font-weight: bold; text-decoration: underline;">'
+        u' under</span>'
+    )
+    assert irc.to_html(u'one\ntwo') == u'one<br/>two'
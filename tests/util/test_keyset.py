@@ -0,0 +1,33 @@
+import datetime
+
+from sqlalchemy import DateTime, Integer
+from sqlalchemy.sql import column
+
+from notifico.util import keyset
+
+created = column('created', DateTime)
+id_ = column('id', Integer)
+
+
+def test_cursor_round_trip():
+    values = [datetime.datetime(2013, 1, 2, 3, 4, 5, 6), 17]
+    cursor = keyset.encode_cursor('prev', values)
+    assert keyset.decode_cursor(cursor, (created, id_)) == ('prev', values)
+
+
+def test_invalid_cursors():
+    cursor = keyset.encode_cursor('next', [17])
+    # A cursor for a different sort.
+    assert keyset.decode_cursor(cursor, (created, id_)) is None
+    assert keyset.decode_cursor('not a cursor', (id_,)) is None
+    assert keyset.decode_cursor(u'\xe9', (id_,)) is None
+
+
+def test_mistyped_cursors():
+    for values in ([17, 17], [True, 17], ['2013', 17]):
+        cursor = keyset.encode_cursor('next', values)
+        assert keyset.decode_cursor(cursor, (created, id_)) is None
+
+    for value in (u'17', 17.5, [17], {'d': '2013-01-02T03:04:05.000006'}):
+        cursor = keyset.encode_cursor('next', [value])
+        assert keyset.decode_cursor(cursor, (id_,)) is None
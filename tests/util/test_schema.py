@@ -0,0 +1,37 @@
+"""
+Checks that ``notifico init`` can be run again on a database it already
+set up.
+"""
+import pytest
+
+from notifico import create_instance, db
+from notifico.util import schema
+
+
+@pytest.fixture
+def app():
+    app = create_instance()
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def init():
+    # What ``notifico init`` does.
+    db.create_all()
+    return schema.create_missing_indexes()
+
+
+def test_init_twice(app):
+    init()
+    # Expression indexes aren't reflected, but mustn't be created again.
+    assert 'ix_user_username_lower' in schema.existing_indexes()
+    assert init() == []
+
+
+def test_missing_index(app):
+    init()
+    db.engine.execute('DROP INDEX ix_project_name_lower')
+    assert init() == ['ix_project_name_lower']
@@ -0,0 +1,202 @@
+"""
+Checks that the bulk API only accepts requests with a valid token,
+rejects a batch as a whole when any part of it is invalid, and otherwise
+applies all of it.
+"""
+import json
+
+import pytest
+import redis
+
+from notifico import create_instance, db
+from notifico.models import AuthToken, Channel, Hook, Project, User
+
+#: Committing updates counters and caches in Redis, so tests that commit
+#: use a database of their own.
+REDIS_DB = 15
+
+
+@pytest.fixture
+def app():
+    app = create_instance()
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def test_redis(app):
+    """
+    Points the app at a Redis database of its own, skipping the test if
+    there's no Redis server.
+    """
+    r = redis.Redis(
+        host=app.config['REDIS_HOST'],
+        port=app.config['REDIS_PORT'],
+        db=REDIS_DB
+    )
+    try:
+        r.ping()
+    except redis.ConnectionError:
+        pytest.skip('A Redis server is required to commit.')
+
+    app.redis, notifico_redis = r, app.redis
+    yield r
+    r.flushdb()
+    app.redis = notifico_redis
+
+
+def make_user(username):
+    """
+    Creates a user with an API token, returning the user and the token's
+    secret. Everything is flushed rather than committed, so the counters
+    and caches in Redis aren't touched.
+    """
+    u = User.new(username, '{0}@example.com'.format(username), 'password')
+    token, secret = AuthToken.new_api_token()
+    token.owner = u
+    db.session.add_all([u, token])
+    db.session.flush()
+    return u, secret
+
+
+def make_project(user, name):
+    p = Project.new(name)
+    p.full_name = '{0}/{1}'.format(user.username, name)
+    p.owner = user
+    h = Hook.new(20)
+    h.project = p
+    db.session.add_all([p, h])
+    db.session.flush()
+    return p, h
+
+
+def bulk(app, body, secret=None):
+    headers = {}
+    if secret is not None:
+        headers['Authorization'] = 'Token {0}'.format(secret)
+    r = app.test_client().post(
+        '/api/1/bulk',
+        data=json.dumps(body),
+        content_type='application/json',
+        headers=headers
+    )
+    return r.status_code, json.loads(r.data)
+
+
+def test_token_required(app):
+    make_user('tktech')
+
+    for secret in (None, '', 'not-a-secret'):
+        status, body = bulk(app, {'projects': []}, secret)
+        assert status == 401
+        assert body['error']
+
+
+def test_invalid_batch(app):
+    u, secret = make_user('tktech')
+
+    status, body = bulk(app, {'projects': [
+        {'name': 'good', 'channels': [
+            {'channel': '#commits', 'host': 'chat.freenode.net', 'port': 6667}
+        ]},
+        {'name': 'not a valid name!'},
+        {'name': 'boolean-service', 'hooks': [{'service_id': True}]}
+    ]}, secret)
+
+    assert status == 400
+    assert [e['path'] for e in body['errors']] == [
+        'projects[1]',
+        'projects[2].hooks[0]'
+    ]
+    # Nothing was created, not even the valid project.
+    assert Project.query.filter_by(owner_id=u.id).count() == 0
+
+
+def test_not_lists(app):
+    u, secret = make_user('tktech')
+
+    status, body = bulk(app, {'projects': [
+        {'name': 'channels', 'channels': 5},
+        {'name': 'hooks', 'hooks': {'service_id': 20}}
+    ]}, secret)
+
+    assert status == 400
+    assert body['errors'] == [{
+        'path': 'projects[0]',
+        'errors': {'channels': ['Expected a list.']}
+    }, {
+        'path': 'projects[1]',
+        'errors': {'hooks': ['Expected a list.']}
+    }]
+
+
+def test_hook_from_another_project(app):
+    u, secret = make_user('tktech')
+    make_project(u, 'first')
+    _, other_hook = make_project(u, 'second')
+    stranger, _ = make_user('stranger')
+    _, strangers_hook = make_project(stranger, 'theirs')
+
+    for hook in (other_hook, strangers_hook):
+        status, body = bulk(app, {'projects': [
+            {'name': 'first', 'hooks': [
+                {'id': hook.id, 'service_id': 20, 'config': {}}
+            ]}
+        ]}, secret)
+
+        assert status == 400
+        assert body['errors'] == [{
+            'path': 'projects[0].hooks[0]',
+            'errors': {'id': ['There is no such hook.']}
+        }]
+
+
+def test_create_and_update(app, test_redis):
+    u, secret = make_user('tktech')
+    first, first_hook = make_project(u, 'first')
+    db.session.commit()
+
+    status, body = bulk(app, {'projects': [
+        {'name': 'First', 'public': False, 'channels': [
+            {'channel': '#commits', 'host': 'chat.freenode.net', 'port': 6667}
+        ], 'hooks': [
+            {'id': first_hook.id, 'service_id': 20,
+             'config': {'use_colours': True}}
+        ]},
+        {'name': 'second', 'channels': [
+            {'channel': '#second', 'host': 'chat.freenode.net', 'port': 6697,
+             'ssl': True}
+        ], 'hooks': [
+            {'service_id': 20, 'config': {}}
+        ]}
+    ]}, secret)
+
+    assert status == 200
+    updated, created = body['projects']
+
+    assert not updated['created']
+    assert updated['id'] == first.id
+    assert [h['id'] for h in updated['hooks']] == [first_hook.id]
+
+    assert created['created']
+    assert created['name'] == 'second'
+    second_hook = Hook.query.get(created['hooks'][0]['id'])
+    assert second_hook.project_id == created['id']
+    assert created['hooks'][0]['url'].endswith(
+        '/h/{0}/{1}'.format(created['id'], second_hook.key)
+    )
+
+    # Everything was committed.
+    db.session.expire_all()
+    assert not Project.query.get(first.id).public
+    assert Hook.query.get(first_hook.id).config['use_colours'] is True
+    assert sorted(
+        (c.project_id, c.channel, c.port, c.ssl) for c in Channel.query
+    ) == [
+        (first.id, '#commits', 6667, False),
+        (created['id'], '#second', 6697, True)
+    ]